@@ -0,0 +1,41 @@
+import sys
+
+# mitmproxy 只监视这个脚本，重新加载它时不会重新导入已经导入过的 llmview 模块。
+# 先丢弃它们，修改 llmview/ 下的代码后保存(或 touch)这个脚本即可生效。
+for _name in [name for name in sys.modules if name == "llmview" or name.startswith("llmview.")]:
+    del sys.modules[_name]
+
+from llmview.archive import ArchiveAddon  # noqa: E402
+from llmview.budget import RenderBudgetAddon  # noqa: E402
+from llmview.cache import FlowCacheAddon  # noqa: E402
+from llmview.conversation import ConversationIndexAddon  # noqa: E402
+from llmview.diskcache import DiskCacheAddon  # noqa: E402
+from llmview.endpoints import EndpointRegistryAddon  # noqa: E402
+from llmview.media import MediaAddon  # noqa: E402
+from llmview.metrics import MetricsAddon  # noqa: E402
+from llmview.precompute import PrecomputeAddon  # noqa: E402
+from llmview.profiling import ProfilerAddon  # noqa: E402
+from llmview.prompt_cache import PromptCacheAddon  # noqa: E402
+from llmview.stream import StreamAggregator  # noqa: E402
+from llmview.views import register_all  # noqa: E402
+
+# 视图模块在第一次渲染时才导入
+register_all()
+
+addons = [
+    EndpointRegistryAddon(),
+    FlowCacheAddon(),
+    DiskCacheAddon(),
+    StreamAggregator(),
+    # 在 StreamAggregator 还原流式响应的body之后提交后台渲染
+    PrecomputeAddon(),
+    RenderBudgetAddon(),
+    ConversationIndexAddon(),
+    ProfilerAddon(),
+    # 同样需要 StreamAggregator 先保存流式响应的聚合结果
+    MetricsAddon(),
+    # 需要 ConversationIndexAddon 先记录对话前缀的匹配结果
+    PromptCacheAddon(),
+    ArchiveAddon(),
+    MediaAddon(),
+]
@@ -0,0 +1 @@
+"""mitmproxy-llm-better-view 的视图和 addon 共享的核心模块"""
@@ -0,0 +1,123 @@
+"""
+在后台线程中按顺序分析完成的LLM flow: 对话索引、prompt cache 分析和存档前的对话匹配。
+
+这些分析要完整解析请求body并计算每条消息的摘要。非流式响应要等 response hook
+返回后才会转发给客户端，所以 hook 只提交任务，分析在一个后台线程中按提交顺序进行。
+
+  - 对话索引和 prompt cache 的状态只在这个线程中读写，配置和清空也作为任务提交
+  - 任务的结果(要写入 flow.metadata 的字段)和计算出的缓存项通过 call_soon_threadsafe
+    交给事件循环线程写入，后台线程不写入 flow.metadata 和 flow_cache
+  - 同一个flow后面的任务可以读取前面的任务还没有写入 flow.metadata 的结果
+没有事件循环时(例如测试和批量处理)任务在调用线程中直接运行。
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from mitmproxy import http
+
+from llmview.cache import PendingResults, flow_cache
+
+# 等待分析的flow数的上限，超出后新的flow不再分析
+DEFAULT_QUEUE = 1000
+
+# task(flow, pending) 返回要写入 flow.metadata 的字段，pending 是同一个flow前面的任务的结果
+Task = Callable[[http.HTTPFlow, Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class _Pending:
+    __slots__ = ("queued", "metadata", "cache")
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.metadata: Dict[str, Any] = {}
+        self.cache: PendingResults = {}
+
+
+class FlowAnalysis:
+    """单个后台线程，按提交顺序运行flow的分析任务"""
+
+    def __init__(self, max_queue: int = DEFAULT_QUEUE) -> None:
+        self.max_queue = max_queue
+        self.skipped = 0
+        # 写入结果的事件循环，由 ConversationIndexAddon.running() 设置
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, _Pending] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, flow: http.HTTPFlow, task: Task) -> bool:
+        """提交flow的分析任务，队列已满时返回False"""
+        with self._lock:
+            pending = self._pending.get(flow.id)
+            if pending is None:
+                if len(self._pending) >= self.max_queue:
+                    self.skipped += 1
+                    return False
+                pending = self._pending[flow.id] = _Pending()
+            pending.queued += 1
+        if self.loop is None:
+            self._run(flow, task, pending)
+        else:
+            self._worker().submit(self._run, flow, task, pending)
+        return True
+
+    def call(self, fn: Callable[[], Any]) -> None:
+        """在分析线程中按顺序运行 fn，例如修改只在这个线程中使用的状态"""
+        if self.loop is None:
+            fn()
+        else:
+            self._worker().submit(fn)
+
+    def _worker(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llmview-analysis")
+            return self._executor
+
+    def _run(self, flow: http.HTTPFlow, task: Task, pending: _Pending) -> None:
+        updates: Optional[Dict[str, Any]] = None
+        with flow_cache.deferred(pending.cache):
+            try:
+                updates = task(flow, pending.metadata)
+            except Exception as e:
+                logging.warning(f"Analysis of flow {flow.id} failed: {e!r}")
+        if updates:
+            pending.metadata.update(updates)
+        with self._lock:
+            pending.queued -= 1
+        self._hand_back(flow, updates or {}, dict(pending.cache), pending)
+
+    def _hand_back(self, flow: http.HTTPFlow, updates: Dict[str, Any], cache: PendingResults, pending: _Pending) -> None:
+        loop = self.loop
+        if loop is None:
+            self._apply(flow, updates, cache, pending)
+            return
+        try:
+            loop.call_soon_threadsafe(self._apply, flow, updates, cache, pending)
+        except RuntimeError:
+            # 事件循环已经关闭，结果不再需要
+            pass
+
+    def _apply(self, flow: http.HTTPFlow, updates: Dict[str, Any], cache: PendingResults, pending: _Pending) -> None:
+        flow.metadata.update(updates)
+        flow_cache.store_all(cache)
+        with self._lock:
+            # 结果都已经写入 flow.metadata，之后提交的任务直接读取 flow.metadata
+            if pending.queued == 0 and self._pending.get(flow.id) is pending:
+                del self._pending[flow.id]
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+flow_analysis = FlowAnalysis()
@@ -0,0 +1,158 @@
+"""Anthropic Messages API (/v1/messages) 响应的聚合和渲染"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from llmview.render import (
+    format_fields,
+    format_json_value,
+    format_section,
+    multi_line_splitter,
+    split_line,
+)
+
+
+class MessageStreamAggregator:
+    """
+    将 /v1/messages 的SSE事件一次遍历折叠为与非流式响应相同结构的 message。
+
+    每个 content block 的增量(text_delta, thinking_delta, input_json_delta)
+    先缓存在各自的片段列表中，在 snapshot() 时才拼接。
+    """
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.error: Optional[Dict[str, Any]] = None
+        self._message: Dict[str, Any] = {}
+        self._usage: Dict[str, Any] = {}
+        # index -> (content_block, 片段列表)
+        self._blocks: Dict[int, Dict[str, Any]] = {}
+        self._fragments: Dict[int, Dict[str, List[str]]] = {}
+
+    def feed(self, event: Dict[str, Any]) -> None:
+        self.events += 1
+        event_type = event.get("type")
+        if event_type == "content_block_delta":
+            self._feed_delta(event.get("index", 0), event.get("delta") or {})
+        elif event_type == "content_block_start":
+            index = event.get("index", 0)
+            block = dict(event.get("content_block") or {})
+            fragments: Dict[str, List[str]] = {}
+            for field in ("text", "thinking"):
+                if isinstance(block.get(field), str):
+                    fragments[field] = [block[field]]
+            # tool_use 的 input 在 content_block_start 中是空对象，内容由 input_json_delta 给出
+            if block.get("type") in ("tool_use", "server_tool_use") and not block.get("input"):
+                fragments["input"] = []
+            self._blocks[index] = block
+            self._fragments[index] = fragments
+        elif event_type == "message_start":
+            message = dict(event.get("message") or {})
+            message.pop("content", None)
+            self._usage.update(message.pop("usage", None) or {})
+            self._message = message
+        elif event_type == "message_delta":
+            delta = event.get("delta") or {}
+            for field in ("stop_reason", "stop_sequence"):
+                if field in delta:
+                    self._message[field] = delta[field]
+            self._usage.update(event.get("usage") or {})
+        elif event_type == "error":
+            self.error = event.get("error") or event
+
+    def _feed_delta(self, index: int, delta: Dict[str, Any]) -> None:
+        block = self._blocks.get(index)
+        if block is None:
+            # 缺少 content_block_start 的片段，按增量类型推断 block 类型
+            block = self._blocks[index] = {"type": "tool_use" if delta.get("type") == "input_json_delta" else "text"}
+            self._fragments[index] = {}
+        fragments = self._fragments[index]
+        delta_type = delta.get("type")
+        if delta_type == "text_delta":
+            fragments.setdefault("text", []).append(delta.get("text", ""))
+        elif delta_type == "thinking_delta":
+            fragments.setdefault("thinking", []).append(delta.get("thinking", ""))
+        elif delta_type == "input_json_delta":
+            fragments.setdefault("input", []).append(delta.get("partial_json", ""))
+        elif delta_type == "signature_delta":
+            block["signature"] = delta.get("signature", "")
+        elif delta_type == "citations_delta":
+            block.setdefault("citations", []).append(delta.get("citation"))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回聚合结果:
+          - events : 事件数量
+          - message: 与非流式响应结构相同的 message，tool_use 的 input 为拼接后的JSON文本
+          - error  : error 事件的内容，没有则为None
+        """
+        content = []
+        for index, block in sorted(self._blocks.items()):
+            block = dict(block)
+            for field, parts in self._fragments[index].items():
+                block[field] = "".join(parts)
+            content.append(block)
+        message = dict(self._message, content=content)
+        if self._usage:
+            message["usage"] = dict(self._usage)
+        return {"events": self.events, "message": message, "error": self.error}
+
+
+def aggregate_message_events(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """一次性聚合已经解析好的SSE事件列表"""
+    aggregator = MessageStreamAggregator()
+    for event in events:
+        aggregator.feed(event)
+    return aggregator.snapshot()
+
+
+def handle_message_basis(message: Dict[str, Any]) -> str:
+    """处理响应的基础信息: id, model, stop_reason, usage"""
+    usage = message.get("usage") or {}
+    fields = [
+        ("id", message.get("id", "N/A")),
+        ("model", message.get("model", "N/A")),
+        ("type", message.get("type", "N/A")),
+        ("stop_reason", message.get("stop_reason", "N/A")),
+        ("stop_sequence", message.get("stop_sequence", "N/A")),
+        ("input_tokens", usage.get("input_tokens", "N/A")),
+        ("output_tokens", usage.get("output_tokens", "N/A")),
+    ]
+    # 只有使用了prompt cache时才显示
+    for field in ("cache_creation_input_tokens", "cache_read_input_tokens"):
+        if usage.get(field):
+            fields.append((field, usage[field]))
+    return format_fields(fields)
+
+
+def handle_content_blocks(blocks: List[Any]) -> str:
+    """格式化响应中的 content blocks"""
+    result = f"## Content🔍 ({len(blocks)} blocks)\n"
+    for i, block in enumerate(blocks):
+        if not isinstance(block, dict):
+            result += format_section(f"📦{i}", str(block))
+            continue
+        block_type = block.get("type", "N/A")
+        if block_type == "text":
+            result += format_section(f"💬{i} Text", block.get("text", "").strip())
+        elif block_type == "thinking":
+            result += format_section(f"🧠{i} Think", block.get("thinking", "").strip())
+        elif block_type == "redacted_thinking":
+            result += f"#### 🧠{i} Redacted Think ({len(block.get('data', ''))} chars)\n"
+        elif block_type in ("tool_use", "server_tool_use"):
+            result += f"#### 🔨{i} Tool Use\n"
+            result += f"  - ID   : {block.get('id', 'N/A')}\n"
+            result += f"  - Type : {block_type}\n"
+            result += f"  - Name : {block.get('name', 'N/A')}\n"
+            result += f"  - Input: {split_line}{format_json_value(block.get('input', {}))}{split_line}"
+        else:
+            # 其他类型(例如 web_search_tool_result)原样显示
+            result += f"#### 📦{i} {block_type}\n{split_line}{format_json_value(block)}{split_line}"
+    return result
+
+
+def render_message(message: Dict[str, Any], title: str) -> str:
+    """渲染完整的 message 响应，流式和非流式响应共用"""
+    result = f"# {title}\n \n"
+    result += handle_message_basis(message)
+    result += multi_line_splitter(2)
+    result += handle_content_blocks(message.get("content") or [])
+    return result
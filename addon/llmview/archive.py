@@ -0,0 +1,507 @@
+"""
+把完成的LLM flow写入本地SQLite数据库，支持按元数据过滤和全文搜索。
+
+  - calls     : 每个flow一行，model, token数, 延迟, finish_reason 等带索引的列
+  - tool_calls: 响应中的每个工具调用一行，按工具名建索引
+  - call_text : FTS5全文索引，rowid 与 calls.id 相同，包含消息文本和工具调用文本。
+                对话的每个请求都会重发完整的历史，与已存档的上一个请求相同的消息
+                (对话索引找到的前 common 条)不再重复索引，只索引新增的消息
+
+response hook 只把flow放入有界队列，解析和写入都在后台写线程中进行，
+每批flow在一个事务中提交，代理的处理流程不会等待磁盘。
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mitmproxy import command, ctx, exceptions, http
+
+from llmview import codec
+from llmview.analysis import flow_analysis
+from llmview.anthropic import aggregate_message_events
+from llmview.cache import flow_cache
+from llmview.conversation import CONVERSATION_METADATA_KEY
+from llmview.endpoints import ANTHROPIC_MESSAGES, JSON, RESPONSES, SSE, body_type, endpoints
+from llmview.metrics import extract_usage
+from llmview.responses import aggregate_response_stream
+from llmview.sse import parse_sse_data
+from llmview.stream import aggregate_chat_completion_events, stored_snapshot
+
+DEFAULT_BATCH = 64
+DEFAULT_QUEUE = 1000
+# 队列中没有更多flow时，最多等待这么久再提交一批
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    flow_id TEXT NOT NULL UNIQUE,
+    timestamp REAL,
+    host TEXT,
+    path TEXT,
+    kind TEXT,
+    status INTEGER,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency REAL,
+    finish_reason TEXT,
+    tool_names TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_timestamp ON calls (timestamp);
+CREATE INDEX IF NOT EXISTS calls_model ON calls (model, timestamp);
+CREATE INDEX IF NOT EXISTS calls_finish_reason ON calls (finish_reason);
+CREATE INDEX IF NOT EXISTS calls_prompt_tokens ON calls (prompt_tokens);
+CREATE INDEX IF NOT EXISTS calls_completion_tokens ON calls (completion_tokens);
+CREATE INDEX IF NOT EXISTS calls_latency ON calls (latency);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    call_id INTEGER NOT NULL REFERENCES calls (id) ON DELETE CASCADE,
+    name TEXT,
+    arguments TEXT
+);
+CREATE INDEX IF NOT EXISTS tool_calls_name ON tool_calls (name);
+CREATE INDEX IF NOT EXISTS tool_calls_call_id ON tool_calls (call_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS call_text USING fts5 (messages, tool_calls);
+"""
+
+
+@dataclass
+class CallRecord:
+    flow_id: str
+    timestamp: Optional[float]
+    host: str
+    path: str
+    kind: str
+    status: Optional[int]
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    latency: Optional[float] = None
+    finish_reason: Optional[str] = None
+    # (工具名, 参数文本)
+    tool_calls: List[Tuple[str, str]] = field(default_factory=list)
+    messages: List[str] = field(default_factory=list)
+
+
+def content_text(content: Any) -> str:
+    """把消息的 content(字符串或 content part / content block 列表)转换为可搜索的文本"""
+    if isinstance(content, str):
+        return content
+    if not isinstance(content, list):
+        return "" if content is None else str(content)
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif not isinstance(part, dict):
+            continue
+        elif isinstance(part.get("text"), str):
+            parts.append(part["text"])
+        elif part.get("type") == "thinking":
+            parts.append(part.get("thinking", ""))
+        elif part.get("type") in ("tool_use", "server_tool_use"):
+            parts.append(f"{part.get('name', '')} {codec.dumps_compact(part.get('input', {}))}")
+        elif part.get("type") == "tool_result":
+            parts.append(content_text(part.get("content")))
+    return "\n".join(p for p in parts if p)
+
+
+def _load_json(flow: http.HTTPFlow, message: http.Message) -> Any:
+    data = message.get_content(strict=False) or b""
+    if not data or body_type(message.headers.get("content-type")) != JSON:
+        return None
+    key = flow_cache.flow_key(flow, data)
+    try:
+        return flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+    except codec.JSONDecodeError:
+        return None
+
+
+def _request_text(body: Any, skip: int = 0) -> List[str]:
+    """请求中的 system, messages, prompt 和 Responses API 的 input，跳过前 skip 条 messages"""
+    if not isinstance(body, dict):
+        return []
+    texts = [content_text(body.get("system")), content_text(body.get("instructions"))]
+    prompt = body.get("prompt")
+    texts.extend(prompt if isinstance(prompt, list) else [content_text(prompt)])
+    items = body.get("messages")
+    if items is None:
+        items = body.get("input")
+    elif isinstance(items, list):
+        items = items[skip:]
+    if isinstance(items, str):
+        texts.append(items)
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        texts.append(content_text(item.get("content")))
+        texts.append(content_text(item.get("reasoning_content")))
+        for tool_call in item.get("tool_calls") or []:
+            function = tool_call.get("function") or {}
+            texts.append(f"{function.get('name', '')} {function.get('arguments', '')}")
+        if item.get("type") == "function_call_output":
+            texts.append(content_text(item.get("output")))
+    return [text for text in texts if isinstance(text, str) and text]
+
+
+def _chat_choices(record: CallRecord, choices: List[Any]) -> None:
+    """/chat/completions 和 /completions 的 choices，流式响应的聚合结果结构相同(没有 message 层)"""
+    for choice in choices:
+        if not isinstance(choice, dict):
+            continue
+        message = choice.get("message") or choice
+        record.finish_reason = choice.get("finish_reason") or record.finish_reason
+        for text in (message.get("content"), message.get("reasoning_content"), choice.get("text")):
+            text = content_text(text)
+            if text:
+                record.messages.append(text)
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function") or {}
+            record.tool_calls.append((function.get("name") or "", function.get("arguments") or ""))
+
+
+def _anthropic_message(record: CallRecord, message: Dict[str, Any]) -> None:
+    record.finish_reason = message.get("stop_reason")
+    for block in message.get("content") or []:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") in ("tool_use", "server_tool_use"):
+            tool_input = block.get("input", {})
+            arguments = tool_input if isinstance(tool_input, str) else codec.dumps_compact(tool_input)
+            record.tool_calls.append((block.get("name") or "", arguments))
+        else:
+            text = content_text([block])
+            if text:
+                record.messages.append(text)
+
+
+def _responses_output(record: CallRecord, response: Dict[str, Any]) -> None:
+    """Responses API 的 output items"""
+    record.finish_reason = response.get("status")
+    for item in response.get("output") or []:
+        if not isinstance(item, dict):
+            continue
+        if item.get("type") == "function_call":
+            record.tool_calls.append((item.get("name") or "", item.get("arguments") or ""))
+            continue
+        text = content_text(item.get("content") or item.get("summary"))
+        if text:
+            record.messages.append(text)
+
+
+def _response_body(flow: http.HTTPFlow, record: CallRecord) -> None:
+    response = flow.response
+    data = response.get_content(strict=False) or b""
+    response_type = body_type(response.headers.get("content-type"))
+    if response_type == JSON:
+        body = _load_json(flow, response)
+        if not isinstance(body, dict):
+            return
+        if record.kind == ANTHROPIC_MESSAGES:
+            _anthropic_message(record, body)
+        elif "output" in body:
+            _responses_output(record, body)
+        else:
+            _chat_choices(record, body.get("choices") or [])
+    elif response_type == SSE and data:
+        snapshot = stored_snapshot(flow, data)
+        if snapshot is not None:
+            _chat_choices(record, snapshot["choices"])
+            return
+        key = flow_cache.flow_key(flow, data)
+        if record.kind == RESPONSES:
+            # 有 response.completed 事件时只解析这一个事件
+            _responses_output(record, aggregate_response_stream(data, key)["response"])
+            return
+        events = flow_cache.get_or_compute(key, "sse-events", lambda: parse_sse_data(data), size=len(data))
+        if record.kind == ANTHROPIC_MESSAGES:
+            _anthropic_message(record, aggregate_message_events(events)["message"])
+            return
+        _chat_choices(record, aggregate_chat_completion_events(events)["choices"])
+
+
+def parse_call(flow: http.HTTPFlow, skip: int = 0) -> Optional[CallRecord]:
+    """
+    把LLM flow解析为要存档的记录，不是LLM flow时返回None。
+    skip 条消息已经在同一对话的上一个请求中索引过，不再加入全文索引。
+    """
+    kind = endpoints.classify(flow)
+    if kind is None or flow.response is None:
+        return None
+    request, response = flow.request, flow.response
+    record = CallRecord(
+        flow_id=flow.id,
+        timestamp=request.timestamp_start,
+        host=request.pretty_host,
+        path=request.path,
+        kind=kind,
+        status=response.status_code,
+    )
+    if request.timestamp_start is not None and response.timestamp_end is not None:
+        record.latency = response.timestamp_end - request.timestamp_start
+    usage = extract_usage(flow, kind)
+    record.model = usage.model
+    record.prompt_tokens = usage.prompt_tokens
+    record.completion_tokens = usage.completion_tokens
+    record.messages.extend(_request_text(_load_json(flow, request), skip))
+    _response_body(flow, record)
+    return record
+
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def write_records(conn: sqlite3.Connection, records: Sequence[CallRecord]) -> None:
+    """在一个事务中写入一批记录，同一个flow再次写入时替换旧的记录"""
+    with conn:
+        for record in records:
+            row = conn.execute("SELECT id FROM calls WHERE flow_id = ?", (record.flow_id,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM call_text WHERE rowid = ?", row)
+                conn.execute("DELETE FROM calls WHERE id = ?", row)
+            cursor = conn.execute(
+                "INSERT INTO calls (flow_id, timestamp, host, path, kind, status, model, prompt_tokens,"
+                " completion_tokens, latency, finish_reason, tool_names) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.flow_id,
+                    record.timestamp,
+                    record.host,
+                    record.path,
+                    record.kind,
+                    record.status,
+                    record.model,
+                    record.prompt_tokens,
+                    record.completion_tokens,
+                    record.latency,
+                    record.finish_reason,
+                    " ".join(name for name, _ in record.tool_calls) or None,
+                ),
+            )
+            call_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO tool_calls (call_id, name, arguments) VALUES (?, ?, ?)",
+                [(call_id, name, arguments) for name, arguments in record.tool_calls],
+            )
+            conn.execute(
+                "INSERT INTO call_text (rowid, messages, tool_calls) VALUES (?, ?, ?)",
+                (
+                    call_id,
+                    "\n".join(record.messages),
+                    "\n".join(f"{name} {arguments}" for name, arguments in record.tool_calls),
+                ),
+            )
+
+
+def _archived(conn: sqlite3.Connection, flow_id: str) -> bool:
+    return conn.execute("SELECT 1 FROM calls WHERE flow_id = ?", (flow_id,)).fetchone() is not None
+
+
+class ArchiveWriter:
+    """
+    后台写线程。flow在有界队列中排队，队列已满时丢弃并计数；
+    写线程每次取出最多 batch 个flow，解析后在一个事务中写入。
+    """
+
+    def __init__(self, batch: int = DEFAULT_BATCH, max_queue: int = DEFAULT_QUEUE) -> None:
+        self.batch = batch
+        self.path: Optional[str] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        # (flow, 对话索引的匹配结果)，匹配结果在事件循环线程中从 flow.metadata 读取
+        self._queue: "queue.Queue[Optional[Tuple[http.HTTPFlow, Optional[Dict[str, Any]]]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, path: str) -> None:
+        self.stop()
+        # 在当前线程中创建表，路径无效时立即报错
+        connect(path).close()
+        self.path = path
+        self._thread = threading.Thread(target=self._run, args=(path,), name="llmview-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, flow: http.HTTPFlow, match: Optional[Dict[str, Any]] = None) -> bool:
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait((flow, match))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self, path: str) -> None:
+        conn = connect(path)
+        try:
+            stopping = False
+            while not stopping:
+                flows = [self._queue.get()]
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while len(flows) < self.batch and flows[-1] is not None:
+                    try:
+                        flows.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+                # None 表示停止，写入它之前的所有flow后退出
+                stopping = flows[-1] is None
+                self._write(conn, [item for item in flows if item is not None])
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, flows: List[Tuple[http.HTTPFlow, Optional[Dict[str, Any]]]]) -> None:
+        records = []
+        batch = set()
+        for flow, match in flows:
+            # 相同的消息只在上一个请求已经存档(或在这一批中)时跳过，否则仍然完整索引
+            skip = 0
+            if match and (match["flow"] in batch or _archived(conn, match["flow"])):
+                skip = match["common"]
+            batch.add(flow.id)
+            try:
+                record = parse_call(flow, skip)
+            except Exception as e:
+                self.failed += 1
+                logging.warning(f"Could not archive flow {flow.id}: {e}")
+                continue
+            if record is not None:
+                records.append(record)
+        if not records:
+            return
+        try:
+            write_records(conn, records)
+            self.written += len(records)
+        except sqlite3.Error as e:
+            self.failed += len(records)
+            logging.error(f"Could not write {len(records)} flows to {self.path}: {e}")
+
+    def stop(self) -> None:
+        """写入队列中剩余的flow后停止写线程"""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> str:
+        return (
+            f"archive: {self.path or 'disabled'}, written {self.written}, queued {self._queue.qsize()}, "
+            f"dropped {self.dropped}, failed {self.failed}"
+        )
+
+
+def format_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """按列对齐输出查询结果"""
+    cells = [[str(column) for column in columns]] + [
+        ["" if value is None else str(value).replace("\n", " ") for value in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    lines = ["  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in cells]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines) + "\n"
+
+
+SEARCH_SQL = """
+SELECT datetime(calls.timestamp, 'unixepoch', 'localtime') AS time, calls.flow_id, calls.model,
+       calls.prompt_tokens, calls.completion_tokens, round(calls.latency, 2) AS latency,
+       calls.finish_reason, calls.tool_names,
+       snippet(call_text, -1, '[', ']', '...', 12) AS match
+FROM call_text JOIN calls ON calls.id = call_text.rowid
+WHERE call_text MATCH ?
+ORDER BY calls.timestamp DESC
+LIMIT ?
+"""
+
+
+class ArchiveAddon:
+    """把完成的LLM flow写入 llmview_archive 指定的SQLite数据库"""
+
+    def __init__(self):
+        self.writer = ArchiveWriter()
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_archive",
+            typespec=str,
+            default="",
+            help="Write every completed LLM flow to this SQLite database, with full-text search over messages and tool calls. Empty disables the archive.",
+        )
+        loader.add_option(
+            name="llmview_archive_batch",
+            typespec=int,
+            default=DEFAULT_BATCH,
+            help="Maximum number of flows written to the archive in one transaction.",
+        )
+
+    def configure(self, updated):
+        if "llmview_archive_batch" in updated:
+            self.writer.batch = max(ctx.options.llmview_archive_batch, 1)
+        if "llmview_archive" not in updated:
+            return
+        path = ctx.options.llmview_archive
+        if not path:
+            self.writer.stop()
+            return
+        try:
+            self.writer.start(path)
+        except sqlite3.Error as e:
+            raise exceptions.OptionsError(f"Cannot open LLM archive {path}: {e}") from e
+
+    def response(self, flow: http.HTTPFlow):
+        if not self.writer.running or endpoints.classify(flow) is None:
+            return
+        match = flow.metadata.get(CONVERSATION_METADATA_KEY)
+        # 对话索引在分析线程中进行，排在它后面提交才能拿到这个flow的匹配结果
+        if not flow_analysis.submit(flow, lambda f, pending: self._submit(f, pending.get(CONVERSATION_METADATA_KEY, match))):
+            self.writer.submit(flow, match)
+
+    def _submit(self, flow: http.HTTPFlow, match: Optional[Dict[str, Any]]) -> None:
+        self.writer.submit(flow, match)
+
+    def _query(self, sql: str, parameters: Sequence[Any] = ()) -> str:
+        if not self.writer.path:
+            raise exceptions.CommandError("The LLM archive is disabled, set the llmview_archive option first.")
+        try:
+            conn = connect(self.writer.path, readonly=True)
+            try:
+                cursor = conn.execute(sql, parameters)
+                columns = [column[0] for column in cursor.description or []]
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            raise exceptions.CommandError(f"Archive query failed: {e}") from e
+        if not columns:
+            return "OK\n"
+        return format_rows(columns, rows)
+
+    @command.command("llmview.archive_search")
+    def search(self, query: str, limit: int = 20) -> str:
+        """全文搜索消息和工具调用，query 为FTS5语法，例如: tool_calls: read_file AND config"""
+        return self._query(SEARCH_SQL, (query, limit))
+
+    @command.command("llmview.archive_sql")
+    def sql(self, statement: str) -> str:
+        """在只读连接上执行SQL，例如按 model、token数或工具名过滤"""
+        return self._query(statement)
+
+    @command.command("llmview.archive_stats")
+    def archive_stats(self) -> str:
+        return self.writer.stats()
+
+    def done(self):
+        self.writer.stop()
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from mitmproxy import ctx
+
+from llmview.cache import flow_cache
+
+
+@dataclass
+class RenderBudget:
+    """
+    渲染预算，0 表示不限制:
+      - max_chars        : 输出的最大字符数，超出后剩余部分只显示占位信息
+      - max_messages     : 消息数超过该值时，只完整渲染首尾各 edge_messages 条
+      - edge_messages    : 首尾完整渲染的消息数
+      - max_message_chars: 单条消息内容的最大字符数
+    """
+
+    max_chars: int = 2_000_000
+    max_messages: int = 0
+    edge_messages: int = 20
+    max_message_chars: int = 0
+
+    def message_window(self, count: int) -> Tuple[int, int]:
+        """返回被省略的消息区间 [start, end)，不需要省略时区间为空"""
+        if not self.max_messages or count <= self.max_messages:
+            return count, count
+        edge = min(self.edge_messages, self.max_messages // 2)
+        return edge, count - edge
+
+    def clip(self, text: str) -> str:
+        """按 max_message_chars 截断单条消息的内容"""
+        limit = self.max_message_chars
+        if not limit or not isinstance(text, str) or len(text) <= limit:
+            return text
+        return f"{text[:limit]}\n... [{len(text) - limit} more chars omitted]"
+
+
+render_budget = RenderBudget()
+
+
+class TextBuilder:
+    """用列表收集输出片段，最后一次性拼接，并记录已经输出的字符数"""
+
+    def __init__(self, max_chars: int = 0) -> None:
+        self.max_chars = max_chars
+        self.size = 0
+        self._parts: List[str] = []
+
+    def append(self, text: str) -> None:
+        self._parts.append(text)
+        self.size += len(text)
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.max_chars) and self.size >= self.max_chars
+
+    def build(self) -> str:
+        return "".join(self._parts)
+
+
+def format_size(size: int) -> str:
+    """把字符数格式化为易读的大小"""
+    if size < 1024:
+        return f"{size} chars"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f}K chars"
+    return f"{size / 1024 / 1024:.1f}M chars"
+
+
+class RenderBudgetAddon:
+    """注册渲染预算相关的option"""
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_render_max_chars",
+            typespec=int,
+            default=RenderBudget.max_chars,
+            help="Stop rendering LLM request messages and tools once the output reaches this many characters. 0 means unlimited.",
+        )
+        loader.add_option(
+            name="llmview_render_max_messages",
+            typespec=int,
+            default=RenderBudget.max_messages,
+            help="When a request has more messages than this, only the first and last llmview_render_edge_messages are rendered in full. 0 means unlimited.",
+        )
+        loader.add_option(
+            name="llmview_render_edge_messages",
+            typespec=int,
+            default=RenderBudget.edge_messages,
+            help="Number of messages rendered in full at each end of a request that exceeds llmview_render_max_messages.",
+        )
+        loader.add_option(
+            name="llmview_render_max_message_chars",
+            typespec=int,
+            default=RenderBudget.max_message_chars,
+            help="Truncate the content of a single message to this many characters. 0 means unlimited.",
+        )
+
+    def configure(self, updated):
+        names = {
+            "llmview_render_max_chars": "max_chars",
+            "llmview_render_max_messages": "max_messages",
+            "llmview_render_edge_messages": "edge_messages",
+            "llmview_render_max_message_chars": "max_message_chars",
+        }
+        changed = False
+        for option, field in names.items():
+            if option in updated:
+                setattr(render_budget, field, getattr(ctx.options, option))
+                changed = True
+        if changed:
+            # 已缓存的渲染结果是按旧的预算生成的
+            flow_cache.clear()
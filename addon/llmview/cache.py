@@ -0,0 +1,239 @@
+import contextlib
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from mitmproxy import command, contentviews, ctx
+from mitmproxy.flow import Flow
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+CacheKey = Tuple[str, bytes]
+# (key, slot) -> (结果, 占用的字节数)
+PendingResults = Dict[Tuple[CacheKey, str], Tuple[Any, int]]
+
+
+def content_digest(data: bytes) -> bytes:
+    """计算body的内容摘要，用于识别同一个flow中被修改过的内容"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def stamp_body(stored: Dict[str, Any], data: bytes) -> None:
+    """记录保存在 flow.metadata 中的结果对应的body(长度和摘要)"""
+    stored["bytes"] = len(data)
+    stored["digest"] = content_digest(data)
+
+
+def matches_body(stored: Dict[str, Any], data: bytes) -> bool:
+    """body 是否仍然是 stamp_body() 记录的那个，长度相同的修改也能识别"""
+    return stored.get("bytes") == len(data) and stored.get("digest") == content_digest(data)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class _Entry:
+    __slots__ = ("slots", "size")
+
+    def __init__(self) -> None:
+        self.slots: Dict[str, Any] = {}
+        self.size = 0
+
+
+class FlowCache:
+    """
+    按 (flow.id, 内容摘要) 索引的LRU缓存，所有contentview共享。
+    与flow无关的结果使用 (命名空间, 内容摘要) 作为键。
+
+    每个条目下按slot保存不同阶段的结果，例如:
+      - "json"          : json.loads 之后的对象
+      - "sse-events"    : 解析后的SSE事件列表
+      - "sse-aggregate" : 聚合后的SSE响应
+      - <view name>     : 该视图渲染出的文本
+      - "tools"         : 渲染出的每个tool定义(键为 ("tools", tools数组的摘要))
+    占用的字节数是估算值: 文本按长度计算，解析结果按原始body长度计算。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.size = 0
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # 正在计算中的 (key, slot)
+        self._computing: Dict[Tuple[CacheKey, str], threading.Event] = {}
+        # 持久化渲染结果的磁盘缓存(diskcache.DiskRenderCache)，由 DiskCacheAddon 设置
+        self.disk: Any = None
+        self._lock = threading.Lock()
+        # deferred() 中当前线程收集的结果
+        self._local = threading.local()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, metadata: contentviews.Metadata, data: bytes) -> Optional[CacheKey]:
+        """返回缓存键，缓存被禁用或没有flow时返回None"""
+        return self.flow_key(metadata.flow, data)
+
+    def flow_key(self, flow: Optional[Flow], data: bytes) -> Optional[CacheKey]:
+        if self.max_bytes <= 0 or flow is None:
+            return None
+        return flow.id, content_digest(data)
+
+    def content_key(self, namespace: str, data: bytes) -> Optional[CacheKey]:
+        """
+        返回只与内容有关的缓存键，用于在不同flow之间共享结果，
+        例如同一个客户端每次请求都会重发的 tools 定义。
+        """
+        if self.max_bytes <= 0:
+            return None
+        return namespace, content_digest(data)
+
+    def get_or_compute(
+        self,
+        key: Optional[CacheKey],
+        slot: str,
+        compute: Callable[[], Any],
+        size: Union[int, Callable[[Any], int], None] = None,
+    ) -> Any:
+        """
+        读取key下的slot，未命中时调用compute计算并写入缓存。
+        size为None时按结果的长度计算占用(适用于渲染出的文本)，
+        也可以是根据结果计算占用的函数。
+
+        另一个线程(例如后台预渲染)正在计算同一个slot时，等待它的结果，
+        不重复计算。设置了磁盘缓存时，视图渲染的文本先从磁盘读取，计算后写入磁盘。
+        """
+        if key is None:
+            return compute()
+        pending = (key, slot)
+        collected = self._collected()
+        if collected is not None and pending in collected:
+            return collected[pending][0]
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and slot in entry.slots:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return entry.slots[slot]
+                event = self._computing.get(pending)
+                if event is None:
+                    self.stats.misses += 1
+                    event = self._computing[pending] = threading.Event()
+                    break
+            # 对方计算失败或结果太大没有写入缓存时，下一轮循环由自己计算
+            event.wait()
+
+        try:
+            disk = self.disk if self.disk is not None and self.disk.persists(slot) else None
+            value = disk.get(slot, key[1]) if disk is not None else None
+            if value is None:
+                value = compute()
+                if disk is not None and isinstance(value, str):
+                    disk.put(slot, key[1], value)
+            if size is None:
+                size = len(value)
+            elif callable(size):
+                size = size(value)
+            self.store(key, slot, value, size)
+        finally:
+            with self._lock:
+                del self._computing[pending]
+            event.set()
+        return value
+
+    def store(self, key: CacheKey, slot: str, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        collected = self._collected()
+        if collected is not None:
+            collected[(key, slot)] = (value, size)
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            else:
+                self._entries.move_to_end(key)
+            if slot not in entry.slots:
+                entry.size += size
+                self.size += size
+            entry.slots[slot] = value
+            self._evict()
+
+    def _collected(self) -> Optional[PendingResults]:
+        return getattr(self._local, "collected", None)
+
+    @contextlib.contextmanager
+    def deferred(self, collected: Optional[PendingResults] = None) -> Iterator[PendingResults]:
+        """
+        在这个上下文中，当前线程计算的结果不写入缓存，而是收集到返回的dict中，
+        同一个线程之后的读取先查找收集到的结果。后台线程用它把结果交给事件循环线程，
+        再由 store_all() 写入缓存。传入 collected 时继续使用之前收集的结果。
+        """
+        if collected is None:
+            collected = {}
+        self._local.collected = collected
+        try:
+            yield collected
+        finally:
+            self._local.collected = None
+
+    def store_all(self, collected: PendingResults) -> None:
+        for (key, slot), (value, size) in collected.items():
+            self.store(key, slot, value, size)
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def discard_flow(self, flow_id: str) -> None:
+        """删除一个flow的所有缓存，例如flow被删除时"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == flow_id]:
+                self.size -= self._entries.pop(key).size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _evict(self) -> None:
+        while self._entries and self.size > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self.size -= entry.size
+            self.stats.evictions += 1
+
+
+flow_cache = FlowCache()
+
+
+class FlowCacheAddon:
+    """注册缓存相关的option和command"""
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_cache_bytes",
+            typespec=int,
+            default=DEFAULT_MAX_BYTES,
+            help="Memory budget in bytes for the shared LLM view parse/render cache. Set to 0 to disable.",
+        )
+
+    def configure(self, updated):
+        if "llmview_cache_bytes" in updated:
+            flow_cache.resize(ctx.options.llmview_cache_bytes)
+
+    @command.command("llmview.cache_stats")
+    def cache_stats(self) -> str:
+        stats = flow_cache.stats
+        return (
+            f"entries={len(flow_cache)} bytes={flow_cache.size}/{flow_cache.max_bytes} "
+            f"hits={stats.hits} misses={stats.misses} evictions={stats.evictions}"
+        )
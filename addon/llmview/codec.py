@@ -0,0 +1,127 @@
+"""
+所有 addon 共用的JSON编解码入口。
+
+安装了 orjson 或 msgspec 时优先使用，否则回退到标准库 json。
+可以通过环境变量 LLMVIEW_JSON_BACKEND=orjson|msgspec|json 指定后端。
+快速后端无法处理的输入(超出64位的整数、NaN等)会回退到标准库，
+解析失败时统一抛出 json.JSONDecodeError。
+"""
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+JSONDecodeError = json.JSONDecodeError
+
+_fast_loads: Optional[Callable[[Union[bytes, str]], Any]] = None
+_fast_dumps_pretty: Optional[Callable[[Any], str]] = None
+_fast_dumps_compact: Optional[Callable[[Any], str]] = None
+
+
+def _use_orjson() -> bool:
+    global _fast_loads, _fast_dumps_pretty, _fast_dumps_compact
+    try:
+        import orjson
+    except ImportError:
+        return False
+
+    def _dumps_pretty(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+    def _dumps_compact(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    _fast_loads = orjson.loads
+    _fast_dumps_pretty = _dumps_pretty
+    _fast_dumps_compact = _dumps_compact
+    return True
+
+
+def _use_msgspec() -> bool:
+    global _fast_loads, _fast_dumps_pretty, _fast_dumps_compact
+    try:
+        import msgspec
+    except ImportError:
+        return False
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def _dumps_pretty(obj: Any) -> str:
+        return msgspec.json.format(encoder.encode(obj), indent=2).decode("utf-8")
+
+    def _dumps_compact(obj: Any) -> str:
+        return encoder.encode(obj).decode("utf-8")
+
+    _fast_loads = decoder.decode
+    _fast_dumps_pretty = _dumps_pretty
+    _fast_dumps_compact = _dumps_compact
+    return True
+
+
+def _select_backend() -> str:
+    requested = os.environ.get("LLMVIEW_JSON_BACKEND", "").lower()
+    if requested in ("json", "stdlib"):
+        return "json"
+    candidates = {"orjson": _use_orjson, "msgspec": _use_msgspec}
+    order = ["msgspec", "orjson"] if requested == "msgspec" else ["orjson", "msgspec"]
+    for name in order:
+        if candidates[name]():
+            return name
+    return "json"
+
+
+BACKEND = _select_backend()
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """解析JSON，失败时抛出 json.JSONDecodeError"""
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(data)
+        except Exception:
+            # 交给标准库重新解析: 成功则是快速后端不支持的输入，失败则抛出标准的异常
+            pass
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _reindent(text: str, indent: int) -> str:
+    """把2个空格缩进的JSON文本转换为 indent 个空格缩进"""
+    factor = indent // 2
+    lines = text.split("\n")
+    for i, line in enumerate(lines):
+        stripped = line.lstrip(" ")
+        if len(stripped) != len(line):
+            lines[i] = " " * ((len(line) - len(stripped)) * factor) + stripped
+    return "\n".join(lines)
+
+
+def dumps_pretty(obj: Any, indent: int = 2) -> str:
+    """格式化为带缩进的JSON文本，不转义非ASCII字符"""
+    if _fast_dumps_pretty is not None and indent > 0 and indent % 2 == 0:
+        try:
+            text = _fast_dumps_pretty(obj)
+        except Exception:
+            pass
+        else:
+            return text if indent == 2 else _reindent(text, indent)
+    return json.dumps(obj, indent=indent, ensure_ascii=False)
+
+
+def dumps_inline(obj: Any) -> str:
+    """
+    格式化为单行JSON文本，不转义非ASCII字符，分隔符与 json.dumps 的默认值相同(", " 和 ": ")。
+    用于视图中显示的文本，快速后端只能输出紧凑格式，这里总是使用标准库。
+    """
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def dumps_compact(obj: Any) -> str:
+    """格式化为紧凑的单行JSON文本，不转义非ASCII字符，用于计算摘要和保存"""
+    if _fast_dumps_compact is not None:
+        try:
+            return _fast_dumps_compact(obj)
+        except Exception:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
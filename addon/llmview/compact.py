@@ -0,0 +1,321 @@
+"""
+已完成的 /chat/completions SSE流的紧凑存储。
+
+流式响应的每个chunk都重复 id, model, created, system_fingerprint 等字段，很长的推理流
+往往是聚合结果的几十倍。开启 llmview_compact_streams 后，流结束时把响应body替换为只有
+一个事件的SSE body(aggregate_sse_to_json 的聚合结果)，在 flow.metadata 中保存紧凑的
+逐chunk索引:
+
+  - templates: 去掉delta中的字符串之后的事件JSON，相同结构的事件只保存一次
+  - 每个事件 : 模板编号、每个delta字符串的长度、事件完整到达时已接收的字节数和时间
+
+delta中的字符串按顺序拼接就是聚合结果中对应路径的字符串，所以只需要保存长度，
+需要逐chunk的body时(导出、重放)按长度从聚合结果中依次切出每个片段，重新生成
+等价的SSE body(JSON的空白和转义可能与原始数据不同)，并按保存的接收字节数还原
+网络chunk的边界和到达时间。
+索引只包含基础类型和bytes，可以随flow一起保存到 .mitm 文件。
+"""
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from mitmproxy import http
+
+from llmview import codec
+from llmview.cache import matches_body, stamp_body
+from llmview.merge import JsonMerger
+from llmview.sse import SSEEvent, iter_sse_json
+
+# 紧凑索引保存在 flow.metadata 中的键
+COMPACT_METADATA_KEY = "llmview.compact_stream"
+# 还原之后每个网络chunk的边界和到达时间保存在 flow.metadata 中的键
+TIMING_METADATA_KEY = "llmview.stream_timing"
+# 不同结构的事件超过这个数量时放弃，例如每个chunk都带有随机填充字段的流
+MAX_TEMPLATES = 256
+# 紧凑存储至少要比原始body小这么多倍才替换
+MIN_RATIO = 2.0
+
+# delta字符串在模板中的占位符，原始事件中出现同样的字符串时放弃
+_PLACEHOLDER = "\x00"
+_ENCODED_PLACEHOLDER = codec.dumps_compact(_PLACEHOLDER)
+
+# 路径中的字符串是字典的键，整数是数组中元素的index字段
+Path = Tuple[Union[str, int], ...]
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _strip(value: Any, path: Path, in_delta: bool, fragments: List[str], paths: List[Path]) -> Any:
+    """
+    复制事件，把delta中的字符串替换为占位符，按出现顺序记录字符串和它的路径。
+    delta上下文的判断与 JsonMerger 相同: 路径中有键包含"delta"。
+    """
+    if isinstance(value, dict):
+        stripped = {}
+        for key, item in value.items():
+            item_in_delta = in_delta or "delta" in key.lower()
+            if isinstance(item, str) and item_in_delta:
+                fragments.append(item)
+                paths.append(path + (key,))
+                stripped[key] = _PLACEHOLDER
+            elif isinstance(item, (dict, list)):
+                stripped[key] = _strip(item, path + (key,), item_in_delta, fragments, paths)
+            else:
+                stripped[key] = item
+        return stripped
+    stripped_list = []
+    for item in value:
+        index = item.get("index") if isinstance(item, dict) else None
+        if type(index) is int:
+            stripped_list.append(_strip(item, path + (index,), in_delta, fragments, paths))
+        elif in_delta:
+            # 没有index的元素在聚合结果中按出现顺序追加，无法定位
+            raise _Unsupported()
+        else:
+            stripped_list.append(item)
+    return stripped_list
+
+
+def _resolve(value: Any, path: Path) -> Any:
+    """在聚合结果中按路径查找"""
+    for step in path:
+        if isinstance(step, str):
+            value = value.get(step) if isinstance(value, dict) else None
+        elif isinstance(value, list):
+            value = next((item for item in value if isinstance(item, dict) and item.get("index") == step), None)
+        else:
+            return None
+    return value
+
+
+def _checksum(text: str, crc: int = 0) -> int:
+    return zlib.crc32(text.encode("utf-8", "surrogatepass"), crc)
+
+
+class StreamCompactor:
+    """
+    逐个接收SSE事件，同时聚合事件和建立索引，流结束时调用 finish()。
+    遇到无法紧凑保存的流(event/id字段、非JSON数据、无法定位的delta等)时
+    标记为失败并释放已经保存的数据，之后的事件直接忽略。
+    """
+
+    def __init__(self) -> None:
+        self.failed = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._merger = JsonMerger()
+        self._done = False
+        # 模板JSON文本 -> 模板编号
+        self._templates: Dict[str, int] = {}
+        self._template_parts: List[List[str]] = []
+        self._template_paths: List[List[int]] = []
+        self._paths: Dict[Path, int] = {}
+        # 每个路径上已经出现的字符数和CRC32，用于在结束时验证聚合结果
+        self._checks: List[List[int]] = []
+        self._events = array("I")
+        self._lengths = array("I")
+        self._received = array("I")
+        # 相对于第一个事件的秒数，float32的精度对于几个小时内的流足够
+        self._start: Optional[float] = None
+        self._timestamps = array("f")
+
+    def fail(self) -> None:
+        self.failed = True
+        self._reset()
+
+    def feed(self, event: SSEEvent, objs: List[Any], received: int, timestamp: float) -> None:
+        """objs 是 decode_sse_json(event) 的结果，received 是事件完整到达时已接收的字节数"""
+        if self.failed:
+            return
+        if event.event != "message" or event.id is not None or event.retry is not None:
+            self.fail()
+            return
+        if not objs:
+            if event.data.strip() != "[DONE]":
+                self.fail()
+                return
+            self._done = True
+            if not self._add(event.data, [], received, timestamp):
+                self.fail()
+            return
+        if len(objs) != 1 or not isinstance(objs[0], dict):
+            self.fail()
+            return
+        fragments: List[str] = []
+        paths: List[Path] = []
+        try:
+            skeleton = _strip(objs[0], (), False, fragments, paths)
+        except _Unsupported:
+            self.fail()
+            return
+        if not self._add(codec.dumps_compact(skeleton), fragments, received, timestamp, paths):
+            self.fail()
+            return
+        self._merger.merge(objs[0])
+
+    def _add(self, text: str, fragments: List[str], received: int, timestamp: float, paths: Optional[List[Path]] = None) -> bool:
+        template = self._templates.get(text)
+        if template is None:
+            parts = text.split(_ENCODED_PLACEHOLDER) if fragments else [text]
+            if len(parts) != len(fragments) + 1 or len(self._template_parts) >= MAX_TEMPLATES:
+                return False
+            path_ids = []
+            for path in paths or []:
+                path_id = self._paths.get(path)
+                if path_id is None:
+                    path_id = self._paths[path] = len(self._checks)
+                    self._checks.append([0, 0])
+                path_ids.append(path_id)
+            template = self._templates[text] = len(self._template_parts)
+            self._template_parts.append(parts)
+            self._template_paths.append(path_ids)
+        # 相同的模板意味着相同的结构，路径也相同
+        for path_id, fragment in zip(self._template_paths[template], fragments):
+            check = self._checks[path_id]
+            check[0] += len(fragment)
+            check[1] = _checksum(fragment, check[1])
+            self._lengths.append(len(fragment))
+        self._events.append(template)
+        if self._start is None:
+            self._start = timestamp
+        self._received.append(received)
+        self._timestamps.append(timestamp - self._start)
+        return True
+
+    def finish(self, original_bytes: int) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """
+        返回 (紧凑的body, 保存到 flow.metadata 的索引)，
+        无法紧凑保存或者节省的空间不够时返回None。
+        """
+        if self.failed or not self._events:
+            return None
+        aggregate = self._merger.result()
+        paths = sorted(self._paths, key=self._paths.__getitem__)
+        # 聚合结果中每个路径的字符串必须恰好是各个片段按顺序的拼接
+        for path, (length, crc) in zip(paths, self._checks):
+            value = _resolve(aggregate, path)
+            if not isinstance(value, str) or len(value) != length or _checksum(value) != crc:
+                return None
+        try:
+            body = b"data: " + codec.dumps_compact(aggregate).encode("utf-8") + b"\n\n"
+        except UnicodeEncodeError:
+            return None
+        if self._done:
+            body += b"data: [DONE]\n\n"
+        stored = {
+            "original_bytes": original_bytes,
+            "start": self._start,
+            "templates": self._template_parts,
+            "template_paths": self._template_paths,
+            "paths": [list(path) for path in paths],
+            "events": self._events.tobytes(),
+            "lengths": self._lengths.tobytes(),
+            "received": self._received.tobytes(),
+            "timestamps": self._timestamps.tobytes(),
+        }
+        if (len(body) + stored_size(stored)) * MIN_RATIO > original_bytes:
+            return None
+        stamp_body(stored, body)
+        return body, stored
+
+
+def stored_size(stored: Dict[str, Any]) -> int:
+    """估算索引占用的字节数"""
+    size = sum(len(stored[name]) for name in ("events", "lengths", "received", "timestamps"))
+    size += sum(len(part) for parts in stored["templates"] for part in parts)
+    return size + 8 * (sum(map(len, stored["template_paths"])) + sum(map(len, stored["paths"])))
+
+
+def stored_compact(flow: Optional[http.HTTPFlow], data: bytes) -> Optional[Dict[str, Any]]:
+    """读取紧凑索引，body 被修改过时返回None"""
+    if flow is None:
+        return None
+    stored = flow.metadata.get(COMPACT_METADATA_KEY)
+    if stored is None or not matches_body(stored, data):
+        return None
+    return stored
+
+
+def _array(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    return values
+
+
+def iter_rebuilt_events(stored: Dict[str, Any], data: bytes) -> Iterator[Tuple[float, int, str]]:
+    """按索引从紧凑的body还原每个事件，返回 (到达时间, 到达时已接收的字节数, data文本)"""
+    aggregate = next(iter_sse_json(data), None)
+    strings = [_resolve(aggregate, tuple(path)) for path in stored["paths"]]
+    cursors = [0] * len(strings)
+    templates, template_paths = stored["templates"], stored["template_paths"]
+    lengths = _array("I", stored["lengths"])
+    received = _array("I", stored["received"])
+    timestamps = _array("f", stored["timestamps"])
+    k = 0
+    for i, template in enumerate(_array("I", stored["events"])):
+        parts = templates[template]
+        pieces = [parts[0]]
+        for j, path_id in enumerate(template_paths[template]):
+            lo = cursors[path_id]
+            hi = cursors[path_id] = lo + lengths[k]
+            k += 1
+            pieces.append(codec.dumps_compact(strings[path_id][lo:hi]))
+            pieces.append(parts[j + 1])
+        yield stored["start"] + timestamps[i], received[i], "".join(pieces)
+
+
+def rebuild_chunks(flow: http.HTTPFlow) -> Optional[List[Tuple[float, bytes]]]:
+    """
+    按索引还原原始的网络chunk，返回 (到达时间, chunk数据) 列表，用于按原来的节奏重放。
+    同一个网络chunk中完整到达的事件合并为一个chunk；原始数据中跨越chunk边界的事件
+    归入它完整到达的那个chunk。flow没有紧凑保存时返回None。
+    """
+    if flow.response is None:
+        return None
+    data = flow.response.get_content(strict=False) or b""
+    stored = stored_compact(flow, data)
+    if stored is None:
+        return None
+    chunks: List[Tuple[float, bytes]] = []
+    pieces: List[str] = []
+    last_received, last_timestamp = -1, 0.0
+    for timestamp, received, text in iter_rebuilt_events(stored, data):
+        if received != last_received and pieces:
+            chunks.append((last_timestamp, "".join(pieces).encode("utf-8")))
+            pieces = []
+        last_received, last_timestamp = received, timestamp
+        pieces.append(f"data: {text}\n\n")
+    if pieces:
+        chunks.append((last_timestamp, "".join(pieces).encode("utf-8")))
+    return chunks
+
+
+def rebuild_body(flow: http.HTTPFlow) -> Optional[bytes]:
+    """还原逐chunk的SSE body，flow没有紧凑保存时返回None"""
+    chunks = rebuild_chunks(flow)
+    if chunks is None:
+        return None
+    return b"".join(chunk for _, chunk in chunks)
+
+
+def chunk_timing(chunks: List[Tuple[float, bytes]]) -> Dict[str, Any]:
+    """还原后保存在 flow.metadata 中的每个网络chunk的结束位置和到达时间"""
+    ends = array("Q")
+    timestamps = array("d")
+    end = 0
+    for timestamp, chunk in chunks:
+        end += len(chunk)
+        ends.append(end)
+        timestamps.append(timestamp)
+    return {"bytes": end, "ends": ends.tobytes(), "timestamps": timestamps.tobytes()}
+
+
+def iter_timed_chunks(data: bytes, timing: Dict[str, Any]) -> Iterator[Tuple[float, bytes]]:
+    """按 chunk_timing() 保存的边界和时间切分还原后的body"""
+    start = 0
+    for end, timestamp in zip(_array("Q", timing["ends"]), _array("d", timing["timestamps"])):
+        yield timestamp, data[start:end]
+        start = end
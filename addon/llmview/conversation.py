@@ -0,0 +1,164 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mitmproxy import ctx, http
+
+from llmview import codec
+from llmview.analysis import flow_analysis
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import CHAT_COMPLETIONS, COMPLETIONS, JSON, body_type, endpoints
+
+# 对话前缀的匹配结果保存在 flow.metadata 中的键
+CONVERSATION_METADATA_KEY = "llmview.conversation"
+
+# 索引中前缀数的上限，每项约 150 字节(16字节的键和 OrderedDict 的开销，flow id 共享)
+DEFAULT_MAX_PREFIXES = 500_000
+
+
+def message_digest(message: Any) -> bytes:
+    """计算单条消息的摘要"""
+    return hashlib.blake2b(codec.dumps_compact(message).encode("utf-8"), digest_size=16).digest()
+
+
+def message_digests(messages: Sequence[Any]) -> Tuple[List[bytes], List[int]]:
+    """返回每条消息的摘要和紧凑序列化后的字节数"""
+    digests, sizes = [], []
+    for message in messages:
+        data = codec.dumps_compact(message).encode("utf-8")
+        digests.append(hashlib.blake2b(data, digest_size=16).digest())
+        sizes.append(len(data))
+    return digests, sizes
+
+
+def cached_message_digests(key: Optional[CacheKey], messages: Sequence[Any]) -> Tuple[List[bytes], List[int]]:
+    """message_digests() 的结果按flow缓存，对话索引和 prompt cache 分析共用"""
+    return flow_cache.get_or_compute(key, "message-digests", lambda: message_digests(messages), size=len(messages) * 64)
+
+
+def rolling_chain(digests: Sequence[bytes]) -> List[bytes]:
+    """由每一项的摘要滚动计算前缀链: chain[i] 唯一标识前 i+1 项"""
+    chain = []
+    previous = b""
+    for digest in digests:
+        previous = hashlib.blake2b(previous + digest, digest_size=16).digest()
+        chain.append(previous)
+    return chain
+
+
+def prefix_chain(messages: Sequence[Any]) -> List[bytes]:
+    """
+    计算消息列表的前缀链: chain[i] 唯一标识 messages[0..i]，
+    由 chain[i-1] 和 messages[i] 的摘要滚动计算得到。
+    """
+    return rolling_chain([message_digest(message) for message in messages])
+
+
+class ConversationIndex:
+    """
+    记录每个消息前缀最近一次出现在哪个flow中。
+
+    同一个对话的每次请求都会重发完整的历史，新请求的前缀链中能在索引里
+    找到的最长前缀，就是与之前的请求完全相同的部分。
+    """
+
+    def __init__(self, max_prefixes: int = DEFAULT_MAX_PREFIXES) -> None:
+        self.max_prefixes = max_prefixes
+        self._prefixes: "OrderedDict[bytes, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def match(self, chain: List[bytes]) -> Optional[Dict[str, Any]]:
+        """返回索引中最长的相同前缀: {"flow": flow id, "common": 相同的消息数}"""
+        for i in range(len(chain) - 1, -1, -1):
+            flow_id = self._prefixes.get(chain[i])
+            if flow_id is not None:
+                return {"flow": flow_id, "common": i + 1}
+        return None
+
+    def add(self, flow_id: str, chain: List[bytes]) -> None:
+        for prefix in chain:
+            self._prefixes[prefix] = flow_id
+            self._prefixes.move_to_end(prefix)
+        while len(self._prefixes) > self.max_prefixes:
+            self._prefixes.popitem(last=False)
+
+    def resize(self, max_prefixes: int) -> None:
+        self.max_prefixes = max_prefixes
+        while len(self._prefixes) > self.max_prefixes:
+            self._prefixes.popitem(last=False)
+
+    def clear(self) -> None:
+        self._prefixes.clear()
+
+
+conversation_index = ConversationIndex()
+
+
+def index_flow(flow: http.HTTPFlow, pending: Dict[str, Any], keep_match: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    在分析线程中把请求的消息加入对话索引，返回匹配结果 {CONVERSATION_METADATA_KEY: match}。
+    keep_match 为True时(从文件加载的flow保留之前的匹配结果)只把它加入索引。
+    """
+    data = flow.request.get_content(strict=False) or b""
+    key = flow_cache.flow_key(flow, data)
+    try:
+        obj = flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+    except codec.JSONDecodeError:
+        return None
+    messages = obj.get("messages") if isinstance(obj, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return None
+    digests, _ = cached_message_digests(key, messages)
+    chain = rolling_chain(digests)
+    match = None if keep_match else conversation_index.match(chain)
+    conversation_index.add(flow.id, chain)
+    return None if keep_match else {CONVERSATION_METADATA_KEY: match}
+
+
+class ConversationIndexAddon:
+    """
+    响应完成后把LLM请求的消息加入对话索引。
+
+    解析请求和计算摘要在 flow_analysis 的后台线程中进行，不推迟请求和非流式响应的转发；
+    同一个对话的下一个请求在响应返回之后才会发出，按响应的顺序建立索引不影响匹配。
+    匹配结果在分析完成后才写入 flow.metadata。
+    """
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_conversation_index",
+            typespec=bool,
+            default=True,
+            help="Index the messages of LLM requests so the openai-request-delta view can skip history already sent in an earlier flow.",
+        )
+        loader.add_option(
+            name="llmview_conversation_max_prefixes",
+            typespec=int,
+            default=DEFAULT_MAX_PREFIXES,
+            help="Maximum number of message prefixes kept in the conversation index (about 150 bytes each); the least recently seen are dropped first.",
+        )
+
+    def configure(self, updated):
+        if "llmview_conversation_max_prefixes" in updated:
+            max_prefixes = ctx.options.llmview_conversation_max_prefixes
+            # 索引只在分析线程中修改
+            flow_analysis.call(lambda: conversation_index.resize(max_prefixes))
+
+    def running(self):
+        flow_analysis.loop = ctx.master.event_loop
+
+    def response(self, flow: http.HTTPFlow):
+        if not ctx.options.llmview_conversation_index:
+            return
+        if body_type(flow.request.headers.get("content-type")) != JSON:
+            return
+        if endpoints.classify(flow) not in (CHAT_COMPLETIONS, COMPLETIONS):
+            return
+        keep_match = CONVERSATION_METADATA_KEY in flow.metadata
+        flow_analysis.submit(flow, lambda f, pending: index_flow(f, pending, keep_match))
+
+    def done(self):
+        flow_analysis.shutdown()
+        flow_analysis.loop = None
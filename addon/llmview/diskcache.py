@@ -0,0 +1,242 @@
+"""
+保存在SQLite数据库中的渲染结果缓存，重新打开保存的抓包文件时不需要重新渲染。
+
+每个渲染结果的键由以下部分组成:
+  - 视图名
+  - addon版本: llmview 包中所有源文件内容和JSON后端的摘要，代码变化后旧的结果不再命中，
+    打开数据库时删除
+  - 渲染预算(llmview_render_* 选项)
+  - body的内容摘要
+渲染出的文本经过zlib压缩后保存，总大小超过上限时按最后访问时间淘汰最久没有使用的结果。
+
+内存中的 flow_cache 未命中时先读取磁盘缓存，计算出的渲染结果同时写入磁盘缓存。
+只保存只与body有关的视图的结果，依赖其他flow的视图(例如 openai-request-delta)不保存。
+"""
+import dataclasses
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Set
+
+from mitmproxy import command, ctx, exceptions
+
+from llmview import codec
+from llmview.budget import render_budget
+from llmview.cache import flow_cache
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 淘汰时删除到上限的这个比例以下，避免每次写入都要淘汰
+EVICT_TO = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key BLOB PRIMARY KEY,
+    view TEXT NOT NULL,
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renders_accessed ON renders (accessed);
+"""
+
+# 结果可以保存到磁盘的视图名，由 llmview.views.register_all() 注册
+_views: Set[str] = set()
+
+
+def register(name: str) -> None:
+    _views.add(name)
+
+
+def addon_version() -> str:
+    """llmview 包中所有源文件内容的摘要"""
+    digest = hashlib.blake2b(codec.BACKEND.encode("utf-8"), digest_size=8)
+    root = os.path.dirname(os.path.abspath(__file__))
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name != "__pycache__")
+        for name in sorted(filenames):
+            if not name.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, name)
+            digest.update(os.path.relpath(path, root).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+@dataclasses.dataclass
+class DiskCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class DiskRenderCache:
+    """
+    一个SQLite连接在所有线程之间共享，用锁串行访问。
+    前台渲染和后台预渲染线程都会读写，每次读写只涉及一行，持有锁的时间很短。
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, version: Optional[str] = None) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or addon_version()
+        self.stats = DiskCacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            # addon的代码变化后，旧版本的结果不会再命中
+            self._conn.execute("DELETE FROM renders WHERE version != ?", (self.version,))
+        self.size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM renders").fetchone()[0]
+        self._evict()
+
+    def persists(self, view: str) -> bool:
+        return view in _views
+
+    def _key(self, view: str, digest: bytes) -> bytes:
+        # 渲染预算的选项在运行时可能变化，每次计算键时读取
+        context = "|".join(str(value) for value in dataclasses.astuple(render_budget))
+        return hashlib.blake2b(f"{view}\0{self.version}\0{context}\0".encode("utf-8") + digest, digest_size=16).digest()
+
+    def get(self, view: str, digest: bytes) -> Optional[str]:
+        key = self._key(view, digest)
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM renders WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats.misses += 1
+                    return None
+                with self._conn:
+                    self._conn.execute("UPDATE renders SET accessed = ? WHERE key = ?", (time.time(), key))
+                self.stats.hits += 1
+        except sqlite3.Error as e:
+            logging.warning(f"Could not read render cache {self.path}: {e}")
+            return None
+        return zlib.decompress(row[0]).decode("utf-8", "surrogatepass")
+
+    def put(self, view: str, digest: bytes, text: str) -> None:
+        value = zlib.compress(text.encode("utf-8", "surrogatepass"), 1)
+        if len(value) > self.max_bytes:
+            return
+        key = self._key(view, digest)
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute("SELECT size FROM renders WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO renders (key, view, version, size, accessed, value) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, view, self.version, len(value), time.time(), value),
+                )
+                self.size += len(value) - (row[0] if row is not None else 0)
+                self.stats.writes += 1
+                if self.size > self.max_bytes:
+                    self._evict_locked()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not write render cache {self.path}: {e}")
+
+    def _evict(self) -> None:
+        with self._lock, self._conn:
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """按最后访问时间删除最久没有使用的结果，调用方持有锁并在事务中"""
+        target = self.max_bytes * EVICT_TO if self.size > self.max_bytes else self.max_bytes
+        while self.size > target:
+            rows = self._conn.execute("SELECT key, size FROM renders ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                self.size = 0
+                break
+            evicted = []
+            for key, size in rows:
+                if self.size <= target:
+                    break
+                evicted.append((key,))
+                self.size -= size
+            self._conn.executemany("DELETE FROM renders WHERE key = ?", evicted)
+            self.stats.evictions += len(evicted)
+
+    def resize(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM renders")
+            self.size = 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM renders").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DiskCacheAddon:
+    """注册磁盘缓存的option和command，打开的数据库设置为 flow_cache 的磁盘缓存"""
+
+    def __init__(self):
+        self.cache: Optional[DiskRenderCache] = None
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_disk_cache",
+            typespec=str,
+            default="",
+            help=(
+                "Keep rendered LLM views in this SQLite database so reopening a saved capture does not render "
+                "every flow again. Results are invalidated when the addon code changes. Empty disables it."
+            ),
+        )
+        loader.add_option(
+            name="llmview_disk_cache_bytes",
+            typespec=int,
+            default=DEFAULT_MAX_BYTES,
+            help="Size cap in bytes of the on-disk render cache (compressed); least recently used renders are evicted first.",
+        )
+
+    def configure(self, updated):
+        if "llmview_disk_cache" in updated:
+            self._close()
+            path = ctx.options.llmview_disk_cache
+            if path:
+                try:
+                    self.cache = DiskRenderCache(path, ctx.options.llmview_disk_cache_bytes)
+                except (OSError, sqlite3.Error) as e:
+                    raise exceptions.OptionsError(f"Cannot open render cache {path}: {e}") from e
+                flow_cache.disk = self.cache
+        elif "llmview_disk_cache_bytes" in updated and self.cache is not None:
+            self.cache.resize(ctx.options.llmview_disk_cache_bytes)
+
+    def _close(self) -> None:
+        if self.cache is not None:
+            flow_cache.disk = None
+            self.cache.close()
+            self.cache = None
+
+    @command.command("llmview.disk_cache_stats")
+    def disk_cache_stats(self) -> str:
+        if self.cache is None:
+            return "disk cache: disabled"
+        stats = self.cache.stats
+        return (
+            f"disk cache: {self.cache.path} version={self.cache.version} entries={self.cache.count()} "
+            f"bytes={self.cache.size}/{self.cache.max_bytes} hits={stats.hits} misses={stats.misses} "
+            f"writes={stats.writes} evictions={stats.evictions}"
+        )
+
+    @command.command("llmview.disk_cache_clear")
+    def disk_cache_clear(self) -> None:
+        if self.cache is not None:
+            self.cache.clear()
+
+    def done(self):
+        self._close()
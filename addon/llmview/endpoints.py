@@ -0,0 +1,161 @@
+"""
+LLM API 端点的识别。
+
+所有视图的 render_priority 共用同一份预编译的匹配规则，每个flow只识别一次，
+结果保存在 flow.metadata 中，之后每次打开flow时只需要查表。
+"""
+import hashlib
+import re
+from typing import List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from mitmproxy import contentviews, ctx, exceptions
+from mitmproxy.flow import Flow
+from mitmproxy.http import Request, Response
+
+# 端点识别结果保存在 flow.metadata 中的键
+ENDPOINT_METADATA_KEY = "llmview.endpoint"
+
+CHAT_COMPLETIONS = "chat_completions"
+COMPLETIONS = "completions"
+RESPONSES = "responses"
+ANTHROPIC_MESSAGES = "anthropic_messages"
+
+KINDS = (CHAT_COMPLETIONS, COMPLETIONS, RESPONSES, ANTHROPIC_MESSAGES)
+
+# 默认规则只匹配路径(不含查询参数)的结尾，可以覆盖:
+#   /v1/chat/completions
+#   /openai/deployments/{id}/chat/completions?api-version=...  (Azure)
+#   /api/openai/v1/chat/completions                            (自建网关)
+#   /v1/messages                                               (Anthropic)
+DEFAULT_RULES = (
+    f"{CHAT_COMPLETIONS}=/chat/completions/?$",
+    f"{COMPLETIONS}=/completions/?$",
+    f"{RESPONSES}=/responses/?$",
+    f"{ANTHROPIC_MESSAGES}=/v1/messages/?$",
+)
+
+# 消息的类型
+REQUEST = "request"
+RESPONSE = "response"
+
+# body 的类型
+JSON = "json"
+SSE = "sse"
+
+# (端点, 消息类型, body类型)，视图用它查找自己的优先级
+MessageClass = Tuple[str, str, str]
+
+
+class Rule(NamedTuple):
+    kind: str
+    host: Optional[Pattern[str]]
+    path: Pattern[str]
+
+
+def parse_rule(spec: str) -> Rule:
+    """
+    解析一条规则: "<kind>=<path regex>" 或 "<kind>@<host regex>=<path regex>"，
+    正则使用 re.search 匹配去掉查询参数后的路径。
+    """
+    target, sep, path = spec.partition("=")
+    if not sep or not path:
+        raise ValueError(f"invalid endpoint rule {spec!r}, expected <kind>[@<host regex>]=<path regex>")
+    kind, _, host = target.partition("@")
+    kind = kind.strip()
+    if kind not in KINDS:
+        raise ValueError(f"unknown endpoint kind {kind!r} in {spec!r}, expected one of {', '.join(KINDS)}")
+    try:
+        return Rule(kind, re.compile(host) if host else None, re.compile(path))
+    except re.error as e:
+        raise ValueError(f"invalid regex in endpoint rule {spec!r}: {e}") from None
+
+
+class EndpointRegistry:
+    """按顺序匹配规则，第一条匹配的规则决定端点类型"""
+
+    def __init__(self, specs: Sequence[str] = ()) -> None:
+        self.rules: List[Rule] = []
+        self.signature = ""
+        self.configure(specs)
+
+    def configure(self, specs: Sequence[str]) -> None:
+        """设置自定义规则，自定义规则优先于默认规则"""
+        all_specs = [*specs, *DEFAULT_RULES]
+        self.rules = [parse_rule(spec) for spec in all_specs]
+        # 规则改变后，flow.metadata 中按旧规则识别的结果失效
+        self.signature = hashlib.blake2b("\n".join(all_specs).encode("utf-8"), digest_size=8).hexdigest()
+
+    def match(self, host: str, path: str) -> Optional[str]:
+        path = path.split("?", 1)[0]
+        for rule in self.rules:
+            if rule.host is not None and not rule.host.search(host):
+                continue
+            if rule.path.search(path):
+                return rule.kind
+        return None
+
+    def classify(self, flow: Optional[Flow]) -> Optional[str]:
+        """返回flow的端点类型，结果保存在 flow.metadata 中"""
+        if flow is None:
+            return None
+        stored = flow.metadata.get(ENDPOINT_METADATA_KEY)
+        if stored is not None and stored.get("rules") == self.signature:
+            return stored["kind"]
+        request = flow.request
+        kind = self.match(request.pretty_host, request.path)
+        flow.metadata[ENDPOINT_METADATA_KEY] = {"kind": kind, "rules": self.signature}
+        return kind
+
+
+endpoints = EndpointRegistry()
+
+
+def body_type(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    if "text/event-stream" in content_type:
+        return SSE
+    if content_type.startswith("application/") and "json" in content_type:
+        return JSON
+    return None
+
+
+def message_class(metadata: contentviews.Metadata) -> Optional[MessageClass]:
+    """返回 (端点, 消息类型, body类型)，不是LLM API的消息时返回None"""
+    kind = endpoints.classify(metadata.flow)
+    if kind is None:
+        return None
+    message = metadata.http_message
+    if isinstance(message, Request):
+        side = REQUEST
+    elif isinstance(message, Response):
+        side = RESPONSE
+    else:
+        return None
+    body = body_type(metadata.content_type)
+    if body is None:
+        return None
+    return kind, side, body
+
+
+class EndpointRegistryAddon:
+    """注册自定义端点规则的option"""
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_endpoints",
+            typespec=Sequence[str],
+            default=[],
+            help=(
+                "Extra LLM endpoint rules, checked before the built-in ones. Each rule is "
+                "<kind>=<path regex> or <kind>@<host regex>=<path regex>, where kind is one of "
+                f"{', '.join(KINDS)} and the path is matched without its query string."
+            ),
+        )
+
+    def configure(self, updated):
+        if "llmview_endpoints" in updated:
+            try:
+                endpoints.configure(ctx.options.llmview_endpoints)
+            except ValueError as e:
+                raise exceptions.OptionsError(str(e)) from None
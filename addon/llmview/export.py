@@ -0,0 +1,206 @@
+"""
+把保存的抓包文件(.mitm)中的LLM flow批量渲染为Markdown或JSONL。
+
+在 addon 目录下运行:
+
+    python -m llmview.export capture.mitm -o capture.md
+    python -m llmview.export capture.mitm -f jsonl --view openai-request --view openai-sse-response -o out.jsonl
+
+flow 按顺序从文件中流式读取，分批交给进程池渲染，同时在途的批次数有上限，
+内存占用与文件大小无关。是否为LLM flow 使用与 render_priority 相同的端点规则判断。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+from mitmproxy import contentviews, http, io
+
+from llmview import precompute
+from llmview.cache import flow_cache
+from llmview.endpoints import endpoints
+from llmview.profiling import profiler
+from llmview.views import load_views
+
+DEFAULT_BATCH = 64
+
+
+_worker_views: Dict[str, Any] = {}
+_worker_selected: List[str] = []
+
+
+def init_worker(endpoint_rules: Sequence[str], selected: Sequence[str]) -> None:
+    """进程池中每个进程的初始化: 加载视图，关闭缓存(每个flow只渲染一次)"""
+    global _worker_views, _worker_selected
+    _worker_views = load_views()
+    _worker_selected = list(selected)
+    endpoints.configure(endpoint_rules)
+    flow_cache.resize(0)
+    profiler.slow_render_ms = 0
+
+
+def render_flow(flow: http.HTTPFlow) -> Dict[str, Any]:
+    """
+    渲染flow的请求和响应。没有指定视图时使用 render_priority 最高的视图，
+    指定了视图时渲染其中所有适用于该消息的视图。
+    """
+    messages: List[http.Message] = [flow.request]
+    if flow.response is not None:
+        messages.append(flow.response)
+    views: Dict[str, str] = {}
+    for message in messages:
+        data = message.get_content(strict=False) or b""
+        if not data:
+            continue
+        metadata = contentviews.Metadata(
+            content_type=message.headers.get("content-type"),
+            flow=flow,
+            http_message=message,
+        )
+        if _worker_selected:
+            candidates = [
+                view
+                for name, view in _worker_views.items()
+                if name in _worker_selected and view.render_priority(data, metadata) > 0
+            ]
+        else:
+            best = precompute.best_view(data, metadata, _worker_views.values())
+            candidates = [best] if best is not None else []
+        for view in candidates:
+            views[view.name] = view.prettify(data, metadata)
+    return {
+        "id": flow.id,
+        "timestamp": flow.request.timestamp_start,
+        "method": flow.request.method,
+        "url": flow.request.pretty_url,
+        "status": flow.response.status_code if flow.response is not None else None,
+        "views": views,
+    }
+
+
+def render_batch(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [render_flow(http.HTTPFlow.from_state(state)) for state in states]
+
+
+def iter_llm_flows(paths: Sequence[str], stats: Dict[str, int]) -> Iterator[http.HTTPFlow]:
+    for path in paths:
+        with open(path, "rb") as f:
+            for flow in io.FlowReader(f).stream():
+                stats["scanned"] += 1
+                if isinstance(flow, http.HTTPFlow) and endpoints.classify(flow) is not None:
+                    yield flow
+
+
+def iter_batches(flows: Iterable[http.HTTPFlow], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for flow in flows:
+        batch.append(flow.get_state())
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def render_all(
+    batches: Iterable[List[Dict[str, Any]]], executor: Optional[Executor], max_in_flight: int
+) -> Iterator[Dict[str, Any]]:
+    """按输入顺序返回渲染结果，同时在途的批次不超过 max_in_flight"""
+    if executor is None:
+        for batch in batches:
+            yield from render_batch(batch)
+        return
+    in_flight: Deque[Future] = deque()
+    for batch in batches:
+        in_flight.append(executor.submit(render_batch, batch))
+        if len(in_flight) >= max_in_flight:
+            yield from in_flight.popleft().result()
+    while in_flight:
+        yield from in_flight.popleft().result()
+
+
+def write_markdown(record: Dict[str, Any], out: TextIO) -> None:
+    status = record["status"] if record["status"] is not None else "no response"
+    out.write(f"# {record['method']} {record['url']} [{status}]\n\n")
+    out.write(f"- flow: {record['id']}\n")
+    out.write(f"- time: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['timestamp']))}\n\n")
+    for name, text in record["views"].items():
+        out.write(f"<!-- view: {name} -->\n{text}\n\n")
+
+
+def write_jsonl(record: Dict[str, Any], out: TextIO) -> None:
+    out.write(json.dumps(record, ensure_ascii=False))
+    out.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m llmview.export",
+        description="Render the LLM flows of saved mitmproxy capture files to Markdown or JSONL.",
+    )
+    parser.add_argument("paths", nargs="+", help="capture files written by mitmproxy (-w / save.file)")
+    parser.add_argument("-o", "--output", help="output file, defaults to stdout")
+    parser.add_argument("-f", "--format", choices=["markdown", "jsonl"], default="markdown")
+    parser.add_argument(
+        "--view",
+        action="append",
+        default=[],
+        help="view to emit, e.g. openai-request, openai-sse-response, openai-json-response; "
+        "may be repeated. Defaults to the view mitmweb would select for each message.",
+    )
+    parser.add_argument(
+        "--endpoint", action="append", default=[], help="extra endpoint rule, same syntax as the llmview_endpoints option"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="render processes, 0 renders inline")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="flows per task sent to a worker")
+    args = parser.parse_args(argv)
+
+    views = load_views()
+    unknown = [name for name in args.view if name not in views]
+    if unknown:
+        parser.error(f"unknown view {', '.join(unknown)}; available: {', '.join(sorted(views))}")
+    try:
+        endpoints.configure(args.endpoint)
+    except ValueError as e:
+        parser.error(str(e))
+
+    write = write_jsonl if args.format == "jsonl" else write_markdown
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    stats = {"scanned": 0, "rendered": 0}
+    start = time.perf_counter()
+    executor = None
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers, initializer=init_worker, initargs=(args.endpoint, args.view)
+        )
+    else:
+        init_worker(args.endpoint, args.view)
+    try:
+        batches = iter_batches(iter_llm_flows(args.paths, stats), max(args.batch, 1))
+        for record in render_all(batches, executor, max(args.workers, 1) * 2):
+            # 指定的视图都不适用于这个flow
+            if not record["views"]:
+                continue
+            write(record, out)
+            stats["rendered"] += 1
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{stats['rendered']} LLM flows rendered ({stats['scanned']} flows scanned) in {elapsed:.1f}s, "
+        f"{stats['rendered'] / elapsed if elapsed else 0:.1f} flows/sec",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
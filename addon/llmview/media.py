@@ -0,0 +1,200 @@
+"""
+请求中内联的图片、音频和文件(data URL 或 base64 字符串)的摘要和导出。
+
+渲染时把这些数据替换为一行摘要: 媒体类型、解码后的大小和短摘要，
+不复制也不输出base64内容。需要原始数据时用 llmview.export_blob 命令按摘要导出。
+"""
+import base64
+import binascii
+import hashlib
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from mitmproxy import command, exceptions, flow, http, types
+
+from llmview import codec
+from llmview.cache import flow_cache
+
+# data:[<media type>][;参数]*;base64,
+_DATA_URL = re.compile(r"data:([\w.+-]+/[\w.+-]+)?((?:;[\w.+-]+=[^;,]*)*);base64,")
+_BASE64_HEAD = re.compile(r"[A-Za-z0-9+/_-]{64}")
+
+# 不是 data URL 的字符串，长度达到这个值并且看起来是base64时才视为二进制数据
+MIN_RAW_BASE64 = 1024
+DIGEST_SIZE = 6
+
+# 这些字段中的base64字符串的媒体类型无法从内容得知，用 format 字段补充
+_AUDIO_FORMATS = {"wav": "audio/wav", "mp3": "audio/mpeg", "flac": "audio/flac", "opus": "audio/opus", "pcm16": "audio/pcm"}
+
+
+class Blob:
+    """请求中一段内联的base64数据，只记录位置信息，不解码"""
+
+    def __init__(self, media_type: str, value: str, offset: int) -> None:
+        self.media_type = media_type
+        # value[offset:] 是base64数据
+        self.value = value
+        self.offset = offset
+
+    @property
+    def encoded_size(self) -> int:
+        return len(self.value) - self.offset
+
+    @property
+    def decoded_size(self) -> int:
+        """根据base64长度和末尾的填充计算解码后的大小，不需要解码"""
+        size = self.encoded_size
+        padding = 2 if self.value.endswith("==") else 1 if self.value.endswith("=") else 0
+        return size * 3 // 4 - padding
+
+    @property
+    def digest(self) -> str:
+        return blob_digest(self.value, self.offset)
+
+    def decode(self) -> bytes:
+        data = self.value[self.offset :]
+        if "-" in data or "_" in data:
+            return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+        return base64.b64decode(data + "=" * (-len(data) % 4))
+
+    def summary(self) -> str:
+        return f"[{self.media_type}, {format_bytes(self.decoded_size)}, #{self.digest}]"
+
+
+def blob_digest(value: str, offset: int = 0) -> str:
+    # 摘要由base64文本计算，只做一次C实现的哈希，不解码
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    digest.update(value[offset:].encode("ascii", errors="replace"))
+    return digest.hexdigest()
+
+
+def format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+
+def as_blob(value: Any, media_type: Optional[str] = None) -> Optional[Blob]:
+    """字符串是 data URL 或较长的base64数据时返回 Blob，只检查开头部分"""
+    if not isinstance(value, str):
+        return None
+    if value.startswith("data:"):
+        match = _DATA_URL.match(value, 0, 512)
+        if match is not None:
+            return Blob(match.group(1) or media_type or "application/octet-stream", value, match.end())
+        return None
+    if len(value) >= MIN_RAW_BASE64 and _BASE64_HEAD.match(value):
+        return Blob(media_type or "base64", value, 0)
+    return None
+
+
+def _field_media_type(parent: Dict[str, Any]) -> Optional[str]:
+    """从同级字段推断媒体类型: input_audio 的 format, Anthropic source 的 media_type"""
+    media_type = parent.get("media_type") or parent.get("mime_type")
+    if isinstance(media_type, str):
+        return media_type
+    audio_format = parent.get("format")
+    if isinstance(audio_format, str):
+        return _AUDIO_FORMATS.get(audio_format, f"audio/{audio_format}")
+    return None
+
+
+def elide_blobs(value: Any) -> Any:
+    """
+    返回把其中的base64数据替换为摘要后的值。
+    只复制包含base64数据的那部分结构，没有base64数据时返回原对象。
+    """
+    if isinstance(value, dict):
+        result = None
+        media_type = None
+        for key, item in value.items():
+            if isinstance(item, str):
+                if media_type is None:
+                    media_type = _field_media_type(value) or ""
+                blob = as_blob(item, media_type or None)
+                new = blob.summary() if blob is not None else item
+            else:
+                new = elide_blobs(item)
+            if new is not item:
+                if result is None:
+                    result = dict(value)
+                result[key] = new
+        return value if result is None else result
+    if isinstance(value, list):
+        result_list = None
+        for i, item in enumerate(value):
+            new = elide_blobs(item)
+            if new is not item:
+                if result_list is None:
+                    result_list = list(value)
+                result_list[i] = new
+        return value if result_list is None else result_list
+    if isinstance(value, str):
+        blob = as_blob(value)
+        return blob.summary() if blob is not None else value
+    return value
+
+
+def iter_blobs(value: Any, media_type: Optional[str] = None) -> Iterator[Blob]:
+    """遍历值中所有的base64数据"""
+    if isinstance(value, dict):
+        field_media_type = _field_media_type(value)
+        for item in value.values():
+            yield from iter_blobs(item, field_media_type)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_blobs(item)
+    else:
+        blob = as_blob(value, media_type)
+        if blob is not None:
+            yield blob
+
+
+def _request_body(f: flow.Flow) -> Any:
+    if not isinstance(f, http.HTTPFlow):
+        raise exceptions.CommandError("Not an HTTP flow.")
+    data = f.request.get_content(strict=False) or b""
+    key = flow_cache.flow_key(f, data)
+    try:
+        return flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+    except codec.JSONDecodeError as e:
+        raise exceptions.CommandError(f"Request body is not JSON: {e}") from e
+
+
+def find_blob(body: Any, digest: str) -> Optional[Blob]:
+    digest = digest.lstrip("#")
+    for blob in iter_blobs(body):
+        if blob.digest == digest:
+            return blob
+    return None
+
+
+def list_blobs(body: Any) -> List[Tuple[str, str, int]]:
+    return [(blob.digest, blob.media_type, blob.decoded_size) for blob in iter_blobs(body)]
+
+
+class MediaAddon:
+    """列出和导出请求中被省略的内联数据"""
+
+    @command.command("llmview.blobs")
+    def blobs(self, f: flow.Flow) -> str:
+        """列出请求中内联的base64数据: 摘要、媒体类型和解码后的大小"""
+        rows = list_blobs(_request_body(f))
+        if not rows:
+            return "No inline base64 data in the request.\n"
+        return "".join(f"#{digest}  {media_type}  {format_bytes(size)}\n" for digest, media_type, size in rows)
+
+    @command.command("llmview.export_blob")
+    def export_blob(self, f: flow.Flow, digest: str, path: types.Path) -> None:
+        """把请求中摘要为 digest 的base64数据解码后写入文件"""
+        blob = find_blob(_request_body(f), digest)
+        if blob is None:
+            raise exceptions.CommandError(f"No inline data with digest {digest} in flow {f.id}.")
+        try:
+            data = blob.decode()
+        except (binascii.Error, ValueError) as e:
+            raise exceptions.CommandError(f"Could not decode the base64 data: {e}") from e
+        with open(path, "wb") as out:
+            out.write(data)
@@ -0,0 +1,193 @@
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+class _Fragments(list):
+    """delta上下文中累积的字符串片段，导出时才拼接"""
+
+    __slots__ = ()
+
+
+class _MergedList:
+    """
+    按元素的index字段合并的数组。
+
+    只出现过一次的数组保持原样(raw)，第一次被合并时才转换为
+    index -> 元素 的映射，没有index的元素按出现顺序追加在末尾。
+    """
+
+    __slots__ = ("raw", "by_index", "no_index")
+
+    def __init__(self, raw: List[Any]) -> None:
+        self.raw: Optional[List[Any]] = raw
+        self.by_index: Dict[Any, Dict[str, Any]] = {}
+        self.no_index: List[Any] = []
+
+    def items(self) -> List[Any]:
+        if self.raw is not None:
+            return self.raw
+        merged = sorted(self.by_index.values(), key=lambda x: x["index"])
+        merged.extend(self.no_index)
+        return merged
+
+    def _index_raw(self) -> None:
+        for item in self.raw:
+            if isinstance(item, dict) and "index" in item:
+                self.by_index[item["index"]] = item
+            else:
+                self.no_index.append(item)
+                if item is not None:
+                    logging.warning(f"Found array element without index field: {item}")
+        self.raw = None
+
+
+def _own(value: Any) -> Any:
+    """把新事件中的值深拷贝为累加器内部的表示，避免修改原始事件(可能被缓存共享)"""
+    if not isinstance(value, (dict, list)):
+        return value
+    root: List[Any] = [None]
+    stack = [(root, 0, value)]
+    while stack:
+        parent, key, item = stack.pop()
+        if isinstance(item, dict):
+            copied: Dict[str, Any] = {}
+            parent[key] = copied
+            for k, v in item.items():
+                if isinstance(v, (dict, list)):
+                    copied[k] = None
+                    stack.append((copied, k, v))
+                else:
+                    copied[k] = v
+        elif isinstance(item, list):
+            copied_list: List[Any] = [None] * len(item)
+            parent[key] = _MergedList(copied_list)
+            for i, v in enumerate(item):
+                if isinstance(v, (dict, list)):
+                    stack.append((copied_list, i, v))
+                else:
+                    copied_list[i] = v
+        else:
+            parent[key] = item
+    return root[0]
+
+
+def _export(value: Any) -> Any:
+    """把累加器内部的表示转换回普通的JSON对象"""
+    root: List[Any] = [None]
+    stack = [(root, 0, value)]
+    while stack:
+        parent, key, item = stack.pop()
+        if isinstance(item, _Fragments):
+            parent[key] = "".join(item)
+        elif isinstance(item, dict):
+            exported: Dict[str, Any] = {}
+            parent[key] = exported
+            for k, v in item.items():
+                exported[k] = None
+                stack.append((exported, k, v))
+        elif isinstance(item, _MergedList):
+            items = item.items()
+            exported_list: List[Any] = [None] * len(items)
+            parent[key] = exported_list
+            for i, v in enumerate(items):
+                stack.append((exported_list, i, v))
+        else:
+            parent[key] = item
+    return root[0]
+
+
+class JsonMerger:
+    """
+    将多个JSON对象依次合并到同一个累加器中，原地修改，不使用递归。
+
+    合并规则:
+      - 新值为None时保留原值，原值为None时使用新值
+      - 字符串: 路径中包含"delta"的键时拼接，否则保留第一个非空值
+      - 数组: 根据元素的index字段合并，没有index的元素追加到末尾
+      - 字典: 逐个键合并
+      - 其他类型: 直接覆盖
+    """
+
+    def __init__(self) -> None:
+        self._root: Dict[str, Any] = {}
+
+    def merge(self, obj: Dict[str, Any]) -> None:
+        # 队列中保存 (累加器中的字典, 新的字典, 是否处于delta上下文)
+        # 按先进先出处理，保证合并到同一个对象的顺序与事件中出现的顺序一致
+        pending = deque([(self._root, obj, False)])
+        while pending:
+            existing_obj, new_obj, in_delta = pending.popleft()
+            for key, value in new_obj.items():
+                if key not in existing_obj:
+                    existing_obj[key] = _own(value)
+                else:
+                    existing_obj[key] = self._merge_value(
+                        existing_obj[key], value, in_delta or "delta" in key.lower(), key, pending
+                    )
+
+    @staticmethod
+    def _merge_value(existing_value: Any, new_value: Any, in_delta: bool, key: str, pending: deque) -> Any:
+        if new_value is None:
+            return existing_value
+        if existing_value is None:
+            return _own(new_value)
+
+        # 字符串类型：根据上下文决定合并方式
+        if isinstance(existing_value, _Fragments) and isinstance(new_value, str):
+            existing_value.append(new_value)
+            return existing_value
+        if isinstance(existing_value, str) and isinstance(new_value, str):
+            if in_delta:
+                # 在delta上下文中，先缓存片段，导出时再拼接
+                return _Fragments((existing_value, new_value))
+            # 非delta上下文，选择非空值
+            if existing_value != new_value and existing_value and new_value:
+                logging.warning(
+                    f"Different string values found at key {key}: '{existing_value}' vs '{new_value}'. Using the existing value."
+                )
+            return existing_value if existing_value else new_value
+
+        # 数组类型：根据index字段合并元素
+        if isinstance(existing_value, _MergedList) and isinstance(new_value, list):
+            if existing_value.raw is not None:
+                existing_value._index_raw()
+            for item in new_value:
+                if isinstance(item, dict) and "index" in item:
+                    current = existing_value.by_index.get(item["index"])
+                    if current is None:
+                        existing_value.by_index[item["index"]] = _own(item)
+                    else:
+                        pending.append((current, item, in_delta))
+                else:
+                    existing_value.no_index.append(_own(item))
+                    if item is not None:
+                        logging.warning(f"Found new array element without index field at key {key}: {item}")
+            return existing_value
+
+        # 字典类型：加入队列后继续合并
+        if isinstance(existing_value, dict) and isinstance(new_value, dict):
+            pending.append((existing_value, new_value, in_delta))
+            return existing_value
+
+        # 其他类型：直接覆盖
+        return _own(new_value)
+
+    def result(self) -> Dict[str, Any]:
+        return _export(self._root)
+
+
+def aggregate_sse_to_json(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    将SSE事件流按顺序聚合为单个JSON响应
+
+    Args:
+        events: 解析后的SSE事件列表
+
+    Returns:
+        聚合后的JSON对象
+    """
+    merger = JsonMerger()
+    for event in events:
+        merger.merge(event)
+    return merger.result()
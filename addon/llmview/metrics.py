@@ -0,0 +1,444 @@
+"""
+LLM请求的Prometheus指标。
+
+flow完成时更新按 host 和 model 分组的计数器和固定分桶的直方图，
+通过本地端口以Prometheus文本格式输出，不依赖 prometheus_client。
+
+每个flow解析的数据量不随body增大: 不超过 2 * JSON_WINDOW 的JSON body完整解析并
+复用视图共用的 "json" 缓存，更大的只在开头和结尾各一段中查找 model 和 usage，
+不计算摘要也不解析中间的消息; SSE响应优先使用 StreamAggregator 保存的聚合结果
+(计算一次body摘要确认body没有被修改)，否则只解析body开头和结尾的一段数据
+(model 和 usage 所在的事件)。
+"""
+import bisect
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mitmproxy import command, ctx, exceptions, http
+
+from llmview import codec
+from llmview.anthropic import aggregate_message_events
+from llmview.cache import flow_cache
+from llmview.endpoints import ANTHROPIC_MESSAGES, JSON, RESPONSES, SSE, body_type, endpoints
+from llmview.responses import find_final_response
+from llmview.sse import iter_sse_json
+from llmview.stream import stored_snapshot
+
+Labels = Tuple[str, str]
+
+LABEL_NAMES = ("host", "model")
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200, 400, 1000)
+
+# SSE body 没有聚合结果时，只解析开头和结尾的这么多字节
+SSE_WINDOW = 16 * 1024
+# 超过两倍这个大小的JSON body只在开头和结尾的这么多字节中查找 model 和 usage
+JSON_WINDOW = 16 * 1024
+
+# 对象中的字段，前面是 { 或 ,。JSON字符串值中的引号是转义的，不会匹配
+_MODEL_FIELD = re.compile(rb'[{,]\s*"model"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_USAGE_FIELD = re.compile(rb'[{,]\s*"usage"\s*:\s*(?=\{)')
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{{{_format_labels(LABEL_NAMES, labels)}}} {_format_number(value)}")
+        return lines
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class Histogram:
+    """固定分桶的直方图，每个标签组合只保存各个桶的计数、总和与数量"""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各个桶的计数(不累加)..., +Inf桶的计数]
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts in sorted(self._counts.items()):
+            label_text = _format_labels(LABEL_NAMES, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{_format_number(bound)}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {_format_number(self._sums[labels])}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._sums.clear()
+
+
+class FlowUsage:
+    """从一个flow中提取的指标数据，缺失的字段为None"""
+
+    def __init__(self) -> None:
+        self.model: Optional[str] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        # 命中 prompt cache 的输入token数
+        self.cached_tokens: Optional[int] = None
+        # 第一个SSE事件到达的时间(绝对时间)
+        self.first_token_at: Optional[float] = None
+
+    def update_usage(self, usage: Any) -> None:
+        if not isinstance(usage, dict):
+            return
+        # OpenAI: prompt_tokens/completion_tokens, Anthropic 和 Responses API: input_tokens/output_tokens
+        for field, names in (
+            ("prompt_tokens", ("prompt_tokens", "input_tokens")),
+            ("completion_tokens", ("completion_tokens", "output_tokens")),
+        ):
+            for name in names:
+                if isinstance(usage.get(name), int):
+                    setattr(self, field, usage[name])
+                    break
+        # OpenAI: prompt_tokens_details.cached_tokens, Responses API: input_tokens_details.cached_tokens,
+        # Anthropic: cache_read_input_tokens
+        details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details")
+        if isinstance(details, dict) and isinstance(details.get("cached_tokens"), int):
+            self.cached_tokens = details["cached_tokens"]
+        elif isinstance(usage.get("cache_read_input_tokens"), int):
+            self.cached_tokens = usage["cache_read_input_tokens"]
+
+    def update_model(self, obj: Any) -> None:
+        if isinstance(obj, dict) and isinstance(obj.get("model"), str) and obj["model"]:
+            self.model = obj["model"]
+
+
+def _sse_window_events(data: bytes) -> List[Dict[str, Any]]:
+    """解析SSE body开头和结尾各 SSE_WINDOW 字节内的完整事件"""
+    if len(data) <= 2 * SSE_WINDOW:
+        return [obj for obj in iter_sse_json(data) if isinstance(obj, dict)]
+    # 只保留窗口内完整的事件，找不到事件边界时放弃这一段
+    head = data[:SSE_WINDOW]
+    end = head.rfind(b"\n\n")
+    head = head[: end + 2] if end >= 0 else b""
+    tail = data[-SSE_WINDOW:]
+    start = tail.find(b"\n\n")
+    tail = tail[start + 2 :] if start >= 0 else b""
+    return [obj for part in (head, tail) for obj in iter_sse_json(part) if isinstance(obj, dict)]
+
+
+def _json_window_fields(data: bytes) -> Dict[str, Any]:
+    """
+    在JSON body开头和结尾各 JSON_WINDOW 字节内查找 model 和 usage。
+    model 在响应的开头，请求中可能在开头或结尾; usage 是结尾的最后一个。
+    """
+    head, tail = data[:JSON_WINDOW], data[-JSON_WINDOW:]
+    fields: Dict[str, Any] = {}
+    for part in (head, tail):
+        match = _MODEL_FIELD.search(part)
+        if match is None:
+            continue
+        try:
+            fields["model"] = codec.loads(b'"' + match.group(1) + b'"')
+            break
+        except (codec.JSONDecodeError, UnicodeDecodeError):
+            continue
+    usages = list(_USAGE_FIELD.finditer(tail))
+    if usages:
+        text = tail[usages[-1].end() :].decode("utf-8", errors="replace")
+        try:
+            fields["usage"], _ = json.JSONDecoder().raw_decode(text)
+        except json.JSONDecodeError:
+            pass
+    return fields
+
+
+def _json_body(flow: http.HTTPFlow, data: bytes) -> Any:
+    """解析JSON body，较大的body只返回窗口内找到的 model 和 usage，解析失败时返回None"""
+    if len(data) > 2 * JSON_WINDOW:
+        return _json_window_fields(data)
+    key = flow_cache.flow_key(flow, data)
+    try:
+        return flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+    except codec.JSONDecodeError:
+        return None
+
+
+def _request_model(flow: http.HTTPFlow) -> Optional[str]:
+    """响应中没有 model 时使用请求中的 model"""
+    data = flow.request.get_content(strict=False) or b""
+    if not data or body_type(flow.request.headers.get("content-type")) != JSON:
+        return None
+    obj = _json_body(flow, data)
+    model = obj.get("model") if isinstance(obj, dict) else None
+    return model if isinstance(model, str) and model else None
+
+
+def extract_usage(flow: http.HTTPFlow, kind: str) -> FlowUsage:
+    result = FlowUsage()
+    response = flow.response
+    data = response.get_content(strict=False) or b""
+    response_type = body_type(response.headers.get("content-type"))
+    if response_type == JSON and data:
+        obj = _json_body(flow, data)
+        if isinstance(obj, dict):
+            result.update_model(obj)
+            result.update_usage(obj.get("usage"))
+            # Responses API 的 usage 在 response 对象中
+            result.update_model(obj.get("response"))
+            if isinstance(obj.get("response"), dict):
+                result.update_usage(obj["response"].get("usage"))
+    elif response_type == SSE and data:
+        snapshot = stored_snapshot(flow, data)
+        if snapshot is not None:
+            result.update_model(snapshot["meta"])
+            result.update_usage((snapshot["meta"] or {}).get("usage"))
+            result.first_token_at = snapshot.get("first_event_at")
+        else:
+            # response.completed 事件中有完整的 response，可能比 SSE_WINDOW 大，单独查找
+            final = find_final_response(data) if kind == RESPONSES else None
+            events = [{"response": final}] if final is not None else _sse_window_events(data)
+            if kind == ANTHROPIC_MESSAGES:
+                message = aggregate_message_events(events)["message"]
+                result.update_model(message)
+                result.update_usage(message.get("usage"))
+            else:
+                for event in events:
+                    result.update_model(event)
+                    result.update_usage(event.get("usage"))
+                    # Responses API 的事件: response.created / response.completed
+                    result.update_model(event.get("response"))
+                    if isinstance(event.get("response"), dict):
+                        result.update_usage(event["response"].get("usage"))
+    if result.model is None:
+        result.model = _request_model(flow)
+    return result
+
+
+class LLMMetrics:
+    """所有指标的集合，flow完成时在事件循环中更新，HTTP线程中读取"""
+
+    def __init__(self) -> None:
+        self.requests = Counter("llm_requests_total", "Completed LLM requests.")
+        self.errors = Counter("llm_request_errors_total", "LLM requests answered with an HTTP status of 400 or above.")
+        self.prompt_tokens = Counter("llm_prompt_tokens_total", "Prompt (input) tokens reported in the response usage.")
+        self.completion_tokens = Counter(
+            "llm_completion_tokens_total", "Completion (output) tokens reported in the response usage."
+        )
+        self.latency = Histogram(
+            "llm_request_duration_seconds",
+            "End-to-end latency from the first request byte to the last response byte.",
+            LATENCY_BUCKETS,
+        )
+        self.ttft = Histogram(
+            "llm_time_to_first_token_seconds",
+            "Time from the first request byte to the first SSE event of a streamed response.",
+            TTFT_BUCKETS,
+        )
+        self.tokens_per_second = Histogram(
+            "llm_completion_tokens_per_second",
+            "Completion tokens divided by the generation time (after the first token when known).",
+            TOKENS_PER_SECOND_BUCKETS,
+        )
+        self._lock = threading.Lock()
+
+    def _all(self) -> List[Any]:
+        return [
+            self.requests,
+            self.errors,
+            self.prompt_tokens,
+            self.completion_tokens,
+            self.latency,
+            self.ttft,
+            self.tokens_per_second,
+        ]
+
+    def observe_flow(self, flow: http.HTTPFlow) -> bool:
+        """记录一个完成的LLM flow，不是LLM flow时返回False"""
+        # 从文件加载的flow也会触发 response hook，不计入指标
+        if not flow.live:
+            return False
+        kind = endpoints.classify(flow)
+        if kind is None or flow.response is None:
+            return False
+        usage = extract_usage(flow, kind)
+        labels = (flow.request.pretty_host, usage.model or "unknown")
+        start = flow.request.timestamp_start
+        end = flow.response.timestamp_end
+        with self._lock:
+            self.requests.inc(labels)
+            if flow.response.status_code >= 400:
+                self.errors.inc(labels)
+            if usage.prompt_tokens is not None:
+                self.prompt_tokens.inc(labels, usage.prompt_tokens)
+            if usage.completion_tokens is not None:
+                self.completion_tokens.inc(labels, usage.completion_tokens)
+            if start is None or end is None:
+                return True
+            self.latency.observe(labels, end - start)
+            generation_start = start
+            if usage.first_token_at is not None:
+                self.ttft.observe(labels, usage.first_token_at - start)
+                generation_start = usage.first_token_at
+            if usage.completion_tokens and end > generation_start:
+                self.tokens_per_second.observe(labels, usage.completion_tokens / (end - generation_start))
+        return True
+
+    def expose(self) -> str:
+        """返回Prometheus文本格式(0.0.4)的全部指标"""
+        with self._lock:
+            lines = [line for metric in self._all() for line in metric.expose()]
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            for metric in self._all():
+                metric.clear()
+
+
+metrics = LLMMetrics()
+
+
+def _handler_class() -> type:
+    # http.server 只在开启 llmview_metrics_port 时才导入
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.expose().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """在后台线程中运行的 /metrics HTTP服务"""
+
+    def __init__(self) -> None:
+        self._server: Optional[Any] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        return self._server.server_address[:2] if self._server is not None else None
+
+    def start(self, host: str, port: int) -> None:
+        from http.server import ThreadingHTTPServer
+
+        self.stop()
+        self._server = ThreadingHTTPServer((host, port), _handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="llmview-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        self._thread = None
+
+
+class MetricsAddon:
+    """flow完成时更新LLM指标，并在 llmview_metrics_port 上以Prometheus格式输出"""
+
+    def __init__(self):
+        self.server = MetricsServer()
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_metrics_port",
+            typespec=int,
+            default=0,
+            help="Serve Prometheus metrics of the LLM flows on this port (path /metrics). 0 disables the endpoint.",
+        )
+        loader.add_option(
+            name="llmview_metrics_host",
+            typespec=str,
+            default=DEFAULT_METRICS_HOST,
+            help="Address the Prometheus metrics endpoint listens on.",
+        )
+
+    def configure(self, updated):
+        if "llmview_metrics_port" not in updated and "llmview_metrics_host" not in updated:
+            return
+        port = ctx.options.llmview_metrics_port
+        if port <= 0:
+            self.server.stop()
+            return
+        try:
+            self.server.start(ctx.options.llmview_metrics_host, port)
+        except OSError as e:
+            raise exceptions.OptionsError(f"Cannot serve LLM metrics on port {port}: {e}") from e
+        logging.info(f"LLM metrics served at http://{ctx.options.llmview_metrics_host}:{port}/metrics")
+
+    def response(self, flow: http.HTTPFlow):
+        if not flow.live:
+            return
+        try:
+            metrics.observe_flow(flow)
+        except Exception as e:
+            logging.warning(f"Could not record LLM metrics of flow {flow.id}: {e}")
+
+    @command.command("llmview.metrics")
+    def show(self) -> str:
+        return metrics.expose()
+
+    @command.command("llmview.metrics_reset")
+    def reset(self) -> None:
+        metrics.clear()
+
+    def done(self):
+        self.server.stop()
@@ -0,0 +1,236 @@
+"""
+在 response 阶段把LLM flow的解析、聚合和渲染交给后台线程池，
+结果交回事件循环线程写入共享的 flow_cache，点击flow时直接读取渲染好的文本。
+
+只在有界面(mitmweb、mitmproxy)时运行: mitmdump 中没有人打开flow，预渲染只会占用CPU。
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from mitmproxy import contentviews, ctx, http
+
+from llmview.cache import PendingResults, flow_cache
+from llmview.endpoints import endpoints
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE = 32
+
+# 视图名 -> 视图实例，由 llmview.views.register_all() 注册
+_views: Dict[str, Any] = {}
+
+
+def register(view: Any) -> None:
+    """注册可以预渲染的视图，脚本重新加载时按名字覆盖"""
+    _views[view.name] = view
+
+
+def registered_views() -> Dict[str, Any]:
+    return dict(_views)
+
+
+def best_view(data: bytes, metadata: contentviews.Metadata, views: Optional[Iterable[Any]] = None) -> Optional[Any]:
+    """
+    返回 render_priority 最高的视图，也就是mitmweb打开flow时会自动选择的视图。
+    views 默认为已注册的视图。
+    """
+    best, best_priority = None, 0.0
+    for view in list(_views.values()) if views is None else views:
+        priority = view.render_priority(data, metadata)
+        if priority > best_priority:
+            best, best_priority = view, priority
+    return best
+
+
+def precompute_flow(flow: http.HTTPFlow) -> None:
+    """
+    在当前线程中渲染请求和响应的默认视图，结果由视图自己写入缓存。
+    endpoints.classify() 已经在 response 阶段把识别结果写入 flow.metadata，这里只读取。
+    """
+    messages: List[http.Message] = [flow.request]
+    if flow.response is not None:
+        messages.append(flow.response)
+    for message in messages:
+        data = message.get_content(strict=False) or b""
+        if not data:
+            continue
+        metadata = contentviews.Metadata(
+            content_type=message.headers.get("content-type"),
+            flow=flow,
+            http_message=message,
+        )
+        view = best_view(data, metadata)
+        if view is not None:
+            view.prettify(data, metadata)
+
+
+class Precomputer:
+    """
+    有界的后台渲染队列。
+
+    排队中的任务数达到上限时不再提交，打开flow时按原来的方式在前台渲染；
+    flow被删除时取消还没开始的任务，已经在运行的任务结束后丢弃它的结果。
+
+    后台线程不写入 flow_cache: 渲染结果先收集起来(flow_cache.deferred())，
+    再通过 call_soon_threadsafe 交给事件循环线程写入，删除flow和写入结果都在事件循环线程中进行。
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_QUEUE) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.submitted = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._discarded: Set[str] = set()
+        self._lock = threading.Lock()
+        # 写入结果的事件循环，由 PrecomputeAddon.running() 设置；为None时在完成任务的线程中直接写入
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def configure(self, workers: int, max_queue: int) -> None:
+        if workers != self.workers:
+            self.shutdown()
+        self.workers = workers
+        self.max_queue = max_queue
+
+    def submit(self, flow: http.HTTPFlow) -> bool:
+        """提交后台渲染任务，队列已满或线程池被禁用时返回False"""
+        if self.workers <= 0:
+            return False
+        with self._lock:
+            if flow.id in self._pending:
+                return True
+            if len(self._pending) >= self.max_queue:
+                self.skipped += 1
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llmview-precompute")
+            future = self._executor.submit(self._run, flow)
+            self._pending[flow.id] = future
+            self.submitted += 1
+        future.add_done_callback(lambda done: self._done(flow.id, done))
+        return True
+
+    def _run(self, flow: http.HTTPFlow) -> PendingResults:
+        with flow_cache.deferred() as collected:
+            try:
+                precompute_flow(flow)
+            except Exception as e:
+                logging.warning(f"Background render of flow {flow.id} failed: {e}")
+        return collected
+
+    def _done(self, flow_id: str, future: Future) -> None:
+        # 在后台线程中调用(任务被取消时在取消它的线程中)，结果交给事件循环线程
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            self._finish(flow_id, future)
+            return
+        try:
+            loop.call_soon_threadsafe(self._finish, flow_id, future)
+        except RuntimeError:
+            # 事件循环已经关闭，结果不再需要
+            pass
+
+    def _finish(self, flow_id: str, future: Future) -> None:
+        with self._lock:
+            self._pending.pop(flow_id, None)
+            discarded = flow_id in self._discarded
+            self._discarded.discard(flow_id)
+        if discarded or future.cancelled():
+            return
+        flow_cache.store_all(future.result())
+
+    def cancel(self, flow_id: str) -> None:
+        """flow被删除: 取消排队中的任务，正在运行的任务结束后丢弃结果"""
+        with self._lock:
+            future = self._pending.get(flow_id)
+            if future is not None:
+                self.cancelled += 1
+                # 先标记，任务在取消前已经开始运行时，结束后丢弃它的结果
+                self._discarded.add(flow_id)
+        # 取消成功时会同步调用 _done，不能持有锁
+        if future is not None:
+            future.cancel()
+        flow_cache.discard_flow(flow_id)
+
+    def pending_flows(self) -> List[str]:
+        with self._lock:
+            return list(self._pending)
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+precomputer = Precomputer()
+
+
+class PrecomputeAddon:
+    """在 response 阶段为识别出的LLM flow提交后台渲染任务"""
+
+    def __init__(self):
+        self._view: Any = None
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_precompute",
+            typespec=bool,
+            default=True,
+            help=(
+                "Render the default LLM view of each LLM flow in a background thread when the response arrives. "
+                "Only used by mitmweb and mitmproxy; mitmdump never renders in the background."
+            ),
+        )
+        loader.add_option(
+            name="llmview_precompute_workers",
+            typespec=int,
+            default=DEFAULT_WORKERS,
+            help="Number of background render threads. 0 disables background rendering.",
+        )
+        loader.add_option(
+            name="llmview_precompute_queue",
+            typespec=int,
+            default=DEFAULT_QUEUE,
+            help="Maximum number of flows waiting for a background render; further flows are rendered when opened.",
+        )
+
+    def configure(self, updated):
+        if "llmview_precompute_workers" in updated or "llmview_precompute_queue" in updated:
+            precomputer.configure(ctx.options.llmview_precompute_workers, ctx.options.llmview_precompute_queue)
+
+    def running(self):
+        # mitmdump 没有 view addon: 没有界面打开flow，也没有删除flow的信号，不预渲染
+        self._view = ctx.master.addons.get("view")
+        if self._view is not None:
+            precomputer.loop = ctx.master.event_loop
+            self._view.sig_store_remove.connect(self._flow_removed)
+            self._view.sig_store_refresh.connect(self._store_refreshed)
+
+    def _flow_removed(self, flow):
+        precomputer.cancel(flow.id)
+
+    def _store_refreshed(self):
+        # view.clear 和 view.clear_unmarked 只发送这个信号，逐个检查还在排队的flow
+        for flow_id in precomputer.pending_flows():
+            if self._view.get_by_id(flow_id) is None:
+                precomputer.cancel(flow_id)
+
+    def response(self, flow: http.HTTPFlow):
+        if self._view is None or not ctx.options.llmview_precompute or flow_cache.max_bytes <= 0:
+            return
+        if endpoints.classify(flow) is None:
+            return
+        precomputer.submit(flow)
+
+    def done(self):
+        precomputer.shutdown()
+        precomputer.loop = None
@@ -0,0 +1,185 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from mitmproxy import command, ctx
+
+DEFAULT_SLOW_RENDER_MS = 500
+# 每个视图保留最近多少次渲染的记录用于计算分位数
+DEFAULT_WINDOW = 1000
+
+PHASES = ("parse", "aggregate", "render")
+
+
+@dataclass
+class RenderRecord:
+    """
+    一次 prettify 的记录:
+      - phases      : 各阶段耗时(秒)，render 为总耗时减去 parse 和 aggregate
+      - input_bytes : body 的字节数
+      - output_chars: 渲染结果的字符数
+      - events      : 解析出的SSE事件数
+    命中缓存时 parse/aggregate 不会被执行，也就不会出现在 phases 中。
+    """
+
+    view: str
+    flow_id: Optional[str]
+    input_bytes: int
+    output_chars: int = 0
+    events: int = 0
+    seconds: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算分位数，values 需要已经排好序"""
+    if not values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Profiler:
+    """
+    记录每个视图每次渲染的分阶段耗时。
+
+    视图的 prettify 用 profiled 包装，内部通过 phase() 标记解析、聚合阶段，
+    当前正在记录的渲染保存在线程局部变量中，不需要在函数之间传递。
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, slow_render_ms: int = DEFAULT_SLOW_RENDER_MS) -> None:
+        self.window = window
+        self.slow_render_ms = slow_render_ms
+        self.slow_renders = 0
+        self._records: Dict[str, Deque[RenderRecord]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        record: Optional[RenderRecord] = getattr(self._local, "record", None)
+        if record is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.phases[name] = record.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count_events(self, events: int) -> None:
+        record: Optional[RenderRecord] = getattr(self._local, "record", None)
+        if record is not None:
+            record.events = events
+
+    def profiled(self, prettify: Callable[[Any, bytes, Any], str]) -> Callable[[Any, bytes, Any], str]:
+        """包装视图的 prettify 方法"""
+
+        @wraps(prettify)
+        def wrapper(view: Any, data: bytes, metadata: Any) -> str:
+            flow = metadata.flow
+            record = RenderRecord(view.name, flow.id if flow is not None else None, len(data))
+            previous = getattr(self._local, "record", None)
+            self._local.record = record
+            start = time.perf_counter()
+            try:
+                result = prettify(view, data, metadata)
+            finally:
+                record.seconds = time.perf_counter() - start
+                self._local.record = previous
+            record.output_chars = len(result)
+            self._finish(record)
+            return result
+
+        return wrapper
+
+    def _finish(self, record: RenderRecord) -> None:
+        measured = record.phases.get("parse", 0.0) + record.phases.get("aggregate", 0.0)
+        record.phases["render"] = max(record.seconds - measured, 0.0)
+        with self._lock:
+            records = self._records.get(record.view)
+            if records is None:
+                records = self._records[record.view] = deque(maxlen=self.window)
+            records.append(record)
+
+        if self.slow_render_ms and record.seconds * 1000 >= self.slow_render_ms:
+            self.slow_renders += 1
+            logging.warning(
+                "%s took %.0f ms on flow %s (parse %.0f ms, aggregate %.0f ms, render %.0f ms; "
+                "%d bytes in, %d chars out, %d events)",
+                record.view,
+                record.seconds * 1000,
+                record.flow_id,
+                record.phases.get("parse", 0.0) * 1000,
+                record.phases.get("aggregate", 0.0) * 1000,
+                record.phases["render"] * 1000,
+                record.input_bytes,
+                record.output_chars,
+                record.events,
+            )
+
+    def records(self, view: str) -> List[RenderRecord]:
+        with self._lock:
+            return list(self._records.get(view, ()))
+
+    def summary(self) -> str:
+        """每个视图最近渲染的 p50/p95/p99 耗时(毫秒)"""
+        with self._lock:
+            views = {view: list(records) for view, records in self._records.items()}
+        if not views:
+            return "no renders recorded"
+
+        header = f"{'view':<24}{'count':>7}{'phase':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max in':>12}"
+        lines = [header]
+        for view, records in sorted(views.items()):
+            columns = [("total", sorted(r.seconds for r in records))]
+            for phase in PHASES:
+                columns.append((phase, sorted(r.phases.get(phase, 0.0) for r in records)))
+            max_input = max(r.input_bytes for r in records)
+            for i, (phase, values) in enumerate(columns):
+                name, count, size = (view, str(len(records)), str(max_input)) if i == 0 else ("", "", "")
+                lines.append(
+                    f"{name:<24}{count:>7}{phase:>11}"
+                    f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+                    f"{percentile(values, 99) * 1000:>10.1f}{size:>12}"
+                )
+        lines.append(f"slow renders (>= {self.slow_render_ms} ms): {self.slow_renders}")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self.slow_renders = 0
+
+
+profiler = Profiler()
+
+
+class ProfilerAddon:
+    """注册渲染耗时统计相关的option和command"""
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_slow_render_ms",
+            typespec=int,
+            default=DEFAULT_SLOW_RENDER_MS,
+            help="Log a warning with the flow id and per-phase timings when an LLM view takes at least this many milliseconds to render. 0 disables the log.",
+        )
+
+    def configure(self, updated):
+        if "llmview_slow_render_ms" in updated:
+            profiler.slow_render_ms = ctx.options.llmview_slow_render_ms
+
+    @command.command("llmview.stats")
+    def stats(self) -> str:
+        return profiler.summary()
+
+    @command.command("llmview.stats_reset")
+    def stats_reset(self) -> None:
+        profiler.clear()
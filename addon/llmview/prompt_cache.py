@@ -0,0 +1,309 @@
+"""
+Prompt cache 效率分析。
+
+服务端的 prompt cache 只对与之前的请求完全相同的前缀生效。对每个
+/chat/completions 请求，按 tools、messages 的顺序计算每一项的滚动摘要，
+与同一对话中的上一个请求比较，得到最长的相同前缀(项数和字节数)和第一个
+不同的 tool 或消息，再在响应到达后与 usage 中的 cached_tokens 对比。
+
+滚动摘要 chain[i] 唯一标识前 i+1 项，两个请求的最长相同前缀可以用
+二分查找得到，每个请求只需要对每条消息计算一次摘要(与对话索引共用)。
+"""
+from array import array
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mitmproxy import command, ctx, flow, http
+
+from llmview import codec
+from llmview.analysis import flow_analysis
+from llmview.cache import flow_cache
+from llmview.conversation import CONVERSATION_METADATA_KEY, cached_message_digests, message_digests, rolling_chain
+from llmview.endpoints import CHAT_COMPLETIONS, JSON, body_type, endpoints
+from llmview.media import format_bytes
+from llmview.metrics import extract_usage
+
+# 分析结果保存在 flow.metadata 中的键
+PROMPT_CACHE_METADATA_KEY = "llmview.prompt_cache"
+
+# 所有保留的请求的前缀项数之和的上限，每项约24字节
+DEFAULT_MAX_SEGMENTS = 500_000
+DIGEST_SIZE = 16
+
+
+class PromptRecord:
+    """一个请求的前缀链，tools 在前，messages 在后"""
+
+    __slots__ = ("flow_id", "chain", "offsets")
+
+    def __init__(self, flow_id: str, chain: List[bytes], sizes: List[int]) -> None:
+        self.flow_id = flow_id
+        # 前缀链拼接为一个 bytes，每项 DIGEST_SIZE 字节
+        self.chain = b"".join(chain)
+        # offsets[i] 是前 i 项的字节数
+        self.offsets = array("q", [0])
+        total = 0
+        for size in sizes:
+            total += size
+            self.offsets.append(total)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def digest(self, i: int) -> bytes:
+        return self.chain[i * DIGEST_SIZE : (i + 1) * DIGEST_SIZE]
+
+    def common_prefix(self, other: "PromptRecord") -> int:
+        """
+        返回两个请求相同的前缀项数。前缀链的第 i 项相同意味着前 i+1 项都相同，
+        所以可以二分查找最后一个相同的位置。
+        """
+        low, high = 0, min(len(self), len(other))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.digest(middle - 1) == other.digest(middle - 1):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+
+def _tool_digests(tools: Sequence[Any]) -> Tuple[List[bytes], List[int]]:
+    # 同一个客户端每次请求的 tools 通常相同，按内容缓存
+    key = flow_cache.content_key("tools", codec.dumps_compact(tools).encode("utf-8"))
+    return flow_cache.get_or_compute(key, "tool-digests", lambda: message_digests(tools), size=len(tools) * 64)
+
+
+def _tool_name(tool: Any) -> str:
+    if isinstance(tool, dict):
+        function = tool.get("function")
+        if isinstance(function, dict) and function.get("name"):
+            return str(function["name"])
+        return str(tool.get("name") or tool.get("type") or "N/A")
+    return "N/A"
+
+
+def _segment_label(obj: Any, tools: int, index: int) -> str:
+    """第 index 项的描述，例如 "tool 3 (read_file)" 或 "message 0 (system)" """
+    if index < tools:
+        return f"tool {index} ({_tool_name(obj.get('tools')[index])})"
+    message = obj.get("messages")[index - tools]
+    role = message.get("role", "N/A") if isinstance(message, dict) else "N/A"
+    return f"message {index - tools} ({role})"
+
+
+class PromptCacheAnalyzer:
+    """保留最近的请求的前缀链，找出每个请求与上一个请求相同的前缀"""
+
+    def __init__(self, max_segments: int = DEFAULT_MAX_SEGMENTS) -> None:
+        self.max_segments = max_segments
+        self._records: "OrderedDict[str, PromptRecord]" = OrderedDict()
+        self._segments = 0
+        # (host, model) -> 最近一个请求的flow id
+        self._latest: Dict[Tuple[str, str], str] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def previous(self, f: http.HTTPFlow, model: str, match: Optional[Dict[str, Any]]) -> Optional[PromptRecord]:
+        """
+        同一对话中的上一个请求: 对话索引找到的共享最长消息前缀的flow(match)，
+        第一条消息就不同时(例如 system prompt 中的时间戳变了)使用同一个
+        host 和 model 的最近一个请求。
+        """
+        if match and match["flow"] in self._records:
+            return self._records[match["flow"]]
+        flow_id = self._latest.get((f.request.pretty_host, model))
+        return self._records.get(flow_id) if flow_id is not None else None
+
+    def analyze(self, f: http.HTTPFlow, match: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        计算请求的前缀链并与上一个请求比较，不是JSON对象或没有消息时返回None。
+        match 是对话索引的匹配结果。
+        """
+        data = f.request.get_content(strict=False) or b""
+        key = flow_cache.flow_key(f, data)
+        try:
+            obj = flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+        except codec.JSONDecodeError:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        messages = obj.get("messages")
+        if not isinstance(messages, list) or not messages:
+            return None
+        tools = obj.get("tools")
+        if not isinstance(tools, list):
+            tools = []
+
+        tool_digests, tool_sizes = _tool_digests(tools) if tools else ([], [])
+        digests, sizes = cached_message_digests(key, messages)
+        record = PromptRecord(f.id, rolling_chain(tool_digests + digests), tool_sizes + sizes)
+        model = obj.get("model") if isinstance(obj.get("model"), str) else ""
+
+        result: Dict[str, Any] = {
+            "previous": None,
+            "items": len(record),
+            "tools": len(tools),
+            "messages": len(messages),
+            "bytes": record.offsets[-1],
+            "common": 0,
+            "common_bytes": 0,
+            "break": None,
+        }
+        previous = self.previous(f, model, match)
+        if previous is not None:
+            common = record.common_prefix(previous)
+            result.update(previous=previous.flow_id, common=common, common_bytes=record.offsets[common])
+            # 上一个请求的所有项都保持不变时，新请求只是在末尾追加了消息
+            if common < len(record) and common < len(previous):
+                result["break"] = _segment_label(obj, len(tools), common)
+        self.add(f.request.pretty_host, model, record)
+        return result
+
+    def add(self, host: str, model: str, record: PromptRecord) -> None:
+        old = self._records.pop(record.flow_id, None)
+        if old is not None:
+            self._segments -= len(old)
+        self._records[record.flow_id] = record
+        self._segments += len(record)
+        self._latest[(host, model)] = record.flow_id
+        while self._segments > self.max_segments and len(self._records) > 1:
+            _, evicted = self._records.popitem(last=False)
+            self._segments -= len(evicted)
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._latest.clear()
+        self._segments = 0
+
+
+prompt_cache = PromptCacheAnalyzer()
+
+
+def cache_ratio(cached: Optional[int], total: Optional[int]) -> Optional[float]:
+    if cached is None or not total:
+        return None
+    return cached / total
+
+
+def format_ratio(ratio: Optional[float]) -> str:
+    return "N/A" if ratio is None else f"{ratio:.0%}"
+
+
+def format_analysis(result: Dict[str, Any]) -> str:
+    """请求视图中的 prompt cache 段落"""
+    lines = ["## Prompt Cache🧊\n"]
+    if result.get("previous") is None:
+        lines.append("  - no earlier request in this conversation\n")
+    else:
+        stable = cache_ratio(result["common_bytes"], result["bytes"])
+        lines.append(f"  - Previous request : {result['previous']}\n")
+        lines.append(
+            f"  - Stable prefix    : {result['common']}/{result['items']} items, "
+            f"{format_bytes(result['common_bytes'])} of {format_bytes(result['bytes'])} ({format_ratio(stable)})\n"
+        )
+        lines.append(f"  - Prefix broken at : {result['break'] or 'not broken, only appended'}\n")
+    if result.get("prompt_tokens") is not None:
+        cached = result.get("cached_tokens")
+        observed = cache_ratio(cached, result["prompt_tokens"])
+        line = f"  - Cached tokens    : {'N/A' if cached is None else cached}/{result['prompt_tokens']} ({format_ratio(observed)})"
+        # 按字节比例估算稳定前缀的token数，服务端只缓存达到最小长度的前缀
+        if result.get("previous") is not None and result["bytes"]:
+            line += f", stable prefix ≈ {result['prompt_tokens'] * result['common_bytes'] // result['bytes']} tokens"
+        lines.append(line + "\n")
+    return "".join(lines)
+
+
+def summarize(results: Sequence[Tuple[str, Dict[str, Any]]], top: int = 10) -> str:
+    """多个请求的分析结果汇总: 总体命中率、最常见的断点和前缀最短的请求"""
+    if not results:
+        return "No analysed requests among the flows.\n"
+    compared = [(flow_id, r) for flow_id, r in results if r.get("previous") is not None]
+    total_bytes = sum(r["bytes"] for _, r in compared)
+    common_bytes = sum(r["common_bytes"] for _, r in compared)
+    with_usage = [r for _, r in results if r.get("prompt_tokens") is not None]
+    prompt_tokens = sum(r["prompt_tokens"] for r in with_usage)
+    cached_tokens = sum(r.get("cached_tokens") or 0 for r in with_usage)
+
+    lines = [
+        f"requests analysed       : {len(results)} ({len(compared)} with an earlier request)\n",
+        f"stable prefix bytes     : {format_bytes(common_bytes)} of {format_bytes(total_bytes)} ({format_ratio(cache_ratio(common_bytes, total_bytes))})\n",
+        f"cached prompt tokens    : {cached_tokens} of {prompt_tokens} ({format_ratio(cache_ratio(cached_tokens, prompt_tokens))})\n",
+    ]
+    breaks = Counter(r["break"] for _, r in compared if r.get("break"))
+    if breaks:
+        lines.append("\nprefix broken at:\n")
+        for label, count in breaks.most_common(top):
+            lines.append(f"  {count:>6}  {label}\n")
+    broken = sorted((r["common_bytes"] / r["bytes"] if r["bytes"] else 1.0, flow_id, r) for flow_id, r in compared if r.get("break"))
+    if broken:
+        lines.append("\nshortest stable prefixes:\n")
+        for ratio, flow_id, r in broken[:top]:
+            cached = cache_ratio(r.get("cached_tokens"), r.get("prompt_tokens"))
+            lines.append(
+                f"  {flow_id}  prefix {format_ratio(ratio)} ({r['common']}/{r['items']} items), "
+                f"cached {format_ratio(cached)}, broken at {r['break']}, previous {r['previous']}\n"
+            )
+    return "".join(lines)
+
+
+def analyze_flow(f: http.HTTPFlow, match: Optional[Dict[str, Any]], stored: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    在分析线程中分析请求并记录 usage 中的 cached_tokens，返回 {PROMPT_CACHE_METADATA_KEY: result}。
+    stored 是从文件加载的flow之前的分析结果，只补充 usage。
+    """
+    result = dict(stored) if stored is not None else prompt_cache.analyze(f, match)
+    if result is None:
+        return None
+    usage = extract_usage(f, CHAT_COMPLETIONS)
+    result["prompt_tokens"] = usage.prompt_tokens
+    result["cached_tokens"] = usage.cached_tokens
+    return {PROMPT_CACHE_METADATA_KEY: result}
+
+
+class PromptCacheAddon:
+    """
+    响应完成后分析 /chat/completions 请求的稳定前缀，并记录 usage 中的 cached_tokens。
+    分析在 flow_analysis 的后台线程中紧接着对话索引进行，结果完成后才写入 flow.metadata。
+    """
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_prompt_cache",
+            typespec=bool,
+            default=True,
+            help=(
+                "Compare each /chat/completions request with the previous request of its conversation to find "
+                "the longest stable prefix and the tool or message that broke it."
+            ),
+        )
+
+    def response(self, f: http.HTTPFlow):
+        if not ctx.options.llmview_prompt_cache:
+            return
+        if endpoints.classify(f) != CHAT_COMPLETIONS or body_type(f.request.headers.get("content-type")) != JSON:
+            return
+        # 从文件加载的flow保留之前的分析结果
+        stored = f.metadata.get(PROMPT_CACHE_METADATA_KEY)
+        if stored is not None and "prompt_tokens" in stored:
+            return
+        match = f.metadata.get(CONVERSATION_METADATA_KEY)
+        # 在对话索引之后运行，可以使用它还没有写入 flow.metadata 的匹配结果
+        flow_analysis.submit(f, lambda flow, pending: analyze_flow(flow, pending.get(CONVERSATION_METADATA_KEY, match), stored))
+
+    @command.command("llmview.prompt_cache")
+    def summary(self, flows: Sequence[flow.Flow]) -> str:
+        """汇总这些flow的 prompt cache 分析结果，例如 llmview.prompt_cache @all"""
+        results = [
+            (f.id, f.metadata[PROMPT_CACHE_METADATA_KEY])
+            for f in flows
+            if isinstance(f, http.HTTPFlow) and f.metadata.get(PROMPT_CACHE_METADATA_KEY)
+        ]
+        return summarize(results)
+
+    @command.command("llmview.prompt_cache_reset")
+    def reset(self) -> None:
+        """清空保留的请求前缀链，之后的请求不再与之前的请求比较"""
+        # 前缀链只在分析线程中修改
+        flow_analysis.call(prompt_cache.clear)
@@ -0,0 +1,119 @@
+"""响应视图共用的markdown渲染函数"""
+from typing import Any, Callable, List, Optional, Tuple
+
+from llmview import codec
+from llmview.cache import flow_cache
+
+split_line = "\n----------------------------------\n"
+
+
+def multi_line_splitter(line: int) -> str:
+    """生成分割线"""
+    return "\n " * line + "\n"
+
+
+_JSON_WHITESPACE = " \t\r\n"
+# JSON值可能的第一个字符，和对象、数组对应的最后一个字符
+_JSON_START = frozenset('{["-0123456789tfn')
+_JSON_END = {"{": "}", "[": "]", '"': '"'}
+MAX_SCALAR_CHARS = 64
+
+# 达到这个长度的文本按内容摘要缓存格式化结果
+MEMO_MIN_CHARS = 4096
+
+
+def looks_like_json(text: str) -> bool:
+    """只检查首尾的非空白字符，判断是否值得尝试解析"""
+    start, end = 0, len(text)
+    while start < end and text[start] in _JSON_WHITESPACE:
+        start += 1
+    while end > start and text[end - 1] in _JSON_WHITESPACE:
+        end -= 1
+    if start == end or text[start] not in _JSON_START:
+        return False
+    closing = _JSON_END.get(text[start])
+    if closing is None:
+        # 数字和 true/false/null 都很短，以数字开头的长文本(例如编号列表)不是JSON
+        return end - start <= MAX_SCALAR_CHARS
+    return text[end - 1] == closing
+
+
+def pretty_json(text: str, indent: int = 2) -> Optional[str]:
+    """text 是JSON时返回格式化后的文本，否则返回None"""
+    if not looks_like_json(text):
+        return None
+    try:
+        return codec.dumps_pretty(codec.loads(text), indent=indent)
+    except codec.JSONDecodeError:
+        return None
+
+
+def indent_lines(text: str, n: int) -> str:
+    """把含有非空白字符的行缩进 n 个空格，不尝试解析JSON"""
+    # 分行、加前缀、拼接三步，不是一次遍历。一次遍历的 re.sub(r"(?m)^(?=[^\S\n]*\S)", ...)
+    # 在100KB的文本上更慢(0.78ms，这里是0.33ms)，也不会像 splitlines 一样把 \r\n 等行结束符统一为 \n
+    if n <= 0:
+        return "\n".join(text.splitlines())
+    indent = " " * n
+    return "\n".join([(indent + line) if line.strip() else line for line in text.splitlines()])
+
+
+def _memoized(slot: str, text: str, compute: Callable[[], str]) -> str:
+    """较长的JSON文本按内容摘要缓存结果，同一段文本在不同flow和视图中只解析和格式化一次"""
+    if len(text) < MEMO_MIN_CHARS:
+        return compute()
+    key = flow_cache.content_key("text", text.encode("utf-8", errors="surrogatepass"))
+    return flow_cache.get_or_compute(key, slot, compute)
+
+
+def indent_text(text: str, n: int) -> str:
+    """将多行文本整体缩进 n 个空格，JSON文本先美化为4个空格缩进"""
+    # 普通文本(例如 content 和 reasoning)不尝试解析，也不计算摘要
+    if not looks_like_json(text):
+        return indent_lines(text, n)
+
+    def compute() -> str:
+        pretty = pretty_json(text, indent=4)
+        return indent_lines(text if pretty is None else pretty, n)
+
+    return _memoized(f"indent-{n}", text, compute)
+
+
+def format_json_text(text: str) -> str:
+    """将JSON文本格式化为markdown代码块，不是JSON时保持原样"""
+    if not text or not looks_like_json(text):
+        return text
+
+    def compute() -> str:
+        pretty = pretty_json(text)
+        return text if pretty is None else f"```json\n{pretty}\n```"
+
+    return _memoized("json-block", text, compute)
+
+
+def format_json_value(value: Any) -> str:
+    """把已经解析好的对象格式化为markdown代码块，字符串按JSON文本处理"""
+    if isinstance(value, str):
+        return format_json_text(value)
+    return f"```json\n{codec.dumps_pretty(value)}\n```"
+
+
+def format_fields(fields: List[Tuple[str, Any]]) -> str:
+    """按标签的最大长度对齐，每个字段一行"""
+    max_label_len = max(len(label) for label, _ in fields) + 2
+    return "".join(f"{label:<{max_label_len}}:   {value}\n" for label, value in fields)
+
+
+def format_section(title: str, text: str) -> str:
+    """带分割线的内容段落，例如 🧠Think 和 💬Content"""
+    return f"#### {title}\n{split_line}{indent_text(text, 4)}{split_line}"
+
+
+def format_tool_call(index: Any, tool_id: Any, tool_type: Any, name: Any, arguments: Any) -> str:
+    return (
+        f"##### Tool Call {index}\n"
+        f"  - ID      : {tool_id}\n"
+        f"  - Type    : {tool_type}\n"
+        f"  - Function: {name}\n"
+        f"  - Arguments: {split_line}{format_json_value(arguments)}{split_line}"
+    )
@@ -0,0 +1,360 @@
+"""OpenAI Responses API (/v1/responses) 响应的聚合和渲染"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from llmview.cache import CacheKey, flow_cache
+from llmview.render import (
+    format_fields,
+    format_json_value,
+    format_section,
+    multi_line_splitter,
+    split_line,
+)
+from llmview.sse import iter_sse_json, parse_sse_data
+
+# 包含完整 response 的最后一个事件
+TERMINAL_EVENTS = ("response.completed", "response.incomplete", "response.failed")
+
+# 片段的键: (output_index, 所在的列表 "content"/"summary"/"", 列表中的index, 字段)
+FragmentKey = Tuple[int, str, int, str]
+
+
+class ResponseStreamAggregator:
+    """
+    将 /v1/responses 的SSE事件折叠为与非流式响应相同结构的 response。
+
+    按事件的 type 查表分发，每个事件只做常数量的工作: 增量追加到
+    (output_index, content_index) 对应的片段列表中，在 snapshot() 时才拼接。
+    *.done 事件带有完整的值，直接替换已经收到的片段。
+    收到 response.completed 等事件后，snapshot() 直接返回其中的 response。
+    """
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.error: Optional[Dict[str, Any]] = None
+        self.final: Optional[Dict[str, Any]] = None
+        self._response: Dict[str, Any] = {}
+        # output_index -> output item, 以及已经完整(output_item.done)的 item
+        self._items: Dict[int, Dict[str, Any]] = {}
+        self._done: Set[int] = set()
+        # output_index -> {content_index / summary_index -> part}
+        self._content: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self._summary: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self._fragments: Dict[FragmentKey, List[str]] = {}
+
+    def feed(self, event: Dict[str, Any]) -> None:
+        self.events += 1
+        handler = _HANDLERS.get(event.get("type"))
+        if handler is not None:
+            handler(self, event)
+
+    def _item(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        index = event.get("output_index", 0)
+        item = self._items.get(index)
+        if item is None:
+            # 缺少 output_item.added 的增量，按事件类型推断 item 类型
+            item = self._items[index] = {"type": _ITEM_TYPES.get(event.get("type"), "message")}
+        return item
+
+    def _part(self, parts: Dict[int, Dict[int, Dict[str, Any]]], event: Dict[str, Any], index_field: str) -> Dict[str, Any]:
+        self._item(event)
+        item_parts = parts.setdefault(event.get("output_index", 0), {})
+        index = event.get(index_field, 0)
+        part = item_parts.get(index)
+        if part is None:
+            part = item_parts[index] = {}
+        return part
+
+    def _on_response(self, event: Dict[str, Any]) -> None:
+        response = event.get("response")
+        if isinstance(response, dict):
+            self._response = {k: v for k, v in response.items() if k != "output"}
+
+    def _on_final(self, event: Dict[str, Any]) -> None:
+        response = event.get("response")
+        if isinstance(response, dict):
+            self.final = response
+
+    def _on_item(self, event: Dict[str, Any]) -> None:
+        index = event.get("output_index", 0)
+        self._items[index] = dict(event.get("item") or {})
+        if event.get("type") == "response.output_item.done":
+            self._done.add(index)
+
+    def _on_content_part(self, event: Dict[str, Any]) -> None:
+        part = self._part(self._content, event, "content_index")
+        part.update(event.get("part") or {})
+        self._drop(event, "content", "content_index", ("text", "refusal"))
+
+    def _on_summary_part(self, event: Dict[str, Any]) -> None:
+        part = self._part(self._summary, event, "summary_index")
+        part.update(event.get("part") or {})
+        self._drop(event, "summary", "summary_index", ("text",))
+
+    def _drop(self, event: Dict[str, Any], where: str, index_field: str, fields: Tuple[str, ...]) -> None:
+        """part 的完整值已经给出时丢弃片段，只对 *.done 事件生效"""
+        if event.get("type", "").endswith(".done"):
+            for field in fields:
+                self._fragments.pop((event.get("output_index", 0), where, event.get(index_field, 0), field), None)
+
+    def _append(self, event: Dict[str, Any], where: str, index_field: str, field: str) -> None:
+        delta = event.get("delta", "")
+        if not isinstance(delta, str):
+            # 格式错误的增量不能拼接，跳过
+            return
+        if where == "content":
+            part = self._part(self._content, event, index_field)
+        elif where == "summary":
+            part = self._part(self._summary, event, index_field)
+        else:
+            part = self._item(event)
+        key = (event.get("output_index", 0), where, event.get(index_field, 0) if index_field else 0, field)
+        fragments = self._fragments.get(key)
+        if fragments is None:
+            # 已经有的值(例如 content_part.added 中的空字符串)作为第一个片段
+            initial = part.get(field)
+            fragments = self._fragments[key] = [initial] if isinstance(initial, str) else []
+        fragments.append(delta)
+
+    def _set(self, event: Dict[str, Any], where: str, index_field: str, field: str, value_field: str) -> None:
+        if where == "content":
+            part = self._part(self._content, event, index_field)
+        elif where == "summary":
+            part = self._part(self._summary, event, index_field)
+        else:
+            part = self._item(event)
+        part[field] = event.get(value_field, "")
+        key = (event.get("output_index", 0), where, event.get(index_field, 0) if index_field else 0, field)
+        self._fragments.pop(key, None)
+
+    def _on_annotation(self, event: Dict[str, Any]) -> None:
+        part = self._part(self._content, event, "content_index")
+        part.setdefault("annotations", []).append(event.get("annotation"))
+
+    def _on_error(self, event: Dict[str, Any]) -> None:
+        self.error = event.get("error") or event
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回聚合结果:
+          - events  : 事件数量
+          - response: 与非流式响应结构相同的 response
+          - error   : error 事件的内容，没有则为None(失败的 response 中的错误在 response.error)
+          - final   : response 是否直接取自 response.completed 等事件
+        """
+        if self.final is not None:
+            return {"events": self.events, "response": self.final, "error": self.error, "final": True}
+        fragments: Dict[Tuple[int, str, int], Dict[str, str]] = {}
+        for (index, where, part_index, field), parts in self._fragments.items():
+            fragments.setdefault((index, where, part_index), {})[field] = "".join(parts)
+        output = []
+        for index, item in sorted(self._items.items()):
+            item = dict(item)
+            if index not in self._done:
+                for where, parts in (("content", self._content), ("summary", self._summary)):
+                    if index in parts:
+                        item[where] = [
+                            dict(part, **fragments.get((index, where, part_index), {}))
+                            for part_index, part in sorted(parts[index].items())
+                        ]
+                item.update(fragments.get((index, "", 0), {}))
+            output.append(item)
+        response = dict(self._response, output=output)
+        return {"events": self.events, "response": response, "error": self.error, "final": False}
+
+
+def _delta(where: str, index_field: str, field: str) -> Callable[[ResponseStreamAggregator, Dict[str, Any]], None]:
+    return lambda aggregator, event: aggregator._append(event, where, index_field, field)
+
+
+def _done(where: str, index_field: str, field: str, value_field: str) -> Callable[[ResponseStreamAggregator, Dict[str, Any]], None]:
+    return lambda aggregator, event: aggregator._set(event, where, index_field, field, value_field)
+
+
+# 事件 type -> 处理函数，没有列出的事件(例如 response.*.in_progress)只计数
+_HANDLERS: Dict[Any, Callable[[ResponseStreamAggregator, Dict[str, Any]], None]] = {
+    "response.created": ResponseStreamAggregator._on_response,
+    "response.in_progress": ResponseStreamAggregator._on_response,
+    "response.completed": ResponseStreamAggregator._on_final,
+    "response.incomplete": ResponseStreamAggregator._on_final,
+    "response.failed": ResponseStreamAggregator._on_final,
+    "response.output_item.added": ResponseStreamAggregator._on_item,
+    "response.output_item.done": ResponseStreamAggregator._on_item,
+    "response.content_part.added": ResponseStreamAggregator._on_content_part,
+    "response.content_part.done": ResponseStreamAggregator._on_content_part,
+    "response.output_text.delta": _delta("content", "content_index", "text"),
+    "response.output_text.done": _done("content", "content_index", "text", "text"),
+    "response.output_text.annotation.added": ResponseStreamAggregator._on_annotation,
+    "response.refusal.delta": _delta("content", "content_index", "refusal"),
+    "response.refusal.done": _done("content", "content_index", "refusal", "refusal"),
+    "response.reasoning_text.delta": _delta("content", "content_index", "text"),
+    "response.reasoning_text.done": _done("content", "content_index", "text", "text"),
+    "response.reasoning_summary_part.added": ResponseStreamAggregator._on_summary_part,
+    "response.reasoning_summary_part.done": ResponseStreamAggregator._on_summary_part,
+    "response.reasoning_summary_text.delta": _delta("summary", "summary_index", "text"),
+    "response.reasoning_summary_text.done": _done("summary", "summary_index", "text", "text"),
+    "response.function_call_arguments.delta": _delta("", "", "arguments"),
+    "response.function_call_arguments.done": _done("", "", "arguments", "arguments"),
+    "response.custom_tool_call_input.delta": _delta("", "", "input"),
+    "response.custom_tool_call_input.done": _done("", "", "input", "input"),
+    "response.mcp_call_arguments.delta": _delta("", "", "arguments"),
+    "response.mcp_call_arguments.done": _done("", "", "arguments", "arguments"),
+    "error": ResponseStreamAggregator._on_error,
+}
+
+# 缺少 output_item.added 时，由增量事件推断的 item 类型
+_ITEM_TYPES = {
+    "response.reasoning_text.delta": "reasoning",
+    "response.reasoning_summary_text.delta": "reasoning",
+    "response.reasoning_summary_part.added": "reasoning",
+    "response.function_call_arguments.delta": "function_call",
+    "response.custom_tool_call_input.delta": "custom_tool_call",
+    "response.mcp_call_arguments.delta": "mcp_call",
+}
+
+
+def aggregate_response_events(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """一次性聚合已经解析好的SSE事件列表"""
+    aggregator = ResponseStreamAggregator()
+    for event in events:
+        if isinstance(event, dict):
+            aggregator.feed(event)
+    return aggregator.snapshot()
+
+
+def _event_start(data: bytes, position: int) -> int:
+    """position 所在的SSE事件的起始位置: 之前最近的空行之后"""
+    start = 0
+    for separator in (b"\n\n", b"\r\n\r\n", b"\r\r"):
+        found = data.rfind(separator, 0, position)
+        if found >= 0:
+            start = max(start, found + len(separator))
+    return start
+
+
+def count_events(data: bytes) -> int:
+    """统计 data 行的数量(不含 [DONE])，不解析事件"""
+    # JSON字符串中的换行是转义的，行首的 "data:" 一定是一个 data 行
+    count = data.count(b"\ndata:") + data.startswith(b"data:")
+    return count - data.count(b"data: [DONE]") - data.count(b"data:[DONE]")
+
+
+def find_final_response(data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    只解析SSE body中最后一个 response.completed(或 incomplete/failed) 事件，
+    返回其中完整的 response，不需要解析之前的增量事件。找不到时返回None。
+    """
+    position = -1
+    for event_type in TERMINAL_EVENTS:
+        # 带引号的类型名不会出现在JSON字符串值中(其中的引号是转义的)
+        position = max(position, data.rfind(b'"' + event_type.encode("ascii") + b'"'))
+    if position < 0:
+        return None
+    for event in iter_sse_json(data[_event_start(data, position) :]):
+        if isinstance(event, dict) and event.get("type") in TERMINAL_EVENTS and isinstance(event.get("response"), dict):
+            return event["response"]
+    return None
+
+
+def aggregate_response_stream(data: bytes, key: Optional[CacheKey]) -> Dict[str, Any]:
+    """
+    聚合 /v1/responses 的SSE body。
+
+    有 response.completed 等事件时只解析这一个事件，直接使用其中完整的 response，
+    不解析和重放之前的增量事件；否则(例如被中断的流)逐个聚合所有事件。
+    """
+    final = find_final_response(data)
+    if final is not None:
+        return {"events": count_events(data), "response": final, "error": None, "final": True}
+    events = flow_cache.get_or_compute(
+        key, "sse-events", lambda: parse_sse_data(data), size=len(data)
+    )
+    return aggregate_response_events(events)
+
+
+def handle_response_basis(response: Dict[str, Any]) -> str:
+    """处理响应的基础信息: id, model, status, usage"""
+    usage = response.get("usage") or {}
+    fields = [
+        ("id", response.get("id", "N/A")),
+        ("model", response.get("model", "N/A")),
+        ("status", response.get("status", "N/A")),
+        ("input_tokens", usage.get("input_tokens", "N/A")),
+        ("output_tokens", usage.get("output_tokens", "N/A")),
+        ("total_tokens", usage.get("total_tokens", "N/A")),
+    ]
+    # 只有不为0时才显示
+    cached_tokens = (usage.get("input_tokens_details") or {}).get("cached_tokens")
+    if cached_tokens:
+        fields.append(("cached_tokens", cached_tokens))
+    reasoning_tokens = (usage.get("output_tokens_details") or {}).get("reasoning_tokens")
+    if reasoning_tokens:
+        fields.append(("reasoning_tokens", reasoning_tokens))
+    incomplete = response.get("incomplete_details") or {}
+    if incomplete.get("reason"):
+        fields.append(("incomplete", incomplete["reason"]))
+    if response.get("previous_response_id"):
+        fields.append(("previous_response_id", response["previous_response_id"]))
+    return format_fields(fields)
+
+
+def parts_text(parts: Any) -> str:
+    """把 content 或 summary 中的文本部分拼接起来"""
+    if isinstance(parts, str):
+        return parts
+    texts = []
+    for part in parts or []:
+        if isinstance(part, dict) and isinstance(part.get("text"), str):
+            texts.append(part["text"])
+    return "\n---\n".join(texts)
+
+
+def handle_output_item(i: int, item: Any) -> str:
+    if not isinstance(item, dict):
+        return format_section(f"📦{i}", str(item))
+    item_type = item.get("type", "N/A")
+    if item_type == "message":
+        result = f"### 📋{i} [role: {item.get('role', 'N/A')}, status: `{item.get('status', 'N/A')}`]\n"
+        for part in item.get("content") or []:
+            part_type = part.get("type") if isinstance(part, dict) else None
+            if part_type == "output_text":
+                result += format_section("💬Content", part.get("text", "").strip())
+            elif part_type == "refusal":
+                result += format_section("🚫Refusal", part.get("refusal", "").strip())
+            else:
+                result += f"#### 📦{part_type}\n{split_line}{format_json_value(part)}{split_line}"
+        return result
+    if item_type == "reasoning":
+        result = f"### 🧠{i} Reasoning\n"
+        summary = parts_text(item.get("summary")).strip()
+        if summary:
+            result += format_section("Summary", summary)
+        content = parts_text(item.get("content")).strip()
+        if content:
+            result += format_section("Think", content)
+        if item.get("encrypted_content"):
+            result += f"#### 🔒Encrypted ({len(item['encrypted_content'])} chars)\n"
+        return result
+    if item_type in ("function_call", "custom_tool_call", "mcp_call"):
+        arguments = item.get("arguments", item.get("input", ""))
+        result = f"### 🔨{i} {item_type}\n"
+        result += f"  - Call ID : {item.get('call_id', item.get('id', 'N/A'))}\n"
+        result += f"  - Name    : {item.get('name', 'N/A')}\n"
+        result += f"  - Arguments: {split_line}{format_json_value(arguments)}{split_line}"
+        return result
+    # 其他类型(例如 web_search_call, image_generation_call)原样显示
+    return f"### 📦{i} {item_type}\n{split_line}{format_json_value(item)}{split_line}"
+
+
+def render_response(response: Dict[str, Any], title: str) -> str:
+    """渲染完整的 response，流式和非流式响应共用"""
+    output = response.get("output") or []
+    result = f"# {title}\n \n"
+    result += handle_response_basis(response)
+    result += multi_line_splitter(2)
+    result += f"## Output🔍 ({len(output)} items)\n"
+    for i, item in enumerate(output):
+        result += handle_output_item(i, item)
+    error = response.get("error")
+    if error:
+        result += f"\n## Error❌\n{error.get('code', 'N/A')}: {error.get('message', '')}\n"
+    return result
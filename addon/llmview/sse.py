@@ -0,0 +1,206 @@
+import logging
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from llmview import codec
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# SSE规范中的行结束符: CRLF, LF 或 CR
+_LINE_END = re.compile(rb"\r\n|\r|\n")
+_BOM = b"\xef\xbb\xbf"
+
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str]
+    retry: Optional[int]
+
+
+def _line_spans(buf: Buffer, pos: int) -> Iterator[Tuple[int, int]]:
+    """返回每个完整行的 (行尾位置, 下一行起始位置)"""
+    if isinstance(buf, memoryview) or buf.find(b"\r", pos) >= 0:
+        for match in _LINE_END.finditer(buf, pos):
+            yield match.span()
+        return
+    # 只有LF时使用 find，比正则快很多
+    find = buf.find
+    while True:
+        end = find(b"\n", pos)
+        if end < 0:
+            return
+        pos = end + 1
+        yield end, pos
+
+
+class SSEDecoder:
+    """
+    按照SSE规范增量解析字节流，每次 feed 只处理已经完整的行。
+
+    一次性解析整个body时直接在原始 buffer 上查找行尾，只有每一行和
+    末尾不完整的行会被复制，不会复制整个payload。
+
+    不完整的行按chunk保存在列表中，收到行结束符时才拼接，一行被拆成很多个
+    chunk 时不会每次都复制之前收到的部分。
+    """
+
+    def __init__(self) -> None:
+        self._pending: List[bytes] = []
+        self._skip_lf = False
+        self._started = False
+        self._data: List[bytes] = []
+        self._event = b""
+        self._last_id: Optional[bytes] = None
+        self._retry: Optional[int] = None
+
+    def feed(self, chunk: Buffer) -> Iterator[SSEEvent]:
+        if not len(chunk):
+            # 空chunk不能清除 _skip_lf，否则下一个chunk开头的LF会被当作空行
+            return
+        buf: Buffer = chunk
+        if self._pending:
+            piece = bytes(chunk)
+            self._pending.append(piece)
+            if b"\n" not in piece and b"\r" not in piece:
+                return
+            buf = b"".join(self._pending)
+            self._pending = []
+        pos = 0
+        # 上一个chunk以CR结尾时，紧跟着的LF属于同一个行结束符
+        if self._skip_lf and buf[:1] == b"\n":
+            pos = 1
+        self._skip_lf = False
+        if not self._started and len(buf) > pos:
+            if len(buf) - pos < 3 and _BOM.startswith(bytes(buf[pos:])):
+                # BOM 可能被拆到下一个chunk中，等收到更多数据再判断
+                self._pending = [bytes(buf[pos:])]
+                return
+            self._started = True
+            if buf[pos : pos + 3] == _BOM:
+                pos += 3
+
+        data_lines = self._data
+        for start, end in _line_spans(buf, pos):
+            line = bytes(buf[pos:start])
+            pos = end
+            # 最常见的两种行直接处理: 空行(分发事件) 和 "data:" 行
+            if not line:
+                if data_lines:
+                    yield self._dispatch()
+                    data_lines = self._data
+                else:
+                    self._event = b""
+            elif line[:5] == b"data:":
+                data_lines.append(line[6:] if line[5:6] == b" " else line[5:])
+            else:
+                event = self._process_line(line)
+                if event is not None:
+                    yield event
+                    data_lines = self._data
+        if pos < len(buf):
+            self._pending = [bytes(buf[pos:])]
+        elif len(buf) and buf[-1:] == b"\r":
+            self._skip_lf = True
+
+    def close(self) -> Iterator[SSEEvent]:
+        """
+        结束解析。规范要求丢弃没有以空行结尾的事件，
+        但为了兼容被截断的抓包，这里仍然返回最后一个事件。
+        """
+        if self._pending:
+            line = b"".join(self._pending)
+            self._pending = []
+            if not self._started and line[:3] == _BOM:
+                line = line[3:]
+            event = self._process_line(line)
+            if event is not None:
+                yield event
+        event = self._dispatch()
+        if event is not None:
+            yield event
+
+    def _process_line(self, line: bytes) -> Optional[SSEEvent]:
+        if not line:
+            return self._dispatch()
+        # 注释行
+        if line[0] == 0x3A:
+            return None
+        colon = line.find(b":")
+        if colon < 0:
+            field, value = line, b""
+        else:
+            field, value = line[:colon], line[colon + 1 :]
+            if value[:1] == b" ":
+                value = value[1:]
+
+        if field == b"data":
+            self._data.append(value)
+        elif field == b"event":
+            self._event = value
+        elif field == b"id":
+            if b"\0" not in value:
+                self._last_id = value
+        elif field == b"retry":
+            if value.isdigit():
+                self._retry = int(value)
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            self._event = b""
+            return None
+        lines = self._data
+        data = (lines[0] if len(lines) == 1 else b"\n".join(lines)).decode("utf-8", errors="replace")
+        event = SSEEvent(
+            self._event.decode("utf-8", errors="replace") or "message",
+            data,
+            None if self._last_id is None else self._last_id.decode("utf-8", errors="replace"),
+            self._retry,
+        )
+        self._data = []
+        self._event = b""
+        return event
+
+
+def iter_sse_events(data: Buffer) -> Iterator[SSEEvent]:
+    """惰性地解析完整的SSE body，调用方可以随时停止迭代"""
+    decoder = SSEDecoder()
+    yield from decoder.feed(data)
+    yield from decoder.close()
+
+
+def decode_sse_json(event: SSEEvent) -> List[Any]:
+    """解析事件中的JSON数据，跳过 [DONE]"""
+    data = event.data
+    if data == "[DONE]" or data.strip() == "[DONE]":
+        return []
+    try:
+        return [codec.loads(data)]
+    except codec.JSONDecodeError:
+        if "\n" not in data:
+            logging.warning(f"Could not decode SSE JSON data: {data}")
+            return []
+    # 有的服务端在 data 行之间不输出空行，多个 data 行会被合并为一个事件，逐行解析
+    results = []
+    for line in data.split("\n"):
+        if not line.strip() or line.strip() == "[DONE]":
+            continue
+        try:
+            results.append(codec.loads(line))
+        except codec.JSONDecodeError:
+            logging.warning(f"Could not decode SSE JSON data: {line}")
+    return results
+
+
+def iter_sse_json(data: Buffer) -> Iterator[Any]:
+    """惰性地解析SSE body中每个事件的JSON数据"""
+    for event in iter_sse_events(data):
+        yield from decode_sse_json(event)
+
+
+def parse_sse_data(data: Buffer) -> List[Dict[str, Any]]:
+    """解析SSE格式的数据流"""
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("SSE Raw Data:\n%s", bytes(data).decode("utf-8", errors="replace"))
+    return list(iter_sse_json(data))
@@ -0,0 +1,356 @@
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from mitmproxy import command, ctx, flow, http
+
+from llmview.cache import matches_body, stamp_body
+from llmview.compact import (
+    COMPACT_METADATA_KEY,
+    TIMING_METADATA_KEY,
+    StreamCompactor,
+    chunk_timing,
+    rebuild_chunks,
+    stored_compact,
+)
+from llmview.endpoints import CHAT_COMPLETIONS, SSE, body_type, endpoints
+from llmview.media import format_bytes
+from llmview.sse import SSEDecoder, decode_sse_json, iter_sse_events
+
+# 流式聚合结果保存在 flow.metadata 中的键
+STREAM_METADATA_KEY = "llmview.chat_completion_stream"
+
+
+class ChatCompletionAggregator:
+    """
+    将 /chat/completions 的SSE事件逐个折叠为聚合结果。
+
+    每个事件只做常数级别的工作，字符串增量先缓存在列表中，
+    在 snapshot() 时才拼接，避免重复的字符串拼接。
+    结构不符合预期的事件、choice 和 delta 被跳过，只拼接字符串片段。
+    """
+
+    def __init__(self) -> None:
+        self.events = 0
+        self._last_event: Optional[Dict[str, Any]] = None
+        self._usage_event: Optional[Dict[str, Any]] = None
+        # choice_index -> {"role", "finish_reason", "content", "reasoning_content", "tool_calls"}
+        self._choices: Dict[int, Dict[str, Any]] = {}
+
+    def feed(self, event: Any) -> None:
+        # 例如 data: "keepalive" 或 data: null
+        if not isinstance(event, dict):
+            return
+        self.events += 1
+        self._last_event = event
+        # 记录最后一个包含 usage 信息的事件，作为基础信息来源
+        if event.get("usage") is not None:
+            self._usage_event = event
+
+        choices = event.get("choices")
+        for choice in choices if isinstance(choices, list) else []:
+            if not isinstance(choice, dict):
+                continue
+            choice_index = choice.get("index", 0)
+            if not isinstance(choice_index, int):
+                choice_index = 0
+            delta = choice.get("delta")
+            if not isinstance(delta, dict):
+                delta = {}
+
+            current_choice = self._choices.get(choice_index)
+            if current_choice is None:
+                current_choice = self._choices[choice_index] = {
+                    "role": "N/A",
+                    "finish_reason": "N/A",
+                    "content": [],
+                    "reasoning_content": [],
+                    "tool_calls": {},
+                }
+
+            if isinstance(delta.get("role"), str) and delta["role"]:
+                current_choice["role"] = delta["role"]
+            if isinstance(delta.get("content"), str) and delta["content"]:
+                current_choice["content"].append(delta["content"])
+            if isinstance(delta.get("reasoning_content"), str) and delta["reasoning_content"]:
+                current_choice["reasoning_content"].append(delta["reasoning_content"])
+
+            tool_call_chunks = delta.get("tool_calls")
+            for tool_call_chunk in tool_call_chunks if isinstance(tool_call_chunks, list) else []:
+                self._feed_tool_call(current_choice["tool_calls"], tool_call_chunk)
+
+            # 获取最终的 finish_reason
+            if isinstance(choice.get("finish_reason"), str) and choice["finish_reason"]:
+                current_choice["finish_reason"] = choice["finish_reason"]
+
+    @staticmethod
+    def _feed_tool_call(tool_calls: Dict[int, Dict[str, Any]], chunk: Any) -> None:
+        tool_index = chunk.get("index") if isinstance(chunk, dict) else None
+        if not isinstance(tool_index, int):
+            return  # 无效的tool_call块
+
+        current_tool_call = tool_calls.setdefault(tool_index, {})
+        # 合并ID, type, function name
+        if "id" in chunk:
+            current_tool_call["id"] = chunk["id"]
+        if "type" in chunk:
+            current_tool_call["type"] = chunk["type"]
+        func = chunk.get("function")
+        if isinstance(func, dict) and func:
+            function = current_tool_call.setdefault("function", {})
+            if "name" in func:
+                function["name"] = func["name"]
+            # arguments 的片段先缓存在列表中
+            if isinstance(func.get("arguments"), str):
+                function.setdefault("arguments", []).append(func["arguments"])
+            elif "arguments" in func:
+                function.setdefault("arguments", [])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回聚合结果，只包含可以序列化到 flow.metadata 中的基础类型:
+          - events : 事件数量
+          - meta   : 最后一个包含 usage 的事件，没有则为最后一个事件
+          - choices: 按 index 排序的聚合 choice 列表
+        """
+        choices = []
+        for index, choice in sorted(self._choices.items()):
+            tool_calls = []
+            for tool_index, tool_call in sorted(choice["tool_calls"].items()):
+                tool_call = dict(tool_call, index=tool_index)
+                if "function" in tool_call:
+                    function = dict(tool_call["function"])
+                    if "arguments" in function:
+                        function["arguments"] = "".join(function["arguments"])
+                    tool_call["function"] = function
+                tool_calls.append(tool_call)
+            choices.append(
+                {
+                    "index": index,
+                    "role": choice["role"],
+                    "finish_reason": choice["finish_reason"],
+                    "content": "".join(choice["content"]),
+                    "reasoning_content": "".join(choice["reasoning_content"]),
+                    "tool_calls": tool_calls,
+                }
+            )
+        return {
+            "events": self.events,
+            "meta": self._usage_event or self._last_event,
+            "choices": choices,
+        }
+
+
+def aggregate_chat_completion_events(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """一次性聚合已经解析好的SSE事件列表"""
+    aggregator = ChatCompletionAggregator()
+    for event in events:
+        aggregator.feed(event)
+    return aggregator.snapshot()
+
+
+def stored_snapshot(flow: Optional[http.HTTPFlow], data: bytes) -> Optional[Dict[str, Any]]:
+    """读取流式传输时保存的聚合结果，body 被修改过时返回None"""
+    if flow is None:
+        return None
+    stored = flow.metadata.get(STREAM_METADATA_KEY)
+    if stored is None or not matches_body(stored, data):
+        return None
+    return stored
+
+
+class _ChatCompletionStream:
+    """
+    安装在 flow.response.stream 上的回调，原样转发数据的同时聚合SSE事件。
+
+    回调在mitmproxy转发数据的路径上运行，抛出的异常会断开客户端连接。
+    解析或聚合出错时记录日志并停止这个flow的聚合，数据仍然原样转发。
+    """
+
+    def __init__(self, compactor: Optional[StreamCompactor] = None) -> None:
+        self.aggregator = ChatCompletionAggregator()
+        self.compactor = compactor
+        self.received = 0
+        self._chunks: List[bytes] = []
+        self._decoder = SSEDecoder()
+        # 第一个事件到达的时间，用于计算 time-to-first-token
+        self.first_event_at: Optional[float] = None
+        self.failed = False
+
+    def __call__(self, data: bytes) -> bytes:
+        self._chunks.append(data)
+        self.received += len(data)
+        if self.failed:
+            return data
+        try:
+            self._aggregate(data)
+        except Exception as e:
+            logging.warning(f"Stopped aggregating a /chat/completions stream after an error: {e!r}")
+            self.failed = True
+            self.compactor = None
+        return data
+
+    def _aggregate(self, data: bytes) -> None:
+        # 空数据表示流已经结束
+        events = self._decoder.feed(data) if data else self._decoder.close()
+        for event in events:
+            objs = decode_sse_json(event)
+            for obj in objs:
+                if self.first_event_at is None:
+                    self.first_event_at = time.time()
+                self.aggregator.feed(obj)
+            if self.compactor is not None:
+                self.compactor.feed(event, objs, self.received, time.time())
+
+    def finish(self) -> bytes:
+        """拼接完整的body，同时释放各个chunk，避免流结束后仍然保留两份数据"""
+        body = b"".join(self._chunks)
+        self._chunks = []
+        return body
+
+
+def compact_flow(f: http.HTTPFlow, compactor: Optional[StreamCompactor] = None) -> bool:
+    """
+    把已完成的 /chat/completions SSE响应替换为紧凑存储，返回是否替换。
+    compactor 为None时从body解析(没有经过流式转发的flow，例如从文件加载的flow)，
+    这时每个事件的到达时间都记为响应结束的时间。
+    """
+    response = f.response
+    data = response.get_content(strict=False) or b""
+    if not data or stored_compact(f, data) is not None:
+        return False
+    snapshot = stored_snapshot(f, data)
+    if compactor is None:
+        compactor = StreamCompactor()
+        aggregator = ChatCompletionAggregator()
+        timestamp = response.timestamp_end or time.time()
+        for event in iter_sse_events(data):
+            objs = decode_sse_json(event)
+            for obj in objs:
+                aggregator.feed(obj)
+            compactor.feed(event, objs, len(data), timestamp)
+            if compactor.failed:
+                return False
+        if snapshot is None:
+            snapshot = aggregator.snapshot()
+            snapshot["first_event_at"] = None
+    result = compactor.finish(len(data))
+    if result is None:
+        return False
+    body, stored = result
+    response.content = body
+    f.metadata[COMPACT_METADATA_KEY] = stored
+    # 聚合结果不变，更新对应的body后渲染和统计仍然可以直接使用
+    if snapshot is not None:
+        stamp_body(snapshot, body)
+        f.metadata[STREAM_METADATA_KEY] = snapshot
+    return True
+
+
+def expand_flow(f: http.HTTPFlow) -> bool:
+    """
+    把紧凑存储的响应还原为逐chunk的SSE body，返回是否还原。
+    每个网络chunk的边界和到达时间保存在 flow.metadata 中，可以用 iter_timed_chunks() 按原来的节奏重放。
+    """
+    chunks = rebuild_chunks(f)
+    if chunks is None:
+        return False
+    body = b"".join(chunk for _, chunk in chunks)
+    f.response.content = body
+    del f.metadata[COMPACT_METADATA_KEY]
+    f.metadata[TIMING_METADATA_KEY] = chunk_timing(chunks)
+    snapshot = f.metadata.get(STREAM_METADATA_KEY)
+    if snapshot is not None:
+        stamp_body(snapshot, body)
+    return True
+
+
+def _is_chat_completion_stream(f: flow.Flow) -> bool:
+    return (
+        isinstance(f, http.HTTPFlow)
+        and f.response is not None
+        and endpoints.classify(f) == CHAT_COMPLETIONS
+        and body_type(f.response.headers.get("content-type")) == SSE
+    )
+
+
+class StreamAggregator:
+    """
+    在 responseheaders 阶段为 /chat/completions 的SSE响应开启流式转发，
+    数据到达时即聚合，渲染时直接使用保存在 flow.metadata 中的结果。
+    """
+
+    def load(self, loader):
+        loader.add_option(
+            name="llmview_stream_aggregate",
+            typespec=bool,
+            default=True,
+            help="Stream /chat/completions SSE responses through the proxy and aggregate the events while they arrive.",
+        )
+        loader.add_option(
+            name="llmview_compact_streams",
+            typespec=bool,
+            default=False,
+            help=(
+                "Once a streamed /chat/completions response completes, keep only the aggregated response and a "
+                "compact per-chunk index instead of the raw SSE body. The original chunks can be rebuilt with "
+                "llmview.expand_streams before exporting or replaying."
+            ),
+        )
+
+    def responseheaders(self, flow: http.HTTPFlow):
+        if not ctx.options.llmview_stream_aggregate or not flow.live:
+            return
+        if callable(flow.response.stream):
+            return  # 其他addon已经接管了流式处理
+        if endpoints.classify(flow) != CHAT_COMPLETIONS:
+            return
+        if "text/event-stream" not in flow.response.headers.get("content-type", ""):
+            return
+        # 压缩过的数据无法逐块解析，交给普通的渲染流程
+        if flow.response.headers.get("content-encoding", "identity") != "identity":
+            return
+        flow.response.stream = _ChatCompletionStream(StreamCompactor() if ctx.options.llmview_compact_streams else None)
+
+    def response(self, flow: http.HTTPFlow):
+        stream = flow.response.stream
+        if not isinstance(stream, _ChatCompletionStream):
+            return
+        # 流式传输时mitmproxy不会保存body，这里还原以便其他视图和导出使用
+        body = stream.finish()
+        flow.response.raw_content = body
+        # 聚合出错的flow按普通的方式从body渲染
+        if stream.failed:
+            return
+        try:
+            snapshot = stream.aggregator.snapshot()
+        except Exception as e:
+            logging.warning(f"Could not aggregate the stream of flow {flow.id}: {e!r}")
+            return
+        stamp_body(snapshot, body)
+        snapshot["first_event_at"] = stream.first_event_at
+        flow.metadata[STREAM_METADATA_KEY] = snapshot
+        # 数据已经转发给客户端，这时替换保存的body不会影响客户端收到的内容
+        if stream.compactor is not None:
+            compact_flow(flow, stream.compactor)
+            stream.compactor = None
+
+    @command.command("llmview.compact_streams")
+    def compact_streams(self, flows: Sequence[flow.Flow]) -> str:
+        """把已完成的 /chat/completions SSE响应替换为紧凑存储，例如 llmview.compact_streams @all"""
+        count = before = after = 0
+        for f in flows:
+            if not _is_chat_completion_stream(f):
+                continue
+            size = len(f.response.raw_content or b"")
+            if compact_flow(f):
+                count += 1
+                before += size
+                after += len(f.response.raw_content or b"")
+        return f"compacted {count} flows: {format_bytes(before)} -> {format_bytes(after)}"
+
+    @command.command("llmview.expand_streams")
+    def expand_streams(self, flows: Sequence[flow.Flow]) -> str:
+        """还原紧凑存储的SSE响应，用于导出或重放，例如 llmview.expand_streams @marked"""
+        count = sum(1 for f in flows if _is_chat_completion_stream(f) and expand_flow(f))
+        return f"expanded {count} flows"
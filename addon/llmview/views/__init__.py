@@ -0,0 +1,91 @@
+"""
+所有的 contentview，由 llm_better_view.py 统一注册。
+
+注册时只创建 LazyView 代理，视图模块和它依赖的解析、渲染模块在第一次
+render_priority() 或 prettify() 时才导入，mitmproxy 启动和重新加载脚本时
+不需要导入它们。
+"""
+import importlib
+import threading
+from typing import Any, Dict, List, NamedTuple
+
+from mitmproxy import contentviews
+from mitmproxy.contentviews._api import Contentview
+
+from llmview import diskcache, precompute
+
+
+class ViewSpec(NamedTuple):
+    name: str
+    module: str
+    cls: str
+    syntax_highlight: str = "none"
+    # 渲染结果只与body有关，可以保存到磁盘缓存
+    persistent: bool = True
+
+
+VIEWS = (
+    ViewSpec("openai-request", "openai_req", "OpenaiReq"),
+    ViewSpec("openai-request-delta", "openai_req", "OpenaiReqDelta", persistent=False),
+    ViewSpec("openai-response", "openai_res", "OpenaiResp"),
+    ViewSpec("openai-sse-response", "openai_res_sse", "OpenaiRespSSE"),
+    ViewSpec("openai-json-response", "openai_res_json", "OpenaiRespJson", "json"),
+    ViewSpec("openai-responses-request", "openai_responses_req", "OpenaiResponsesReq"),
+    ViewSpec("openai-responses-response", "openai_responses_res", "OpenaiResponsesResp"),
+    ViewSpec("openai-responses-sse-response", "openai_responses_sse", "OpenaiResponsesSSE"),
+    ViewSpec("anthropic-request", "anthropic_req", "AnthropicReq"),
+    ViewSpec("anthropic-response", "anthropic_res", "AnthropicResp"),
+    ViewSpec("anthropic-sse-response", "anthropic_res_sse", "AnthropicRespSSE"),
+)
+
+_lock = threading.Lock()
+
+
+class LazyView(Contentview):
+    """视图的代理，第一次使用时导入模块并创建真正的视图"""
+
+    def __init__(self, spec: ViewSpec) -> None:
+        self.spec = spec
+        self._view: Any = None
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    @property
+    def syntax_highlight(self) -> str:
+        return self.spec.syntax_highlight
+
+    @property
+    def view(self) -> Any:
+        view = self._view
+        if view is None:
+            # 后台预渲染线程和主线程可能同时第一次使用同一个视图
+            with _lock:
+                if self._view is None:
+                    module = importlib.import_module(f"{__name__}.{self.spec.module}")
+                    self._view = getattr(module, self.spec.cls)()
+                view = self._view
+        return view
+
+    def prettify(self, data: bytes, metadata: contentviews.Metadata) -> str:
+        return self.view.prettify(data, metadata)
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.view.render_priority(data, metadata)
+
+
+def register_all() -> List[LazyView]:
+    """向 mitmproxy 和预渲染注册所有视图，重新加载脚本时按名字覆盖"""
+    views = [LazyView(spec) for spec in VIEWS]
+    for view in views:
+        contentviews.add(view)
+        precompute.register(view)
+        if view.spec.persistent:
+            diskcache.register(view.name)
+    return views
+
+
+def load_views() -> Dict[str, Any]:
+    """导入所有视图模块，返回视图名 -> 视图实例，用于批量导出和基准测试"""
+    return {spec.name: LazyView(spec).view for spec in VIEWS}
@@ -0,0 +1,171 @@
+import logging
+from typing import Any, List, Optional
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.budget import TextBuilder, format_size, render_budget
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import ANTHROPIC_MESSAGES, JSON, REQUEST, message_class
+from llmview.media import as_blob, elide_blobs
+from llmview.profiling import profiler
+from llmview.render import format_fields, format_json_value, multi_line_splitter, split_line
+
+
+def handle_request_basis(body: Any) -> str:
+    """处理请求的基础信息: model,max_tokens,temperature,stream,thinking,messages.length,tools.length"""
+    thinking = body.get("thinking") or {}
+    return format_fields(
+        [
+            ("model", body.get("model", "N/A")),
+            ("max_tokens", body.get("max_tokens", "N/A")),
+            ("temperature", body.get("temperature", "N/A")),
+            ("stream", body.get("stream", "N/A")),
+            ("thinking", thinking.get("budget_tokens", thinking.get("type", "N/A"))),
+            ("messages", len(body.get("messages", []))),
+            ("tools", len(body.get("tools", []))),
+        ]
+    )
+
+
+def block_text(content: Any) -> str:
+    """把字符串或 text block 列表转换为文本，例如 system 和 tool_result 的 content"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+            else:
+                # image, document 等block中的base64数据替换为摘要，不输出原始内容
+                parts.append(codec.dumps_inline(elide_blobs(block)))
+        return "\n---\n".join(parts)
+    return "" if content is None else str(content)
+
+
+def handle_system(system: Any, out: TextBuilder) -> None:
+    text = render_budget.clip(block_text(system).strip())
+    if text:
+        out.append(f"## System⚙️\n{split_line}{text}{split_line}")
+        out.append(multi_line_splitter(2))
+
+
+def handle_block(j: int, block: Any, out: TextBuilder) -> None:
+    if not isinstance(block, dict):
+        out.append(f"#### 💬{j} Content\n{split_line}{render_budget.clip(str(block))}{split_line}")
+        return
+    block_type = block.get("type", "N/A")
+    if block_type == "text":
+        out.append(f"#### 💬{j} Content\n{split_line}{render_budget.clip(block.get('text', ''))}{split_line}")
+    elif block_type == "thinking":
+        out.append(f"#### 🧠{j} Think\n{split_line}{render_budget.clip(block.get('thinking', ''))}{split_line}")
+    elif block_type == "redacted_thinking":
+        out.append(f"#### 🧠{j} Redacted Think ({len(block.get('data', ''))} chars)\n")
+    elif block_type in ("image", "document"):
+        # 不输出base64数据，只显示媒体类型、解码后的大小和摘要
+        source = block.get("source") or {}
+        blob = as_blob(source.get("data"), source.get("media_type"))
+        if blob is not None:
+            details = blob.summary()
+        else:
+            details = f"[{source.get('media_type') or source.get('url') or source.get('type', 'N/A')}]"
+        out.append(f"#### 🖼️{j} {block_type} {details}\n")
+    elif block_type in ("tool_use", "server_tool_use"):
+        out.append(f"#### 🔨{j} Tool Use\n")
+        out.append(f"  - ID   : {block.get('id', 'N/A')}\n")
+        out.append(f"  - Name : {block.get('name', 'N/A')}\n")
+        out.append(f"  - Input: {split_line}{format_json_value(block.get('input', {}))}{split_line}")
+    elif block_type == "tool_result":
+        error = " ❌error" if block.get("is_error") else ""
+        out.append(f"#### 🧾{j} Tool Result{error}\n")
+        out.append(f"  - Tool Use ID: {block.get('tool_use_id', 'N/A')}\n")
+        text = render_budget.clip(block_text(block.get("content")))
+        if text:
+            out.append(f"{split_line}{text}{split_line}")
+    else:
+        out.append(f"#### 📦{j} {block_type}\n{split_line}{codec.dumps_inline(block)}{split_line}")
+
+
+def handle_messages(messages: List[Any], out: TextBuilder) -> None:
+    out.append(f"## Messages📖 ({len(messages)})\n")
+    omit_start, omit_end = render_budget.message_window(len(messages))
+    for i, message in enumerate(messages):
+        content = message.get("content", "")
+        if omit_start <= i < omit_end:
+            size = len(block_text(content)) if isinstance(content, (str, list)) else 0
+            out.append(f"### 📋{i} [role: {message.get('role')}] ⏭️ omitted ({format_size(size)})\n")
+            continue
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(messages) - i} more messages omitted (render budget reached)\n")
+            break
+
+        out.append(f"### 📋{i} [role: {message.get('role')}]\n")
+        if isinstance(content, str):
+            if content:
+                out.append(f"#### 💬Content\n{split_line}{render_budget.clip(content)}{split_line}")
+        else:
+            for j, block in enumerate(content or []):
+                handle_block(j, block, out)
+
+
+def handle_tools(tools: List[Any], out: TextBuilder) -> None:
+    out.append(f"## Tools🛠️ ({len(tools)})\n")
+    for i, tool in enumerate(tools):
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(tools) - i} more tools omitted (render budget reached)\n")
+            break
+        # 服务端工具(例如 web_search_20250305)只有 type 和 name
+        name = tool.get("name", "N/A")
+        if "input_schema" not in tool:
+            out.append(f"### 🛠️{i}: {name} [{tool.get('type', 'N/A')}]\n")
+            continue
+        out.append(f"### 🛠️{i}: {name}\n{split_line}{tool.get('description', '')}{split_line}")
+        out.append(f"#### Input Schema:\n{split_line}{format_json_value(tool['input_schema'])}{split_line}\n")
+
+
+class AnthropicReq(Contentview):
+    name = "anthropic-request"
+    syntax_highlight = "none"
+    priorities = {
+        (ANTHROPIC_MESSAGES, REQUEST, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in AnthropicReq prettify: {e}")
+            return f"Error processing request: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+
+        out = TextBuilder(render_budget.max_chars)
+        out.append("# Anthropic Request body\n \n")
+        out.append(handle_request_basis(obj))
+        out.append(multi_line_splitter(2))
+        handle_system(obj.get("system"), out)
+        handle_messages(obj.get("messages", []), out)
+        out.append(multi_line_splitter(3))
+        handle_tools(obj.get("tools", []), out)
+        return out.build()
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
+
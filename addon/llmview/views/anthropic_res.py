@@ -0,0 +1,53 @@
+import logging
+from typing import Optional
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.anthropic import render_message
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import ANTHROPIC_MESSAGES, JSON, RESPONSE, message_class
+from llmview.profiling import profiler
+
+
+class AnthropicResp(Contentview):
+    name = "anthropic-response"
+    syntax_highlight = "none"
+    priorities = {
+        (ANTHROPIC_MESSAGES, RESPONSE, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in AnthropicResp prettify: {e}")
+            return f"Error processing response: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(
+                key, "json", lambda: codec.loads(data), size=len(data)
+            )
+        if obj.get("type") == "error":
+            error = obj.get("error") or {}
+            return f"# Anthropic Error\n \n{error.get('type', 'N/A')}: {error.get('message', '')}\n"
+        return render_message(obj, "Anthropic Response")
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
+
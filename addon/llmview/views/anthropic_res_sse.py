@@ -0,0 +1,68 @@
+import logging
+from typing import Optional
+import traceback
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+from mitmproxy.http import Response
+
+from llmview.anthropic import aggregate_message_events, render_message
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import ANTHROPIC_MESSAGES, RESPONSE, SSE, message_class
+from llmview.profiling import profiler
+from llmview.sse import parse_sse_data
+
+
+class AnthropicRespSSE(Contentview):
+    name = "anthropic-sse-response"
+    syntax_highlight = "none"
+    priorities = {
+        (ANTHROPIC_MESSAGES, RESPONSE, SSE): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error prettifying Anthropic SSE response: {e}")
+            traceback.print_exc()
+            return f"Error during prettifying: {e}\n\n" + data.decode(
+                "utf-8", errors="replace"
+            )
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        if not isinstance(metadata.http_message, Response):
+            return f'"{self.name}" is for Anthropic SSE Response'
+
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("parse"):
+            events = flow_cache.get_or_compute(
+                key, "sse-events", lambda: parse_sse_data(data), size=len(data)
+            )
+        with profiler.phase("aggregate"):
+            snapshot = aggregate_message_events(events)
+        profiler.count_events(snapshot["events"])
+        if not snapshot["events"]:
+            return "# Empty SSE Response"
+
+        result = render_message(snapshot["message"], f"Anthropic SSE Response ({snapshot['events']} events)")
+        error = snapshot["error"]
+        if error:
+            result += f"\n## Error❌\n{error.get('type', 'N/A')}: {error.get('message', '')}\n"
+        return result
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
+
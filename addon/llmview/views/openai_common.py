@@ -0,0 +1,28 @@
+"""OpenAI /chat/completions 的JSON响应和SSE响应视图共用的部分"""
+from typing import Any
+
+from llmview.render import format_fields
+
+
+def handle_response_basis(body: Any) -> str:
+    """处理响应的基础信息: model, object, usage"""
+    # 流式响应中没有 usage 的事件里 usage 为 null
+    usage = body.get("usage") or {}
+    return format_fields(
+        [
+            ("id", body.get("id", "N/A")),
+            ("model", body.get("model", "N/A")),
+            ("object", body.get("object", "N/A")),
+            ("prompt_tokens", usage.get("prompt_tokens", "N/A")),
+            ("completion_tokens", usage.get("completion_tokens", "N/A")),
+            ("total_tokens", usage.get("total_tokens", "N/A")),
+        ]
+    )
+
+
+def handle_system_fingerprint(body: Any) -> str:
+    """处理系统指纹信息"""
+    system_fingerprint = body.get("system_fingerprint", None)
+    if system_fingerprint:
+        return f"## System Fingerprint🔑\n{system_fingerprint}\n"
+    return ""
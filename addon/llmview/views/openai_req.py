@@ -0,0 +1,291 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.budget import TextBuilder, format_size, render_budget
+from llmview.cache import CacheKey, flow_cache
+from llmview.conversation import CONVERSATION_METADATA_KEY
+from llmview.endpoints import CHAT_COMPLETIONS, COMPLETIONS, JSON, REQUEST, message_class
+from llmview.media import elide_blobs
+from llmview.profiling import profiler
+from llmview.prompt_cache import PROMPT_CACHE_METADATA_KEY, format_analysis
+from llmview.render import format_json_text, indent_lines, multi_line_splitter, split_line
+
+DEFAULT_INDENT = 0
+
+
+def format_content(content: Union[str, List[Any]]) -> str:
+    """格式化content内容，处理字符串和对象数组的情况"""
+    if not content:
+        return ""
+
+    # 如果是字符串，直接返回
+    if isinstance(content, str):
+        return content.strip()
+
+    # 如果是列表，需要处理每个对象
+    if isinstance(content, list):
+        result_parts = []
+        for item in content:
+            if isinstance(item, str):
+                result_parts.append(item)
+            elif isinstance(item, dict):
+                # 检查type属性
+                item_type = item.get("type", "")
+                if item_type == "text":
+                    # 处理文本类型
+                    text_content = item.get("text", "")
+                    if isinstance(text_content, str):
+                        result_parts.append(text_content)
+                    elif isinstance(text_content, dict):
+                        # 如果text_content是一个对象，包含value和annotations字段
+                        value = text_content.get("value", "")
+                        annotations = text_content.get("annotations", [])
+                        result_parts.append(value)
+                        # 如果需要显示annotations，可以添加到结果中
+                        if annotations:
+                            result_parts.append(f"[annotations: {codec.dumps_inline(annotations)}]")
+                else:
+                    # 其他类型的对象(image_url, input_audio, file 等)转为JSON字符串，
+                    # 其中的base64数据替换为摘要，不输出原始内容
+                    result_parts.append(codec.dumps_inline(elide_blobs(item)))
+            else:
+                # 其他类型，转为字符串
+                result_parts.append(str(item))
+        return "\n---\n".join(result_parts)
+
+    # 其他情况，转为字符串
+    return str(content)
+
+
+def handle_request_basis(body: Any) -> str:
+    """处理请求的基础信息: model,temperature,stream,max_tokens,messages.length,tools.length"""
+    basic_result = ""
+    model = body.get("model", "N/A")
+    temperature = body.get("temperature", "N/A")
+    stream = body.get("stream", "N/A")
+    max_tokens = body.get("max_tokens", "N/A")
+    messages_length = len(body.get("messages", []))
+    tools_length = len(body.get("tools", []))
+    # 计算所有标签的最大长度，实现右对齐
+    labels = ["model", "temperature", "stream", "max_tokens", "messages", "tools"]
+    max_label_len = max(len(label) for label in labels) + 2
+    basic_result += f'{"model":<{max_label_len}}:   {model}\n'
+    basic_result += f'{"temperature":<{max_label_len}}:   {temperature}\n'
+    basic_result += f'{"stream":<{max_label_len}}:   {stream}\n'
+    basic_result += f'{"max_tokens":<{max_label_len}}:   {max_tokens}\n'
+    basic_result += f'{"messages":<{max_label_len}}:   {messages_length}\n'
+    basic_result += f'{"tools":<{max_label_len}}:   {tools_length}\n'
+    return basic_result
+
+
+def message_size(message: Any) -> int:
+    """估算消息的大小(字符数)，用于省略时的占位信息，不做格式化"""
+    size = 0
+    content = message.get("content")
+    if isinstance(content, str):
+        size += len(content)
+    elif isinstance(content, list):
+        for item in content:
+            if isinstance(item, dict) and isinstance(item.get("text"), str):
+                size += len(item["text"])
+    for tool_call in message.get("tool_calls") or []:
+        arguments = (tool_call.get("function") or {}).get("arguments")
+        if isinstance(arguments, str):
+            size += len(arguments)
+    return size
+
+
+def handle_message_placeholder(i: int, message: Any, out: TextBuilder) -> None:
+    tool_calls = message.get("tool_calls") or []
+    details = format_size(message_size(message))
+    if tool_calls:
+        details += f", {len(tool_calls)} tool calls"
+    out.append(f"### 📋{i} [role: {message.get('role')}] ⏭️ omitted ({details})\n")
+
+
+def handle_messages(
+    messages: Sequence[Any], out: TextBuilder, start: int = 0, identical_to: str = ""
+) -> None:
+    """渲染 messages[start:]，前 start 条消息与 identical_to 这个flow中的相同"""
+    out.append(f"## Messages📖 ({len(messages)})\n")
+    if start:
+        out.append(f"### ⏭️ messages 0..{start - 1} identical to flow {identical_to}\n")
+        if start == len(messages):
+            out.append("### ⏭️ no new messages\n")
+    omit_start, omit_end = render_budget.message_window(len(messages))
+    for i in range(start, len(messages)):
+        message = messages[i]
+        if omit_start <= i < omit_end:
+            handle_message_placeholder(i, message, out)
+            continue
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(messages) - i} more messages omitted (render budget reached)\n")
+            break
+
+        role = message.get("role")
+        raw_content = message.get("content", "")
+        content = render_budget.clip(format_content(raw_content))
+        tool_calls = message.get("tool_calls", [])
+        tool_call_id = message.get("tool_call_id", "")
+        # logging.info(f'🔍[{i}] role: {role}, content: {content}')
+        out.append(f"### 📋{i} [role: {role}]\n")
+
+        # 如果是工具消息，显示 tool_call_id
+        if role == "tool" and tool_call_id:
+            out.append(f"  - Tool Call ID: {tool_call_id}\n")
+
+        if content:
+            out.append(f"#### 💬Content\n{split_line}{content}{split_line}")
+
+        # 处理工具调用
+        if tool_calls:
+            out.append(f"#### 🔨Tool Calls ({len(tool_calls)})\n")
+            for j, tool_call in enumerate(tool_calls):
+                tool_id = tool_call.get("id", "N/A")
+                tool_type = tool_call.get("type", "N/A")
+                function = tool_call.get("function", {})
+                function_name = function.get("name", "N/A")
+                arguments = function.get("arguments", "{}")
+                clipped = render_budget.clip(arguments)
+                # 被截断的参数已经不是合法的JSON，保持原样
+                if clipped is arguments:
+                    clipped = format_json_text(arguments)
+
+                out.append(f"##### Tool Call {j}\n")
+                out.append(f"  - ID      : {tool_id}\n")
+                out.append(f"  - Type    : {tool_type}\n")
+                out.append(f"  - Function: {function_name}\n")
+                out.append(f"  - Arguments: {split_line}{clipped}{split_line}\n")
+
+
+def render_tool(i: int, tool: Any) -> str:
+    tool_name = tool["function"]["name"]
+    tool_desc = tool["function"]["description"]
+    tool_params = tool["function"].get("parameters", {})
+
+    text = f"### 🛠️{i}: {tool_name}\n{split_line}{indent_lines(tool_desc, DEFAULT_INDENT)}{split_line}"
+    # Add parameters if they exist
+    if tool_params:
+        # 参数已经是解析好的对象，直接格式化为JSON代码块
+        text += f"#### Parameters:\n{split_line}```json\n{codec.dumps_pretty(tool_params)}\n```{split_line}\n"
+    return text
+
+
+def render_tools(tools: Sequence[Any]) -> List[str]:
+    """
+    渲染每个tool定义，结果按tools数组的摘要缓存。
+
+    同一个客户端的请求通常带着完全相同的tools，
+    命中缓存时只需要计算一次紧凑序列化后的摘要。
+    """
+    key = flow_cache.content_key("tools", codec.dumps_compact(tools).encode("utf-8"))
+    return flow_cache.get_or_compute(
+        key,
+        "tools",
+        lambda: [render_tool(i, tool) for i, tool in enumerate(tools)],
+        size=lambda rendered: sum(map(len, rendered)),
+    )
+
+
+def handle_tools(tools: Sequence[Any], out: TextBuilder) -> None:
+    out.append(f"## Tools🛠️ ({len(tools)})\n")
+    for i, text in enumerate(render_tools(tools)):
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(tools) - i} more tools omitted (render budget reached)\n")
+            break
+        out.append(text)
+
+
+class OpenaiReq(Contentview):
+    name = "openai-request"
+    syntax_highlight = "none"
+    priorities = {
+        (CHAT_COMPLETIONS, REQUEST, JSON): 2,
+        (COMPLETIONS, REQUEST, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in OpenaiReq prettify: {e}")
+            return f"Error processing request: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        text = flow_cache.get_or_compute(
+            key, self.name, lambda: self.render(data, metadata, key)
+        )
+        # 响应到达后分析结果中会加入 cached_tokens，不放进缓存的文本中
+        analysis = metadata.flow.metadata.get(PROMPT_CACHE_METADATA_KEY) if metadata.flow is not None else None
+        if analysis:
+            text += multi_line_splitter(3) + format_analysis(analysis)
+        return text
+
+    def render(
+        self, data: bytes, metadata: contentviews.Metadata, key: Optional[CacheKey]
+    ) -> str:
+        # logging.info('prettify LLM Request body')
+        # 完整解析一次body，结果放进 "json" 缓存，对话索引和 prompt cache 分析复用同一个对象
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+
+        out = TextBuilder(render_budget.max_chars)
+        out.append("# LLM Request body\n \n")
+        out.append(handle_request_basis(obj))
+        out.append(multi_line_splitter(2))
+        # print(obj['messages'])
+        self.render_messages(obj.get("messages", []), metadata, out)
+        out.append(multi_line_splitter(3))
+        handle_tools(obj.get("tools", []), out)
+
+        return out.build()
+
+    def render_messages(
+        self, messages: Sequence[Any], metadata: contentviews.Metadata, out: TextBuilder
+    ) -> None:
+        handle_messages(messages, out)
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        # return a value > 1 to make sure the custom view is automatically selected
+        return self.priorities.get(message_class(metadata), 0)
+
+
+def conversation_match(metadata: contentviews.Metadata) -> Optional[Dict[str, Any]]:
+    """返回对话索引为该请求记录的最长相同前缀"""
+    if metadata.flow is None:
+        return None
+    return metadata.flow.metadata.get(CONVERSATION_METADATA_KEY)
+
+
+class OpenaiReqDelta(OpenaiReq):
+    """只渲染与同一对话中之前的请求相比新增的消息"""
+
+    name = "openai-request-delta"
+
+    def render_messages(
+        self, messages: Sequence[Any], metadata: contentviews.Metadata, out: TextBuilder
+    ) -> None:
+        match = conversation_match(metadata)
+        common = min(match["common"], len(messages)) if match else 0
+        handle_messages(messages, out, start=common, identical_to=match["flow"] if match else "")
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        # 只有对话索引找到了之前的请求时才优先于完整的请求视图
+        if super().render_priority(data, metadata) and conversation_match(metadata):
+            return 2.5
+        return 0
+
@@ -0,0 +1,108 @@
+import logging
+from typing import Any, List, Optional
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import CHAT_COMPLETIONS, COMPLETIONS, JSON, RESPONSE, message_class
+from llmview.profiling import profiler
+from llmview.render import format_section, format_tool_call, multi_line_splitter
+from llmview.views.openai_common import handle_response_basis, handle_system_fingerprint
+
+
+def handle_response_choices(choices: List[Any]) -> str:
+    choices_result = "## Choices🔍\n"
+
+    for i, choice in enumerate(choices):
+        index = choice.get("index", i)
+        finish_reason = choice.get("finish_reason", "N/A")
+
+        # 处理消息内容
+        message = choice.get("message", {})
+        role = message.get("role", "N/A")
+
+        choices_result += f"### 📋Choice {index} [finish_reason: `{finish_reason}`, role:`{role}`]\n"
+
+        # 显示reasoning_content（如果存在）
+        reasoning_content = message.get("reasoning_content", "").strip()
+        if reasoning_content:
+            choices_result += format_section("🧠Think", reasoning_content)
+
+        # 显示聚合的文本内容
+        content = message.get("content", "").strip()
+        if content:
+            choices_result += format_section("💬Content", content)
+
+        # 处理工具调用，如果有的话
+        tool_calls = message.get("tool_calls", [])
+        if tool_calls:
+            choices_result += f"#### 🔨Tool Calls ({len(tool_calls)})\n"
+            for j, tool_call in enumerate(tool_calls):
+                function = tool_call.get("function", {})
+                choices_result += format_tool_call(
+                    j,
+                    tool_call.get("id", "N/A"),
+                    tool_call.get("type", "N/A"),
+                    function.get("name", "N/A"),
+                    function.get("arguments", "{}"),
+                )
+
+    return choices_result
+
+
+class OpenaiResp(Contentview):
+    name = "openai-response"
+    syntax_highlight = "none"
+    priorities = {
+        (CHAT_COMPLETIONS, RESPONSE, JSON): 2,
+        (COMPLETIONS, RESPONSE, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in OpenaiReq prettify: {e}")
+            return f"Error processing request: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        logging.info("prettify LLM Response body")
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(
+                key, "json", lambda: codec.loads(data), size=len(data)
+            )
+
+        # 处理选项/回复内容
+        choices = obj.get("choices", [])
+        result = f"# LLM Response ({len(choices)} choices) \n \n"
+        result += handle_response_basis(obj)
+        result += multi_line_splitter(2)
+
+        if choices:
+            result += handle_response_choices(choices)
+            result += multi_line_splitter(2)
+
+        # 处理系统指纹
+        result += handle_system_fingerprint(obj)
+
+        return result
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        # return a value > 1 to make sure the custom view is automatically selected
+        return self.priorities.get(message_class(metadata), 0)
+
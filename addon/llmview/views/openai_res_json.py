@@ -0,0 +1,106 @@
+import logging
+from typing import Optional
+import traceback
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+from mitmproxy.http import Response
+
+from llmview import codec
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import CHAT_COMPLETIONS, COMPLETIONS, JSON, RESPONSE, RESPONSES, SSE, message_class
+from llmview.merge import aggregate_sse_to_json
+from llmview.profiling import profiler
+from llmview.responses import aggregate_response_stream
+from llmview.sse import parse_sse_data
+
+
+class OpenaiRespJson(Contentview):
+    name = "openai-json-response"
+    syntax_highlight = "json"
+    # 略低于专门的视图，但高于默认视图
+    priorities = {
+        (CHAT_COMPLETIONS, RESPONSE, JSON): 1.5,
+        (CHAT_COMPLETIONS, RESPONSE, SSE): 1.5,
+        (COMPLETIONS, RESPONSE, JSON): 1.5,
+        (COMPLETIONS, RESPONSE, SSE): 1.5,
+        (RESPONSES, RESPONSE, JSON): 1.5,
+        (RESPONSES, RESPONSE, SSE): 1.5,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error prettifying response: {e}")
+            traceback.print_exc()
+            return f"Error during prettifying: {e}\n\n" + data.decode(
+                "utf-8", errors="replace"
+            )
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        if not isinstance(metadata.http_message, Response):
+            return f'"{self.name}" is for LLM Response'
+
+        # 检查是否为SSE响应
+        content_type = metadata.content_type or ""
+        is_sse = "text/event-stream" in content_type
+        message = message_class(metadata)
+        # Responses API 的事件有类型，不能按通用的方式合并
+        is_responses = message is not None and message[0] == RESPONSES
+
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(
+            key, self.name, lambda: self.render(data, key, is_sse, is_responses)
+        )
+
+    def render(self, data: bytes, key: Optional[CacheKey], is_sse: bool, is_responses: bool = False) -> str:
+        if is_sse and is_responses:
+            with profiler.phase("aggregate"):
+                snapshot = aggregate_response_stream(data, key)
+            profiler.count_events(snapshot["events"])
+            if not snapshot["events"]:
+                return "{}"
+            return codec.dumps_pretty(snapshot["response"])
+        if is_sse:
+            # 处理SSE响应
+            with profiler.phase("parse"):
+                events = flow_cache.get_or_compute(
+                    key, "sse-events", lambda: parse_sse_data(data), size=len(data)
+                )
+            profiler.count_events(len(events))
+            if not events:
+                return "{}"
+
+            # 聚合SSE事件为单个JSON
+            with profiler.phase("aggregate"):
+                aggregated_json = flow_cache.get_or_compute(
+                    key, "sse-aggregate", lambda: aggregate_sse_to_json(events), size=len(data)
+                )
+
+            # 返回格式化的JSON字符串
+            return codec.dumps_pretty(aggregated_json)
+        else:
+            # 处理普通JSON响应
+            try:
+                # 验证是否为有效的JSON
+                with profiler.phase("parse"):
+                    obj = flow_cache.get_or_compute(
+                        key, "json", lambda: codec.loads(data), size=len(data)
+                    )
+                # 返回格式化的JSON字符串
+                return codec.dumps_pretty(obj)
+            except codec.JSONDecodeError as e:
+                return f"Error decoding JSON: {e}\n\nRaw data:\n{data.decode('utf-8', errors='replace')}"
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
@@ -0,0 +1,137 @@
+import logging
+from typing import Any, List, Dict, Optional
+import traceback
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+from mitmproxy.http import Response
+
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import CHAT_COMPLETIONS, COMPLETIONS, RESPONSE, SSE, message_class
+from llmview.profiling import profiler
+from llmview.render import format_section, format_tool_call, multi_line_splitter
+from llmview.sse import parse_sse_data
+from llmview.stream import aggregate_chat_completion_events, stored_snapshot
+from llmview.views.openai_common import handle_response_basis, handle_system_fingerprint
+
+
+def handle_sse_choices(choices: List[Dict[str, Any]]) -> str:
+    """
+    格式化SSE事件流聚合后的所有choices，包括文本内容和工具调用。
+
+    Args:
+        choices: ChatCompletionAggregator.snapshot() 中按index排序的choice列表。
+
+    Returns:
+        格式化后的字符串，展示所有聚合后的choice内容。
+    """
+    # 格式化输出
+    choices_result = "## Choices🔍\n"
+    for choice_data in choices:
+        index = choice_data["index"]
+        finish_reason = choice_data.get("finish_reason", "N/A")
+        role = choice_data.get("role", "N/A")
+
+        choices_result += f"### 📋Choice {index} [finish_reason: `{finish_reason}`, role:`{role}`]\n"
+
+        # 显示reasoning_content（如果存在）
+        reasoning_content = choice_data.get("reasoning_content", "").strip()
+        if reasoning_content:
+            choices_result += format_section("🧠Think", reasoning_content)
+
+        # 显示聚合的文本内容
+        content = choice_data.get("content", "").strip()
+        if content:
+            choices_result += format_section("💬Content", content)
+
+        # 显示聚合的工具调用
+        tool_calls = choice_data.get("tool_calls", [])
+        if tool_calls:
+            choices_result += f"#### 🔨Tool Calls ({len(tool_calls)})\n"
+            for tool_call_data in tool_calls:
+                function = tool_call_data.get("function", {})
+                choices_result += format_tool_call(
+                    tool_call_data["index"],
+                    tool_call_data.get("id", "N/A"),
+                    tool_call_data.get("type", "N/A"),
+                    function.get("name", "N/A"),
+                    function.get("arguments", "{}"),
+                )
+
+    return choices_result
+
+
+class OpenaiRespSSE(Contentview):
+    name = "openai-sse-response"
+    syntax_highlight = "none"
+    priorities = {
+        (CHAT_COMPLETIONS, RESPONSE, SSE): 2,
+        (COMPLETIONS, RESPONSE, SSE): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error prettifying SSE response: {e}")
+            traceback.print_exc()
+            return f"Error during prettifying: {e}\n\n" + data.decode(
+                "utf-8", errors="replace"
+            )
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        # logging.info('prettify LLM SSE Response body')
+        if not isinstance(metadata.http_message, Response):
+            return f'"{self.name}" is for LLM SSE Response'
+
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(
+            key, self.name, lambda: self.render(data, metadata, key)
+        )
+
+    def render(
+        self, data: bytes, metadata: contentviews.Metadata, key: Optional[CacheKey]
+    ) -> str:
+        # 优先使用流式传输时已经聚合好的结果，无需再遍历所有事件
+        snapshot = stored_snapshot(metadata.flow, data)
+        if snapshot is None:
+            with profiler.phase("parse"):
+                events = flow_cache.get_or_compute(
+                    key, "sse-events", lambda: parse_sse_data(data), size=len(data)
+                )
+            with profiler.phase("aggregate"):
+                snapshot = aggregate_chat_completion_events(events)
+        profiler.count_events(snapshot["events"])
+        if not snapshot["events"]:
+            return "# Empty SSE Response or [DONE] only"
+
+        # 最后一个包含 usage 信息的事件，作为基础信息来源
+        final_event_for_meta = snapshot["meta"]
+
+        result = f"# LLM SSE Response ({snapshot['events']} events) \n \n"
+
+        # 1. 处理基础信息
+        result += handle_response_basis(final_event_for_meta)
+        result += multi_line_splitter(2)
+
+        # 2. 处理所有聚合后的 Choices (包括 stop 和 tool_calls)
+        result += handle_sse_choices(snapshot["choices"])
+        result += multi_line_splitter(2)
+
+        # 3. 处理系统指纹
+        result += handle_system_fingerprint(final_event_for_meta)
+
+        return result
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
+
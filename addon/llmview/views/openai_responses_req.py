@@ -0,0 +1,207 @@
+import logging
+from typing import Any, Optional, Sequence
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.budget import TextBuilder, format_size, render_budget
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import JSON, REQUEST, RESPONSES, message_class
+from llmview.media import as_blob, elide_blobs
+from llmview.profiling import profiler
+from llmview.render import format_fields, format_json_value, multi_line_splitter, split_line
+from llmview.responses import parts_text
+
+
+def handle_request_basis(body: Any) -> str:
+    """处理请求的基础信息: model,max_output_tokens,temperature,stream,reasoning,input.length,tools.length"""
+    reasoning = body.get("reasoning") or {}
+    input_items = body.get("input", [])
+    fields = [
+        ("model", body.get("model", "N/A")),
+        ("max_output_tokens", body.get("max_output_tokens", "N/A")),
+        ("temperature", body.get("temperature", "N/A")),
+        ("stream", body.get("stream", "N/A")),
+        ("reasoning", reasoning.get("effort", "N/A")),
+        ("store", body.get("store", "N/A")),
+        ("input", 1 if isinstance(input_items, str) else len(input_items)),
+        ("tools", len(body.get("tools", []))),
+    ]
+    if body.get("previous_response_id"):
+        fields.append(("previous_response_id", body["previous_response_id"]))
+    return format_fields(fields)
+
+
+def handle_instructions(instructions: Any, out: TextBuilder) -> None:
+    text = render_budget.clip(parts_text(instructions).strip())
+    if text:
+        out.append(f"## Instructions⚙️\n{split_line}{text}{split_line}")
+        out.append(multi_line_splitter(2))
+
+
+def handle_part(part: Any, out: TextBuilder) -> None:
+    """格式化 message 的 content 中的一项: input_text, input_image, input_file 等"""
+    if not isinstance(part, dict):
+        out.append(f"#### 💬Content\n{split_line}{render_budget.clip(str(part))}{split_line}")
+        return
+    part_type = part.get("type", "N/A")
+    if part_type in ("input_text", "output_text"):
+        out.append(f"#### 💬Content\n{split_line}{render_budget.clip(part.get('text', ''))}{split_line}")
+    elif part_type in ("input_image", "input_file", "input_audio"):
+        # 不输出base64数据，只显示媒体类型、解码后的大小和摘要
+        data = part.get("image_url") or part.get("file_data") or (part.get("input_audio") or {}).get("data")
+        blob = as_blob(data)
+        if blob is not None:
+            details = blob.summary()
+        else:
+            details = f"[{data or part.get('file_id') or part.get('filename') or 'N/A'}]"
+        out.append(f"#### 🖼️ {part_type} {details}\n")
+    elif part_type == "refusal":
+        out.append(f"#### 🚫Refusal\n{split_line}{render_budget.clip(part.get('refusal', ''))}{split_line}")
+    else:
+        out.append(f"#### 📦{part_type}\n{split_line}{codec.dumps_inline(elide_blobs(part))}{split_line}")
+
+
+def item_size(item: Any) -> int:
+    """估算 input item 的大小(字符数)，用于省略时的占位信息"""
+    if isinstance(item, str):
+        return len(item)
+    if not isinstance(item, dict):
+        return 0
+    size = len(parts_text(item.get("content")))
+    for field in ("arguments", "output", "input"):
+        if isinstance(item.get(field), str):
+            size += len(item[field])
+    return size
+
+
+def item_title(i: int, item: Any) -> str:
+    if not isinstance(item, dict):
+        return f"### 📋{i}"
+    if item.get("role"):
+        return f"### 📋{i} [role: {item['role']}]"
+    return f"### 📋{i} [{item.get('type', 'N/A')}]"
+
+
+def handle_item(i: int, item: Any, out: TextBuilder) -> None:
+    out.append(f"{item_title(i, item)}\n")
+    if not isinstance(item, dict):
+        out.append(f"#### 💬Content\n{split_line}{render_budget.clip(str(item))}{split_line}")
+        return
+    item_type = item.get("type", "message")
+    if item.get("role") or item_type == "message":
+        content = item.get("content", "")
+        if isinstance(content, str):
+            if content:
+                out.append(f"#### 💬Content\n{split_line}{render_budget.clip(content)}{split_line}")
+        else:
+            for part in content or []:
+                handle_part(part, out)
+    elif item_type in ("function_call", "custom_tool_call"):
+        arguments = item.get("arguments", item.get("input", ""))
+        clipped = render_budget.clip(arguments) if isinstance(arguments, str) else arguments
+        # 被截断的参数已经不是合法的JSON，保持原样
+        if clipped is arguments:
+            clipped = format_json_value(arguments)
+        out.append(f"  - Call ID : {item.get('call_id', 'N/A')}\n")
+        out.append(f"  - Name    : {item.get('name', 'N/A')}\n")
+        out.append(f"  - Arguments: {split_line}{clipped}{split_line}")
+    elif item_type in ("function_call_output", "custom_tool_call_output"):
+        output = item.get("output", "")
+        text = output if isinstance(output, str) else parts_text(output)
+        out.append(f"  - Call ID : {item.get('call_id', 'N/A')}\n")
+        if text:
+            out.append(f"{split_line}{render_budget.clip(text)}{split_line}")
+    elif item_type == "reasoning":
+        summary = render_budget.clip(parts_text(item.get("summary")).strip())
+        if summary:
+            out.append(f"#### 🧠Summary\n{split_line}{summary}{split_line}")
+        if item.get("encrypted_content"):
+            out.append(f"#### 🔒Encrypted ({len(item['encrypted_content'])} chars)\n")
+    else:
+        out.append(f"{split_line}{codec.dumps_inline(elide_blobs(item))}{split_line}")
+
+
+def handle_input(items: Sequence[Any], out: TextBuilder) -> None:
+    out.append(f"## Input📖 ({len(items)})\n")
+    omit_start, omit_end = render_budget.message_window(len(items))
+    for i, item in enumerate(items):
+        if omit_start <= i < omit_end:
+            out.append(f"{item_title(i, item)} ⏭️ omitted ({format_size(item_size(item))})\n")
+            continue
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(items) - i} more items omitted (render budget reached)\n")
+            break
+        handle_item(i, item, out)
+
+
+def handle_tools(tools: Sequence[Any], out: TextBuilder) -> None:
+    out.append(f"## Tools🛠️ ({len(tools)})\n")
+    for i, tool in enumerate(tools):
+        if out.exhausted:
+            out.append(f"### ⏭️ {len(tools) - i} more tools omitted (render budget reached)\n")
+            break
+        tool_type = tool.get("type", "N/A")
+        # Responses API 的 function tool 的 name 和 parameters 不在 function 字段中
+        if tool_type not in ("function", "custom"):
+            out.append(f"### 🛠️{i}: {tool.get('name', tool_type)} [{tool_type}]\n")
+            continue
+        out.append(f"### 🛠️{i}: {tool.get('name', 'N/A')}\n{split_line}{tool.get('description', '')}{split_line}")
+        if tool.get("parameters"):
+            out.append(f"#### Parameters:\n{split_line}{format_json_value(tool['parameters'])}{split_line}\n")
+        elif tool.get("format"):
+            out.append(f"#### Format:\n{split_line}{format_json_value(tool['format'])}{split_line}\n")
+
+
+class OpenaiResponsesReq(Contentview):
+    name = "openai-responses-request"
+    syntax_highlight = "none"
+    priorities = {
+        (RESPONSES, REQUEST, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in OpenaiResponsesReq prettify: {e}")
+            return f"Error processing request: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(key, "json", lambda: codec.loads(data), size=len(data))
+
+        items = obj.get("input", [])
+        # input 可以是一个字符串，相当于一条 user 消息
+        if isinstance(items, str):
+            items = [{"role": "user", "content": items}]
+        out = TextBuilder(render_budget.max_chars)
+        out.append("# OpenAI Responses Request body\n \n")
+        out.append(handle_request_basis(obj))
+        out.append(multi_line_splitter(2))
+        handle_instructions(obj.get("instructions"), out)
+        handle_input(items, out)
+        out.append(multi_line_splitter(3))
+        handle_tools(obj.get("tools", []), out)
+        text_format = (obj.get("text") or {}).get("format")
+        if isinstance(text_format, dict) and text_format.get("type") not in (None, "text"):
+            out.append(multi_line_splitter(3))
+            out.append(f"## Text Format📐 [{text_format.get('type')}]\n{split_line}{format_json_value(text_format)}{split_line}")
+        return out.build()
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
@@ -0,0 +1,53 @@
+import logging
+from typing import Optional
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+
+from llmview import codec
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import JSON, RESPONSE, RESPONSES, message_class
+from llmview.profiling import profiler
+from llmview.responses import render_response
+
+
+class OpenaiResponsesResp(Contentview):
+    name = "openai-responses-response"
+    syntax_highlight = "none"
+    priorities = {
+        (RESPONSES, RESPONSE, JSON): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error in OpenaiResponsesResp prettify: {e}")
+            return f"Error processing response: {e}"
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("parse"):
+            obj = flow_cache.get_or_compute(
+                key, "json", lambda: codec.loads(data), size=len(data)
+            )
+        # 请求本身出错时只有 error 字段
+        if "output" not in obj and obj.get("error"):
+            error = obj["error"]
+            return f"# OpenAI Responses Error\n \n{error.get('code') or error.get('type', 'N/A')}: {error.get('message', '')}\n"
+        return render_response(obj, "OpenAI Responses Response")
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
@@ -0,0 +1,65 @@
+import logging
+from typing import Optional
+import traceback
+
+from mitmproxy.contentviews._api import Contentview
+from mitmproxy import contentviews
+from mitmproxy.http import Response
+
+from llmview.cache import CacheKey, flow_cache
+from llmview.endpoints import RESPONSE, RESPONSES, SSE, message_class
+from llmview.profiling import profiler
+from llmview.responses import aggregate_response_stream, render_response
+
+
+class OpenaiResponsesSSE(Contentview):
+    name = "openai-responses-sse-response"
+    syntax_highlight = "none"
+    priorities = {
+        (RESPONSES, RESPONSE, SSE): 2,
+    }
+
+    @profiler.profiled
+    def prettify(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        try:
+            return self.prettify_exec(data, metadata)
+        except Exception as e:
+            logging.error(f"Error prettifying Responses SSE response: {e}")
+            traceback.print_exc()
+            return f"Error during prettifying: {e}\n\n" + data.decode(
+                "utf-8", errors="replace"
+            )
+
+    def prettify_exec(
+        self,
+        data: bytes,
+        metadata: contentviews.Metadata,
+    ) -> str:
+        if not isinstance(metadata.http_message, Response):
+            return f'"{self.name}" is for OpenAI Responses SSE Response'
+
+        key = flow_cache.key(metadata, data)
+        return flow_cache.get_or_compute(key, self.name, lambda: self.render(data, key))
+
+    def render(self, data: bytes, key: Optional[CacheKey]) -> str:
+        with profiler.phase("aggregate"):
+            snapshot = aggregate_response_stream(data, key)
+        profiler.count_events(snapshot["events"])
+        if not snapshot["events"]:
+            return "# Empty SSE Response"
+
+        source = "final snapshot" if snapshot["final"] else "aggregated from deltas"
+        result = render_response(
+            snapshot["response"], f"OpenAI Responses SSE Response ({snapshot['events']} events, {source})"
+        )
+        error = snapshot["error"]
+        if error:
+            result += f"\n## Error❌\n{error.get('code', 'N/A')}: {error.get('message', '')}\n"
+        return result
+
+    def render_priority(self, data: bytes, metadata: contentviews.Metadata) -> float:
+        return self.priorities.get(message_class(metadata), 0)
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitmproxy.test import taddons, tflow  # noqa: E402
+
+from llmview.analysis import flow_analysis  # noqa: E402
+from llmview.conversation import CONVERSATION_METADATA_KEY, ConversationIndexAddon  # noqa: E402
+from llmview.endpoints import EndpointRegistryAddon  # noqa: E402
+from llmview.prompt_cache import PROMPT_CACHE_METADATA_KEY, PromptCacheAddon  # noqa: E402
+
+
+def chat_flow(messages):
+    f = tflow.tflow(resp=True)
+    f.request.path = "/v1/chat/completions"
+    f.request.headers["content-type"] = "application/json"
+    f.request.content = json.dumps({"model": "m", "messages": messages}).encode()
+    f.response.headers["content-type"] = "application/json"
+    usage = {"prompt_tokens": 10, "prompt_tokens_details": {"cached_tokens": 5}}
+    f.response.content = json.dumps({"usage": usage}).encode()
+    return f
+
+
+def conversation(topic, n):
+    messages, flows = [{"role": "system", "content": topic}], []
+    for i in range(n):
+        messages = messages + [{"role": "user", "content": f"q{i}"}]
+        flows.append(chat_flow(messages))
+        messages = messages + [{"role": "assistant", "content": f"a{i}"}]
+    return flows
+
+
+def run_hooks(addons, flows):
+    for f in flows:
+        for addon in addons:
+            addon.response(f)
+
+
+def test_inline_without_loop():
+    addons = [ConversationIndexAddon(), PromptCacheAddon()]
+    with taddons.context(EndpointRegistryAddon(), *addons):
+        flows = conversation("inline", 3)
+        run_hooks(addons, flows)
+    assert flows[0].metadata[CONVERSATION_METADATA_KEY] is None
+    assert flows[2].metadata[CONVERSATION_METADATA_KEY] == {"flow": flows[1].id, "common": 4}
+    result = flows[2].metadata[PROMPT_CACHE_METADATA_KEY]
+    assert result["previous"] == flows[1].id
+    assert result["common"] == 4
+    assert result["cached_tokens"] == 5
+    assert flow_analysis.queued == 0
+
+
+def test_hand_back_on_loop():
+    addons = [ConversationIndexAddon(), PromptCacheAddon()]
+
+    async def main():
+        flow_analysis.loop = asyncio.get_running_loop()
+        try:
+            flows = conversation("loop", 3)
+            run_hooks(addons, flows)
+            # hook 返回时分析还没有写入 flow.metadata
+            assert PROMPT_CACHE_METADATA_KEY not in flows[2].metadata
+            for _ in range(200):
+                if flow_analysis.queued == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return flows
+        finally:
+            flow_analysis.shutdown()
+            flow_analysis.loop = None
+
+    with taddons.context(EndpointRegistryAddon(), *addons):
+        flows = asyncio.run(main())
+    assert flow_analysis.queued == 0
+    assert flows[2].metadata[CONVERSATION_METADATA_KEY] == {"flow": flows[1].id, "common": 4}
+    # 对话匹配还没有写入 flow.metadata 时，prompt cache 使用分析线程中的结果
+    assert flows[1].metadata[PROMPT_CACHE_METADATA_KEY]["previous"] == flows[0].id
+    assert flows[2].metadata[PROMPT_CACHE_METADATA_KEY]["previous"] == flows[1].id
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitmproxy.test import tflow  # noqa: E402
+
+from llmview.compact import COMPACT_METADATA_KEY, TIMING_METADATA_KEY, StreamCompactor, iter_timed_chunks  # noqa: E402
+from llmview.sse import SSEDecoder, decode_sse_json, parse_sse_data  # noqa: E402
+from llmview.stream import compact_flow, expand_flow  # noqa: E402
+
+START = 1000.0
+
+
+def stream_chunks(count: int):
+    base = {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 1, "model": "gpt-4o", "system_fingerprint": "fp"}
+    chunks = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+    for i in range(count - 3):
+        delta = {"reasoning_content": f"think {i} "} if i < 10 else {"content": f"word {i} "}
+        chunks.append(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+    chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+    chunks.append(dict(base, choices=[], usage={"prompt_tokens": 5, "completion_tokens": count}))
+    return [f"data: {json.dumps(chunk)}\n\n".encode() for chunk in chunks] + [b"data: [DONE]\n\n"]
+
+
+def test_compact_expand_round_trip():
+    chunks = stream_chunks(52)
+    data = b"".join(chunks)
+    compactor = StreamCompactor()
+    decoder = SSEDecoder()
+    received = 0
+    for i, chunk in enumerate(chunks):
+        received += len(chunk)
+        for event in decoder.feed(chunk):
+            compactor.feed(event, decode_sse_json(event), received, START + i)
+
+    f = tflow.tflow(resp=True)
+    f.request.path = "/v1/chat/completions"
+    f.response.headers["content-type"] = "text/event-stream"
+    f.response.content = data
+    assert compact_flow(f, compactor)
+    assert len(f.response.content) < len(data)
+
+    assert expand_flow(f)
+    assert COMPACT_METADATA_KEY not in f.metadata
+    body = f.response.content
+    assert parse_sse_data(body) == parse_sse_data(data)
+    assert body.count(b"data: [DONE]") == 1
+    timed = list(iter_timed_chunks(body, f.metadata[TIMING_METADATA_KEY]))
+    assert [timestamp for timestamp, _ in timed] == [START + i for i in range(len(chunks))]
+    assert [parse_sse_data(chunk) for _, chunk in timed] == [parse_sse_data(chunk) for chunk in chunks]
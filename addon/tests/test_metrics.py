@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitmproxy.test import taddons, tflow  # noqa: E402
+
+from llmview.endpoints import CHAT_COMPLETIONS, EndpointRegistryAddon  # noqa: E402
+from llmview.metrics import JSON_WINDOW, LLMMetrics, extract_usage  # noqa: E402
+
+USAGE = {"prompt_tokens": 12, "completion_tokens": 34, "prompt_tokens_details": {"cached_tokens": 5}}
+
+
+def chat_flow(request, response):
+    f = tflow.tflow(resp=True)
+    f.request.path = "/v1/chat/completions"
+    f.request.headers["content-type"] = "application/json"
+    f.request.content = json.dumps(request).encode()
+    f.response.headers["content-type"] = "application/json"
+    f.response.content = json.dumps(response).encode()
+    return f
+
+
+def completion(content):
+    message = {"role": "assistant", "content": content}
+    return {"id": "c", "model": "gpt-x", "choices": [{"index": 0, "message": message}], "usage": USAGE}
+
+
+def assert_usage(usage, model="gpt-x"):
+    assert usage.model == model
+    assert (usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens) == (12, 34, 5)
+
+
+def test_small_and_large_json_bodies_agree():
+    # 字符串值中转义的字段不会被当作 model 和 usage
+    decoy = '{"model": "decoy", "usage": {"prompt_tokens": 1}} '
+    for repeat in (1, 4 * JSON_WINDOW // len(decoy)):
+        f = chat_flow({"messages": []}, completion(decoy * repeat))
+        assert_usage(extract_usage(f, CHAT_COMPLETIONS))
+
+
+def test_large_request_model_at_the_end():
+    messages = [{"role": "user", "content": "x" * (4 * JSON_WINDOW)}]
+    response = {"choices": [], "usage": USAGE}
+    f = chat_flow({"messages": messages, "model": "from-request"}, response)
+    assert_usage(extract_usage(f, CHAT_COMPLETIONS), "from-request")
+
+
+def test_loaded_flows_are_not_counted():
+    metrics = LLMMetrics()
+    with taddons.context(EndpointRegistryAddon()):
+        f = chat_flow({"messages": []}, completion("hi"))
+        assert metrics.observe_flow(f)
+        f.live = False
+        assert not metrics.observe_flow(f)
+    assert 'llm_requests_total{host="address",model="gpt-x"} 1' in metrics.expose()
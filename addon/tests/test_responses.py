@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmview.responses import aggregate_response_events  # noqa: E402
+
+
+def test_non_string_deltas_are_skipped():
+    events = [
+        {"type": "response.output_item.added", "output_index": 0, "item": {"type": "function_call", "arguments": ""}},
+        {"type": "response.function_call_arguments.delta", "output_index": 0, "delta": '{"q": '},
+        {"type": "response.function_call_arguments.delta", "output_index": 0, "delta": None},
+        {"type": "response.function_call_arguments.delta", "output_index": 0, "delta": {"x": 1}},
+        {"type": "response.function_call_arguments.delta", "output_index": 0, "delta": "1}"},
+        {"type": "response.output_text.delta", "output_index": 1, "content_index": 0, "delta": 42},
+        {"type": "response.output_text.delta", "output_index": 1, "content_index": 0, "delta": "Hi"},
+    ]
+    result = aggregate_response_events(events)
+    call, message = result["response"]["output"]
+    assert call["arguments"] == '{"q": 1}'
+    assert message["content"] == [{"text": "Hi"}]
+    assert result["events"] == len(events)
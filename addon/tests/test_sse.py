@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmview.sse import SSEDecoder, decode_sse_json, iter_sse_events, parse_sse_data  # noqa: E402
+
+MULTI_LINE = b"event: message\ndata: first\ndata:second\ndata:  third\n\n"
+
+
+def legacy_parse_sse_data(data: bytes):
+    """改用 SSEDecoder 之前的 parse_sse_data，每行按文本解析"""
+    events = []
+    for line in data.decode("utf-8", errors="replace").split("\n"):
+        line = line.strip()
+        if line.startswith("data:"):
+            data_content = line[5:]
+            if data_content == "[DONE]":
+                continue
+            try:
+                events.append(json.loads(data_content))
+            except json.JSONDecodeError:
+                logging.warning(f"Could not decode SSE JSON data: {data_content}")
+    return events
+
+
+def stream_body(count: int, newline: bytes = b"\n") -> bytes:
+    lines = []
+    for i in range(count):
+        chunk = {"id": "chatcmpl-1", "choices": [{"index": 0, "delta": {"content": f"词 {i}\n"}}]}
+        lines += [b": keep-alive", b"data: " + json.dumps(chunk, ensure_ascii=False).encode(), b""]
+    lines += [b"data: [DONE]", b"", b""]
+    return newline.join(lines)
+
+
+def feed_chunks(chunks):
+    decoder = SSEDecoder()
+    events = [event for chunk in chunks for event in decoder.feed(chunk)]
+    return events + list(decoder.close())
+
+
+def split_at(data: bytes, cuts):
+    bounds = [0] + sorted(cuts) + [len(data)]
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def random_chunks(data: bytes, rng: random.Random):
+    return split_at(data, [rng.randrange(len(data) + 1) for _ in range(rng.randrange(1, 40))])
+
+
+def test_line_endings_split_across_chunks():
+    for newline in (b"\n", b"\r\n", b"\r"):
+        data = MULTI_LINE.replace(b"\n", newline) * 2
+        expected = list(iter_sse_events(data))
+        assert [event.data for event in expected] == ["first\nsecond\n third"] * 2
+        # 每个位置切成两段，包括 CRLF 的 CR 和 LF 之间
+        for cut in range(len(data) + 1):
+            assert feed_chunks(split_at(data, [cut])) == expected
+            assert feed_chunks([data[:cut], b"", data[cut:]]) == expected
+        assert feed_chunks([data[i : i + 1] for i in range(len(data))]) == expected
+
+
+def test_bom_is_skipped_once():
+    data = b"\xef\xbb\xbfdata: 1\n\n\xef\xbb\xbfdata: 2\n\n"
+    expected = [event.data for event in iter_sse_events(data)]
+    # 只有流开头的BOM被去掉，第二个BOM所在的行不是 data 字段
+    assert expected == ["1"]
+    for cut in range(1, 4):
+        assert [event.data for event in feed_chunks(split_at(data, [cut]))] == expected
+    assert [event.data for event in feed_chunks([data[i : i + 1] for i in range(len(data))])] == expected
+    assert [event.data for event in feed_chunks([b"\xef\xbb", b"\xbfdata: 3"])] == ["3"]
+
+
+def test_multi_line_data():
+    [event] = iter_sse_events(b"id: 7\nretry: 100\n" + MULTI_LINE)
+    assert (event.event, event.data, event.id, event.retry) == ("message", "first\nsecond\n third", "7", 100)
+    # 没有空行分隔的多个 data 行被合并为一个事件，JSON逐行解析
+    [merged] = iter_sse_events(b'data: {"a": 1}\ndata: {"b": 2}\n\n')
+    assert decode_sse_json(merged) == [{"a": 1}, {"b": 2}]
+
+
+def test_close_flushes_the_last_event():
+    for tail in (b'data: {"n": 2}', b'data: {"n": 2}\n', b'data: {"n": 2}\r'):
+        decoder = SSEDecoder()
+        events = list(decoder.feed(b'data: {"n": 1}\n\n' + tail))
+        assert [event.data for event in events] == ['{"n": 1}']
+        assert [event.data for event in decoder.close()] == ['{"n": 2}']
+        assert list(decoder.close()) == []
+
+
+def test_matches_legacy_parser_with_random_chunks():
+    rng = random.Random(4)
+    for newline in (b"\n", b"\r\n"):
+        data = stream_body(30, newline)
+        expected = legacy_parse_sse_data(data)
+        assert len(expected) == 30
+        assert parse_sse_data(data) == expected
+        for _ in range(50):
+            chunks = random_chunks(data, rng)
+            # 流式转发时也会出现空chunk
+            chunks.insert(rng.randrange(len(chunks) + 1), b"")
+            events = feed_chunks(chunks)
+            assert [obj for event in events for obj in decode_sse_json(event)] == expected
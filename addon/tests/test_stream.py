@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitmproxy.test import tflow  # noqa: E402
+
+from llmview.stream import STREAM_METADATA_KEY, StreamAggregator, _ChatCompletionStream  # noqa: E402
+
+MALFORMED = [
+    b'data: "keepalive"\n\n',
+    b"data: null\n\n",
+    b'data: {"choices":["x"]}\n\n',
+    b'data: {"choices":[{"delta":"hi"}]}\n\n',
+    b'data: {"choices":{"index":0}}\n\n',
+    b'data: {"choices":[{"index":"0","delta":{"content":["part"],"role":1}}]}\n\n',
+    b'data: {"choices":[{"index":0,"delta":{"tool_calls":[1,{"index":"a"},{"index":0,"function":"f"}]}}]}\n\n',
+    b'data: {"choices":[{"index":0,"delta":{"tool_calls":{"index":0}}}]}\n\n',
+]
+
+
+def event(delta, finish_reason=None):
+    chunk = {"choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+def streamed_flow(chunks, stream):
+    f = tflow.tflow(resp=True)
+    f.request.path = "/v1/chat/completions"
+    f.response.headers["content-type"] = "text/event-stream"
+    f.response.stream = stream
+    for chunk in chunks + [b""]:
+        assert stream(chunk) is chunk
+    StreamAggregator().response(f)
+    return f
+
+
+def test_malformed_events_are_skipped():
+    chunks = [event({"role": "assistant", "content": "Hel"})] + MALFORMED + [
+        event({"content": "lo", "tool_calls": [{"index": 0, "id": "call_1", "function": {"name": "f", "arguments": "{}"}}]}),
+        event({}, "stop"),
+        b"data: [DONE]\n\n",
+    ]
+    f = streamed_flow(chunks, _ChatCompletionStream())
+    assert f.response.raw_content == b"".join(chunks)
+    snapshot = f.metadata[STREAM_METADATA_KEY]
+    [choice] = snapshot["choices"]
+    assert choice["role"] == "assistant"
+    assert choice["content"] == "Hello"
+    assert choice["finish_reason"] == "stop"
+    assert choice["tool_calls"] == [{"index": 0, "id": "call_1", "function": {"name": "f", "arguments": "{}"}}]
+
+
+def test_aggregation_error_keeps_forwarding():
+    stream = _ChatCompletionStream()
+
+    def broken(obj):
+        raise RuntimeError("boom")
+
+    stream.aggregator.feed = broken
+    chunks = [event({"content": "a"}), event({"content": "b"}), b"data: [DONE]\n\n"]
+    f = streamed_flow(chunks, stream)
+    assert stream.failed
+    assert f.response.raw_content == b"".join(chunks)
+    assert STREAM_METADATA_KEY not in f.metadata
@@ -0,0 +1,8 @@
+"""
+addon 视图的性能基准测试。
+
+使用确定性生成的合成LLM流量，测量各个contentview的 prettify 和
+render_priority 的耗时、峰值内存和输出大小，并可以与保存的基线比较。
+
+在仓库根目录运行: python -m benchmarks --help
+"""
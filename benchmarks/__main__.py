@@ -0,0 +1,224 @@
+"""
+运行基准测试:
+
+    python -m benchmarks                          # quick 规模
+    python -m benchmarks --profile full           # 10万个SSE事件等更大的规模
+    python -m benchmarks --save baseline.json     # 保存结果作为基线
+    python -m benchmarks --compare baseline.json  # 与基线比较，出现退化时返回非0
+
+benchmarks/baseline.json 是在参考机器上用 quick 规模记录的基线。耗时只能与相同的
+机器比较，在其他机器上先用 --save 记录自己的基线；峰值内存与机器无关。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon"))
+
+from mitmproxy import contentviews  # noqa: E402
+from mitmproxy.test import tflow  # noqa: E402
+
+from benchmarks import corpus  # noqa: E402
+
+# 与基线比较时，耗时和峰值内存超过基线的该倍数视为退化
+DEFAULT_THRESHOLD = 1.25
+
+
+def machine() -> str:
+    """记录在基线中的机器信息，与基线的机器不同时耗时没有可比性"""
+    return f"{platform.machine()} {platform.processor() or platform.system()} cpus={os.cpu_count()}"
+
+
+@dataclass
+class Case:
+    name: str
+    view: Any
+    data: bytes
+    content_type: str
+    is_request: bool
+    path: str = "/v1/chat/completions"
+
+    def metadata(self) -> contentviews.Metadata:
+        """每次都使用新的flow，避免命中按flow缓存的结果"""
+        flow = tflow.tflow(resp=True)
+        flow.request.path = self.path
+        message = flow.request if self.is_request else flow.response
+        message.headers["content-type"] = self.content_type
+        message.content = self.data
+        return contentviews.Metadata(content_type=self.content_type, flow=flow, http_message=message)
+
+
+@dataclass
+class Result:
+    seconds: float
+    seconds_min: float
+    peak_bytes: int
+    output_chars: int
+    priority_us: float
+
+
+def build_cases(size: corpus.CorpusSize, seed: int) -> List[Case]:
+    from llmview.views import openai_req, openai_res, openai_res_json, openai_res_sse, openai_responses_sse
+
+    request = corpus.chat_request(size, seed)
+    response = corpus.chat_response(size, seed)
+    stream = corpus.chat_stream(size, seed)
+    responses = corpus.responses_stream(size, seed)
+    interrupted = corpus.responses_stream(size, seed, completed=False)
+    json_type = "application/json"
+    sse_type = "text/event-stream"
+    return [
+        Case("openai-request", openai_req.OpenaiReq(), request, json_type, True),
+        Case("openai-response", openai_res.OpenaiResp(), response, json_type, False),
+        Case("openai-sse-response", openai_res_sse.OpenaiRespSSE(), stream, sse_type, False),
+        Case("openai-json-response/json", openai_res_json.OpenaiRespJson(), response, json_type, False),
+        Case("openai-json-response/sse", openai_res_json.OpenaiRespJson(), stream, sse_type, False),
+        Case("openai-responses-sse-response/completed", openai_responses_sse.OpenaiResponsesSSE(), responses, sse_type, False, "/v1/responses"),
+        Case("openai-responses-sse-response/interrupted", openai_responses_sse.OpenaiResponsesSSE(), interrupted, sse_type, False, "/v1/responses"),
+    ]
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run_case(case: Case, repeat: int, priority_calls: int) -> Result:
+    view = case.view
+    times = []
+    output = ""
+    for _ in range(repeat):
+        metadata = case.metadata()
+        start = time.perf_counter()
+        output = view.prettify(case.data, metadata)
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc 会明显拖慢执行，单独运行一次测量峰值内存
+    metadata = case.metadata()
+    tracemalloc.start()
+    try:
+        view.prettify(case.data, metadata)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    metadata = case.metadata()
+    priority = _timed(lambda: [view.render_priority(case.data, metadata) for _ in range(priority_calls)])
+    return Result(
+        seconds=statistics.median(times),
+        seconds_min=min(times),
+        peak_bytes=peak,
+        output_chars=len(output),
+        priority_us=priority / priority_calls * 1e6,
+    )
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """返回超过阈值的退化项"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for field in ("seconds", "peak_bytes"):
+            old, new = base[field], getattr(result, field)
+            if old and new > old * threshold:
+                regressions.append(f"{name}: {field} {old:.6g} -> {new:.6g} ({new / old:.2f}x)")
+    return regressions
+
+
+def _format_table(results: Dict[str, Result], baseline: Optional[Dict[str, Any]]) -> str:
+    width = max(28, *(len(name) + 2 for name in results))
+    header = f"{'case':<{width}}{'median s':>11}{'min s':>11}{'peak MiB':>10}{'output':>12}{'priority us':>13}"
+    if baseline is not None:
+        header += f"{'vs base':>9}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        line = (
+            f"{name:<{width}}{r.seconds:>11.4f}{r.seconds_min:>11.4f}{r.peak_bytes / 1024 / 1024:>10.1f}"
+            f"{r.output_chars:>12}{r.priority_us:>13.2f}"
+        )
+        if baseline is not None:
+            base = baseline.get("results", {}).get(name)
+            line += f"{r.seconds / base['seconds']:>8.2f}x" if base and base["seconds"] else f"{'-':>9}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the LLM contentviews on a synthetic corpus.")
+    parser.add_argument("--profile", choices=sorted(corpus.PROFILES), default="quick", help="corpus size")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timed prettify runs per case")
+    parser.add_argument("--priority-calls", type=int, default=1000, help="render_priority calls per case")
+    parser.add_argument("--only", action="append", default=[], help="run only cases whose name contains this text")
+    parser.add_argument("--cache", action="store_true", help="keep the shared render cache enabled")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown factor")
+    args = parser.parse_args(argv)
+
+    from llmview import codec
+    from llmview.cache import flow_cache
+
+    if not args.cache:
+        # 默认测量冷渲染: 禁用缓存，否则重复运行只会测到缓存命中
+        flow_cache.resize(0)
+
+    size = corpus.PROFILES[args.profile]
+    cases = build_cases(size, args.seed)
+    if args.only:
+        cases = [case for case in cases if any(text in case.name for text in args.only)]
+
+    print(f"profile={args.profile} {asdict(size)} json_backend={codec.BACKEND} python={platform.python_version()}")
+    for case in cases:
+        print(f"  {case.name}: {len(case.data) / 1024 / 1024:.1f} MiB body")
+    results = {case.name: run_case(case, args.repeat, args.priority_calls) for case in cases}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != args.profile:
+            print(f"warning: baseline was recorded with profile {baseline.get('profile')!r}")
+        if baseline.get("machine") != machine():
+            print(f"warning: baseline was recorded on {baseline.get('machine')!r}, timings may not be comparable")
+    print(_format_table(results, baseline))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "profile": args.profile,
+                    "seed": args.seed,
+                    "json_backend": codec.BACKEND,
+                    "python": platform.python_version(),
+                    "machine": machine(),
+                    "results": {name: asdict(result) for name, result in results.items()},
+                },
+                f,
+                indent=2,
+            )
+        print(f"baseline saved to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"regressions (threshold {args.threshold}x):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions (threshold {args.threshold}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
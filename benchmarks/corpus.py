@@ -0,0 +1,298 @@
+"""确定性的合成LLM流量，相同的参数和 seed 总是生成完全相同的body"""
+import json
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+MODEL = "gpt-4o-2024-08-06"
+
+_WORDS = (
+    "the model returns a stream of chunks and each chunk carries a small delta of text "
+    "tool call arguments are split across many events while reasoning tokens arrive first "
+    "请 根据 上下文 调用 合适 的 工具 并 返回 结果"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False)
+
+
+@dataclass
+class CorpusSize:
+    """
+    合成语料的规模:
+      - messages      : 请求中的消息数
+      - tools         : 请求中的tool定义数
+      - choices       : 非流式响应中的 choice 数 (n>1)
+      - chunks        : SSE响应中的事件数
+      - parallel_tools: SSE响应中交错输出参数的并行tool call数
+    """
+
+    messages: int
+    tools: int
+    choices: int
+    chunks: int
+    parallel_tools: int = 4
+
+
+PROFILES: Dict[str, CorpusSize] = {
+    "quick": CorpusSize(messages=1_000, tools=100, choices=4, chunks=10_000),
+    "full": CorpusSize(messages=5_000, tools=200, choices=8, chunks=100_000),
+}
+
+
+def _tool_schema(rng: random.Random, i: int) -> Dict[str, Any]:
+    properties: Dict[str, Any] = {}
+    for j in range(rng.randint(2, 8)):
+        kind = rng.choice(["string", "integer", "boolean", "array", "object"])
+        prop: Dict[str, Any] = {"type": kind, "description": _text(rng, rng.randint(4, 16))}
+        if kind == "array":
+            prop["items"] = {"type": "string"}
+        elif kind == "object":
+            prop["properties"] = {
+                f"field_{k}": {"type": "string", "description": _text(rng, 6)} for k in range(3)
+            }
+        elif kind == "string" and rng.random() < 0.3:
+            prop["enum"] = [f"option_{k}" for k in range(4)]
+        properties[f"param_{j}"] = prop
+    return {
+        "type": "function",
+        "function": {
+            "name": f"tool_{i}",
+            "description": _text(rng, rng.randint(10, 60)),
+            "parameters": {
+                "type": "object",
+                "properties": properties,
+                "required": sorted(properties)[:2],
+            },
+        },
+    }
+
+
+def chat_request(size: CorpusSize, seed: int = 1) -> bytes:
+    """带大量消息和tool定义的 /chat/completions 请求"""
+    rng = random.Random(seed)
+    messages: List[Dict[str, Any]] = [{"role": "system", "content": _text(rng, 200)}]
+    call_id = 0
+    while len(messages) < size.messages:
+        kind = rng.random()
+        if kind < 0.3:
+            messages.append({"role": "user", "content": _text(rng, rng.randint(5, 80))})
+        elif kind < 0.4:
+            messages.append(
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": _text(rng, 20)},
+                        {"type": "image_url", "image_url": {"url": "https://example.com/image.png"}},
+                    ],
+                }
+            )
+        elif kind < 0.7:
+            messages.append({"role": "assistant", "content": _text(rng, rng.randint(20, 300))})
+        else:
+            # 并行的tool call和对应的结果
+            calls = []
+            for _ in range(rng.randint(1, 3)):
+                call_id += 1
+                calls.append(
+                    {
+                        "id": f"call_{call_id}",
+                        "type": "function",
+                        "function": {
+                            "name": f"tool_{rng.randrange(size.tools)}",
+                            "arguments": _dumps({"query": _text(rng, 8), "limit": rng.randint(1, 50)}),
+                        },
+                    }
+                )
+            messages.append({"role": "assistant", "content": None, "tool_calls": calls})
+            for call in calls:
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "content": _dumps({"ok": True, "result": _text(rng, rng.randint(10, 120))}),
+                    }
+                )
+    body = {
+        "model": MODEL,
+        "temperature": 0.2,
+        "stream": True,
+        "max_tokens": 4096,
+        "messages": messages[: size.messages],
+        "tools": [_tool_schema(rng, i) for i in range(size.tools)],
+    }
+    return _dumps(body).encode("utf-8")
+
+
+def chat_response(size: CorpusSize, seed: int = 1) -> bytes:
+    """n>1 的非流式 /chat/completions 响应"""
+    rng = random.Random(seed)
+    choices = []
+    for i in range(size.choices):
+        message: Dict[str, Any] = {
+            "role": "assistant",
+            "content": _text(rng, rng.randint(100, 800)),
+            "reasoning_content": _text(rng, rng.randint(50, 400)),
+        }
+        if i % 2:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{i}_{k}",
+                    "type": "function",
+                    "function": {"name": f"tool_{k}", "arguments": _dumps({"query": _text(rng, 12)})},
+                }
+                for k in range(3)
+            ]
+        choices.append({"index": i, "finish_reason": "tool_calls" if i % 2 else "stop", "message": message})
+    body = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 1_700_000_000,
+        "model": MODEL,
+        "system_fingerprint": "fp_bench",
+        "choices": choices,
+        "usage": {"prompt_tokens": 12_345, "completion_tokens": 6_789, "total_tokens": 19_134},
+    }
+    return _dumps(body).encode("utf-8")
+
+
+def chat_stream(size: CorpusSize, seed: int = 1) -> bytes:
+    """
+    /chat/completions 的SSE响应: 先输出 reasoning_content，再输出 content，
+    最后多个并行tool call的参数片段交错输出。
+    """
+    rng = random.Random(seed)
+    base = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": 1_700_000_000,
+        "model": MODEL,
+        "system_fingerprint": "fp_bench",
+    }
+    events: List[str] = []
+
+    def emit(delta: Dict[str, Any], finish_reason: Any = None) -> None:
+        chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+        events.append(_dumps(chunk))
+
+    emit({"role": "assistant", "content": ""})
+    # 去掉首尾的固定事件后，剩余事件按 3:3:4 分配给三个阶段
+    body_chunks = max(size.chunks - 3, 3)
+    reasoning = body_chunks * 3 // 10
+    content = body_chunks * 3 // 10
+    tool_chunks = body_chunks - reasoning - content
+    for _ in range(reasoning):
+        emit({"reasoning_content": rng.choice(_WORDS) + " "})
+    for _ in range(content):
+        emit({"content": rng.choice(_WORDS) + " "})
+
+    parallel = max(size.parallel_tools, 1)
+    for k in range(min(parallel, tool_chunks)):
+        emit(
+            {
+                "tool_calls": [
+                    {
+                        "index": k,
+                        "id": f"call_stream_{k}",
+                        "type": "function",
+                        "function": {"name": f"tool_{k}", "arguments": ""},
+                    }
+                ]
+            }
+        )
+    fragments = tool_chunks - min(parallel, tool_chunks)
+    for i in range(fragments):
+        if i < parallel:
+            fragment = '{"query": "'
+        elif i >= fragments - parallel:
+            fragment = '"}'
+        else:
+            fragment = rng.choice(_WORDS) + " "
+        emit({"tool_calls": [{"index": i % parallel, "function": {"arguments": fragment}}]})
+
+    emit({}, finish_reason="tool_calls")
+    events.append(
+        _dumps(
+            dict(
+                base,
+                choices=[],
+                usage={"prompt_tokens": 12_345, "completion_tokens": size.chunks, "total_tokens": 12_345 + size.chunks},
+            )
+        )
+    )
+    events.append("[DONE]")
+    return "".join(f"data: {event}\n\n" for event in events).encode("utf-8")
+
+
+def responses_stream(size: CorpusSize, seed: int = 1, completed: bool = True) -> bytes:
+    """
+    /v1/responses 的SSE响应: reasoning summary、output_text 和多个并行 function_call
+    的增量事件。completed 为False时没有最后的 response.completed 事件(被中断的流)。
+    """
+    rng = random.Random(seed)
+    response: Dict[str, Any] = {"id": "resp_bench", "object": "response", "model": MODEL, "status": "in_progress", "output": []}
+    events: List[Dict[str, Any]] = [
+        {"type": "response.created", "response": response},
+        {"type": "response.in_progress", "response": response},
+    ]
+    body_chunks = max(size.chunks - 3, 3)
+    reasoning = body_chunks * 3 // 10
+    content = body_chunks * 3 // 10
+    parallel = max(size.parallel_tools, 1)
+    tool_chunks = body_chunks - reasoning - content
+
+    summary = [rng.choice(_WORDS) + " " for _ in range(reasoning)]
+    events.append({"type": "response.output_item.added", "output_index": 0, "item": {"type": "reasoning", "id": "rs_bench", "summary": []}})
+    events.append({"type": "response.reasoning_summary_part.added", "output_index": 0, "summary_index": 0, "part": {"type": "summary_text", "text": ""}})
+    events.extend({"type": "response.reasoning_summary_text.delta", "output_index": 0, "summary_index": 0, "delta": d} for d in summary)
+
+    text = [rng.choice(_WORDS) + " " for _ in range(content)]
+    events.append({"type": "response.output_item.added", "output_index": 1, "item": {"type": "message", "id": "msg_bench", "role": "assistant", "status": "in_progress", "content": []}})
+    events.append({"type": "response.content_part.added", "output_index": 1, "content_index": 0, "part": {"type": "output_text", "text": "", "annotations": []}})
+    events.extend({"type": "response.output_text.delta", "output_index": 1, "content_index": 0, "delta": d} for d in text)
+
+    arguments: List[List[str]] = [[] for _ in range(parallel)]
+
+    def argument_delta(k: int, fragment: str) -> None:
+        arguments[k].append(fragment)
+        events.append({"type": "response.function_call_arguments.delta", "output_index": 2 + k, "delta": fragment})
+
+    for k in range(parallel):
+        item = {"type": "function_call", "id": f"fc_bench_{k}", "call_id": f"call_bench_{k}", "name": f"tool_{k}", "arguments": ""}
+        events.append({"type": "response.output_item.added", "output_index": 2 + k, "item": item})
+        argument_delta(k, '{"query": "')
+    for i in range(tool_chunks):
+        argument_delta(i % parallel, rng.choice(_WORDS) + " ")
+    for k in range(parallel):
+        argument_delta(k, '"}')
+
+    if completed:
+        output: List[Dict[str, Any]] = [
+            {"type": "reasoning", "id": "rs_bench", "summary": [{"type": "summary_text", "text": "".join(summary)}]},
+            {
+                "type": "message",
+                "id": "msg_bench",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": "".join(text), "annotations": []}],
+            },
+        ]
+        for k in range(parallel):
+            output.append(
+                {
+                    "type": "function_call",
+                    "id": f"fc_bench_{k}",
+                    "call_id": f"call_bench_{k}",
+                    "name": f"tool_{k}",
+                    "arguments": "".join(arguments[k]),
+                    "status": "completed",
+                }
+            )
+        usage = {"input_tokens": 12_345, "output_tokens": size.chunks, "total_tokens": 12_345 + size.chunks}
+        events.append({"type": "response.completed", "response": dict(response, status="completed", output=output, usage=usage)})
+    return "".join(f"event: {event['type']}\ndata: {_dumps(event)}\n\n" for event in events).encode("utf-8")
@@ -0,0 +1,209 @@
+"""
+本地的 OpenAI /chat/completions 模拟服务，只使用标准库，不需要网络。
+
+请求body中 "stream": true 时返回SSE，否则返回JSON。响应的chunk数量、
+每个chunk的文本长度和输出速度(token/s)可以配置，每个chunk按一个token计。
+
+    python -m benchmarks.mock_server --port 8000 --chunks 200 --chunk-size 16 --rate 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from benchmarks.corpus import MODEL, _WORDS
+
+
+@dataclass
+class MockConfig:
+    # 每个响应的chunk数量，JSON响应的文本长度与SSE响应相同
+    chunks: int = 200
+    # 每个chunk的文本字符数
+    chunk_size: int = 16
+    # 每秒输出的chunk数，0表示不等待
+    rate: float = 0.0
+    # 返回第一个chunk之前的等待时间(秒)，模拟首token延迟
+    first_token_delay: float = 0.0
+    seed: int = 1
+
+
+def _chunk_texts(config: MockConfig) -> Tuple[str, ...]:
+    rng = random.Random(config.seed)
+    texts = []
+    for _ in range(config.chunks):
+        text = ""
+        while len(text) < config.chunk_size:
+            text += rng.choice(_WORDS) + " "
+        texts.append(text[: config.chunk_size])
+    return tuple(texts)
+
+
+class MockLLMServer:
+    """asyncio HTTP/1.1 服务，支持keep-alive，SSE响应使用chunked编码逐个事件发送"""
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._texts = _chunk_texts(config)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                path, headers, body = request
+                self.requests += 1
+                if not path.split("?", 1)[0].endswith("/chat/completions"):
+                    await self._send(writer, 404, "application/json", b'{"error": {"message": "not found"}}')
+                elif body.get("stream"):
+                    await self._send_stream(writer, body)
+                else:
+                    await self._send(writer, 200, "application/json", self._json_response(body))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, Dict[str, str], Dict[str, Any]]]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        _, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        data = await reader.readexactly(int(headers.get("content-length", "0")))
+        try:
+            body = json.loads(data) if data else {}
+        except ValueError:
+            body = {}
+        return path, headers, body if isinstance(body, dict) else {}
+
+    def _base(self, body: Dict[str, Any], obj: str) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-mock-{self.requests}",
+            "object": obj,
+            "created": int(time.time()),
+            "model": body.get("model") or MODEL,
+        }
+
+    def _usage(self) -> Dict[str, int]:
+        return {"prompt_tokens": 100, "completion_tokens": self.config.chunks, "total_tokens": 100 + self.config.chunks}
+
+    def _json_response(self, body: Dict[str, Any]) -> bytes:
+        response = self._base(body, "chat.completion")
+        response["choices"] = [
+            {"index": 0, "message": {"role": "assistant", "content": "".join(self._texts)}, "finish_reason": "stop"}
+        ]
+        response["usage"] = self._usage()
+        return json.dumps(response).encode("utf-8")
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, content_type: str, data: bytes) -> None:
+        if self.config.first_token_delay:
+            await asyncio.sleep(self.config.first_token_delay)
+        writer.write(
+            f"HTTP/1.1 {status} OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+            + data
+        )
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, body: Dict[str, Any]) -> None:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        await writer.drain()
+        base = self._base(body, "chat.completion.chunk")
+        interval = 1.0 / self.config.rate if self.config.rate > 0 else 0.0
+        start = time.perf_counter() + self.config.first_token_delay
+        if self.config.first_token_delay:
+            await asyncio.sleep(self.config.first_token_delay)
+
+        def event(payload: Dict[str, Any]) -> None:
+            data = b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        event(dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        for i, text in enumerate(self._texts):
+            event(dict(base, choices=[{"index": 0, "delta": {"content": text}, "finish_reason": None}]))
+            if interval:
+                # 按开始时间计算每个chunk的发送时间，避免sleep的误差累积
+                await writer.drain()
+                delay = start + (i + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        event(dict(base, choices=[], usage=self._usage()))
+        data = b"data: [DONE]\n\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+        await writer.drain()
+
+
+class MockServerThread:
+    """在后台线程的事件循环中运行 MockLLMServer，供同步代码使用"""
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.server = MockLLMServer(config, host, port)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mock-llm-server", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.server.port
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_server", description="Local mock of the OpenAI /chat/completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--chunks", type=int, default=MockConfig.chunks, help="chunks (tokens) per response")
+    parser.add_argument("--chunk-size", type=int, default=MockConfig.chunk_size, help="characters per chunk")
+    parser.add_argument("--rate", type=float, default=MockConfig.rate, help="chunks per second, 0 sends them without waiting")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first chunk")
+    args = parser.parse_args()
+
+    config = MockConfig(chunks=args.chunks, chunk_size=args.chunk_size, rate=args.rate, first_token_delay=args.first_token_delay)
+
+    async def serve() -> None:
+        server = MockLLMServer(config, args.host, args.port)
+        await server.start()
+        print(f"mock LLM server listening on http://{server.host}:{server.port}/v1/chat/completions")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
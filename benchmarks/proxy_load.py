@@ -0,0 +1,348 @@
+"""
+测量 addon 给经过 mitmdump 的LLM流量增加的延迟和资源占用。
+
+启动本地的模拟服务(benchmarks.mock_server)，依次在以下场景下用并发的客户端
+发送 /chat/completions 请求，全部在本机完成，不需要网络:
+
+  - direct : 直接请求模拟服务，作为客户端和服务端本身的基线
+  - mitmdump: 经过不加载脚本的 mitmdump
+  - addons : 经过加载了 addon/llm_better_view.py 的 mitmdump
+
+输出每个场景的延迟和首字节时间(TTFB)的 p50/p99、吞吐量，以及 mitmdump 进程的
+CPU时间和峰值RSS，最后给出 addons 相对 mitmdump 增加的部分。
+
+    python -m benchmarks.proxy_load --requests 1000 --concurrency 200 --stream --rate 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.mock_server import MockConfig, MockServerThread
+
+ADDON_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addon", "llm_better_view.py")
+SCENARIOS = ("direct", "mitmdump", "addons")
+
+
+@dataclass
+class Sample:
+    latency: float
+    ttfb: float
+    size: int
+
+
+@dataclass
+class ProcessUsage:
+    cpu_seconds: Optional[float] = None
+    peak_rss_bytes: Optional[int] = None
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    seconds: float
+    latency_p50: float
+    latency_p99: float
+    ttfb_p50: float
+    ttfb_p99: float
+    requests_per_second: float
+    mib_per_second: float
+    proxy: ProcessUsage = field(default_factory=ProcessUsage)
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(p) - 1]
+
+
+async def _read_response(reader: asyncio.StreamReader, started: float) -> Tuple[int, float, bool]:
+    """读取一个完整的响应，返回 (body字节数, 首字节时间, 服务端是否要求关闭连接)"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip().lower()
+    ttfb = 0.0
+    size = 0
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            length = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if not ttfb:
+                ttfb = time.perf_counter() - started
+            if length == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            size += len(await reader.readexactly(length + 2)) - 2
+    else:
+        length = int(headers.get("content-length", "0"))
+        if length:
+            first = await reader.read(1)
+            ttfb = time.perf_counter() - started
+            size = len(first) + len(await reader.readexactly(length - len(first)))
+    if status != 200:
+        raise ConnectionError(f"HTTP {status}")
+    return size, ttfb, headers.get("connection") == "close"
+
+
+async def _worker(
+    target: Tuple[str, int], url: str, body: bytes, queue: "asyncio.Queue[int]", samples: List[Sample], errors: List[str]
+) -> None:
+    """每个worker使用一个keep-alive连接依次发送请求，出错后重新连接"""
+    request = (
+        f"POST {url} HTTP/1.1\r\nHost: {url.split('/')[2]}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1") + body
+    connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(*target)
+            reader, writer = connection
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            size, ttfb, close = await _read_response(reader, started)
+            samples.append(Sample(time.perf_counter() - started, ttfb, size))
+            if close:
+                writer.close()
+                connection = None
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            if connection is not None:
+                connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def run_load(
+    target: Tuple[str, int], url: str, body: bytes, requests: int, concurrency: int
+) -> Tuple[List[Sample], List[str], float]:
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    samples: List[Sample] = []
+    errors: List[str] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(target, url, body, queue, samples, errors) for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def _process_cpu_seconds(pid: int) -> Optional[float]:
+    """从 /proc 读取进程的 user+system CPU时间，其他平台返回None"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _process_peak_rss(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _mitmdump_command() -> List[str]:
+    executable = shutil.which("mitmdump")
+    if executable is not None:
+        return [executable]
+    return [sys.executable, "-c", "from mitmproxy.tools.main import mitmdump; mitmdump()"]
+
+
+class Proxy:
+    """mitmdump 子进程，输出写入临时文件，脚本加载失败时可以查看"""
+
+    def __init__(self, scripts: Sequence[str], extra_args: Sequence[str]) -> None:
+        self.port = _free_port()
+        self.log = tempfile.NamedTemporaryFile("w+", prefix="mitmdump-", suffix=".log", delete=False)
+        command = _mitmdump_command() + ["--listen-host", "127.0.0.1", "--listen-port", str(self.port), "--set", "termlog_verbosity=warn"]
+        for script in scripts:
+            command += ["-s", script]
+        command += list(extra_args)
+        self.process = subprocess.Popen(command, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"mitmdump exited with status {self.process.returncode}:\n{self.output()}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"mitmdump did not start listening within {timeout}s:\n{self.output()}")
+
+    def output(self) -> str:
+        self.log.flush()
+        with open(self.log.name, encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    def usage(self) -> ProcessUsage:
+        return ProcessUsage(_process_cpu_seconds(self.process.pid), _process_peak_rss(self.process.pid))
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+        os.unlink(self.log.name)
+
+
+def run_scenario(name: str, mock_port: int, args: argparse.Namespace, body: bytes) -> ScenarioResult:
+    url = f"http://127.0.0.1:{mock_port}/v1/chat/completions"
+    proxy = None
+    if name == "direct":
+        target = ("127.0.0.1", mock_port)
+    else:
+        proxy = Proxy([ADDON_SCRIPT] if name == "addons" else [], args.mitm_arg)
+        proxy.wait_ready()
+        target = ("127.0.0.1", proxy.port)
+    try:
+        if args.warmup:
+            asyncio.run(run_load(target, url, body, args.warmup, min(args.concurrency, args.warmup)))
+        before = proxy.usage() if proxy is not None else ProcessUsage()
+        samples, errors, seconds = asyncio.run(run_load(target, url, body, args.requests, args.concurrency))
+        usage = proxy.usage() if proxy is not None else ProcessUsage()
+        if proxy is not None and usage.cpu_seconds is not None and before.cpu_seconds is not None:
+            usage.cpu_seconds -= before.cpu_seconds
+        if proxy is not None and ("Traceback" in proxy.output() or "Error" in proxy.output()):
+            print(f"warning: mitmdump reported errors in scenario {name}:\n{proxy.output()[-2000:]}", file=sys.stderr)
+    finally:
+        if proxy is not None:
+            proxy.stop()
+    for error in sorted(set(errors))[:5]:
+        print(f"  {name}: {error}", file=sys.stderr)
+
+    latencies = sorted(s.latency for s in samples)
+    ttfbs = sorted(s.ttfb for s in samples)
+    return ScenarioResult(
+        requests=len(samples),
+        errors=len(errors),
+        seconds=seconds,
+        latency_p50=percentile(latencies, 50),
+        latency_p99=percentile(latencies, 99),
+        ttfb_p50=percentile(ttfbs, 50),
+        ttfb_p99=percentile(ttfbs, 99),
+        requests_per_second=len(samples) / seconds if seconds else 0.0,
+        mib_per_second=sum(s.size for s in samples) / seconds / 1024 / 1024 if seconds else 0.0,
+        proxy=usage,
+    )
+
+
+def _ms(value: float) -> str:
+    return f"{value * 1000:.1f}"
+
+
+def format_results(results: Dict[str, ScenarioResult]) -> str:
+    header = (
+        f"{'scenario':<10}{'ok':>7}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}{'ttfb p99':>10}"
+        f"{'req/s':>9}{'MiB/s':>8}{'proxy cpu s':>13}{'proxy rss MiB':>15}"
+    )
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        cpu = "-" if r.proxy.cpu_seconds is None else f"{r.proxy.cpu_seconds:.2f}"
+        rss = "-" if r.proxy.peak_rss_bytes is None else f"{r.proxy.peak_rss_bytes / 1024 / 1024:.0f}"
+        lines.append(
+            f"{name:<10}{r.requests:>7}{r.errors:>8}{_ms(r.latency_p50):>10}{_ms(r.latency_p99):>10}"
+            f"{_ms(r.ttfb_p50):>10}{_ms(r.ttfb_p99):>10}{r.requests_per_second:>9.1f}{r.mib_per_second:>8.2f}{cpu:>13}{rss:>15}"
+        )
+    base, addons = results.get("mitmdump"), results.get("addons")
+    if base is not None and addons is not None:
+        lines.append("")
+        lines.append("added by the addons (addons - mitmdump):")
+        lines.append(f"  latency p50 {_ms(addons.latency_p50 - base.latency_p50)} ms, p99 {_ms(addons.latency_p99 - base.latency_p99)} ms")
+        lines.append(f"  ttfb    p50 {_ms(addons.ttfb_p50 - base.ttfb_p50)} ms, p99 {_ms(addons.ttfb_p99 - base.ttfb_p99)} ms")
+        lines.append(f"  throughput {addons.requests_per_second - base.requests_per_second:+.1f} req/s")
+        if addons.proxy.cpu_seconds is not None and base.proxy.cpu_seconds is not None and addons.requests:
+            per_request = (addons.proxy.cpu_seconds / addons.requests - base.proxy.cpu_seconds / max(base.requests, 1)) * 1000
+            lines.append(f"  proxy cpu {per_request:+.2f} ms per request")
+        if addons.proxy.peak_rss_bytes is not None and base.proxy.peak_rss_bytes is not None:
+            lines.append(f"  proxy peak rss {(addons.proxy.peak_rss_bytes - base.proxy.peak_rss_bytes) / 1024 / 1024:+.0f} MiB")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.proxy_load",
+        description="Measure the latency and resources the addons add to LLM traffic proxied through mitmdump.",
+    )
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=100, help="parallel connections")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--stream", action="store_true", help="request SSE responses (stream: true)")
+    parser.add_argument("--chunks", type=int, default=MockConfig.chunks, help="chunks (tokens) per response")
+    parser.add_argument("--chunk-size", type=int, default=MockConfig.chunk_size, help="characters per chunk")
+    parser.add_argument("--rate", type=float, default=MockConfig.rate, help="chunks per second per stream, 0 sends them without waiting")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first chunk")
+    parser.add_argument("--messages", type=int, default=20, help="messages in each request body")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these scenarios")
+    parser.add_argument("--mitm-arg", action="append", default=[], help="extra argument for mitmdump, e.g. --mitm-arg=--set=llmview_precompute_workers=0")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        *({"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 20} for i in range(args.messages)),
+    ]
+    body = json.dumps({"model": "gpt-4o-mini", "messages": messages, "stream": args.stream}).encode("utf-8")
+    config = MockConfig(chunks=args.chunks, chunk_size=args.chunk_size, rate=args.rate, first_token_delay=args.first_token_delay)
+
+    server = MockServerThread(config)
+    server.start()
+    print(
+        f"mock server on port {server.port}: {'sse' if args.stream else 'json'}, {config.chunks} chunks x {config.chunk_size} chars, "
+        f"rate {config.rate or 'unlimited'}/s; {args.requests} requests, concurrency {args.concurrency}"
+    )
+    results: Dict[str, ScenarioResult] = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            results[name] = run_scenario(name, server.port, args, body)
+    finally:
+        server.stop()
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": {name: asdict(r) for name, r in results.items()}}, f, indent=2)
+        print(f"results saved to {args.save}")
+    return 1 if any(r.errors for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())